@@ -26,16 +26,80 @@ NETWORK_IDS = {
     # Interfaz de red a monitorear
     'interface': 'eth0',  # Cambiar según tu sistema: eth0, enp0s3, wlan0, etc.
     
+    # Detectores habilitados: port_scan, host_scan, syn_flood, icmp_flood, payload
+    # y los registrados por plugins (ver detectors/registry.py)
+    'detectors': ['port_scan', 'host_scan', 'syn_flood', 'icmp_flood', 'payload'],
+    
+    # Módulos con detectores adicionales (importables desde detectors/)
+    'plugins': [],
+    
+    # Motor de captura: 'scapy' (disección completa) o 'raw' (AF_PACKET +
+    # anillo TPACKET_V3, solo cabeceras IPv4/TCP/ICMP; más rápido)
+    'capture_backend': 'scapy',
+    
+    # Procesos de análisis: con N > 1 cada paquete se reparte por hash de
+    # la IP origen y cada proceso mantiene el estado de sus atacantes
+    'workers': 1,
+    
+    # Prefiltro BPF: descarta en el kernel el tráfico que ningún detector usa
+    'bpf_prefilter': True,
+    
+    # Puertos donde se inspeccionan payloads (SQL injection, XSS)
+    'payload_ports': [21, 80, 1433, 2222, 3306, 5432, 8000, 8080],
+    
+    # Cola de alertas hacia la BD (ver detectors/alert_sink.py). Al llenarse:
+    # 'drop_oldest', 'coalesce' (suma en Paquetes_Detectados) o 'spill'
+    # (vuelca a alert_spill_file y lo reinyecta después)
+    'alert_max_queue': 10000,
+    'alert_overflow': 'coalesce',
+    'alert_spill_file': '/var/lib/sins/ids_alerts.spill.jsonl',
+    
     # Umbrales de detección
     'port_scan_threshold': 10,      # Puertos escaneados para alertar
     'port_scan_window': 10,         # Ventana de tiempo (segundos)
     
+    # Barridos entre hosts (horizontal, en bloque y distribuido)
+    'scan_window': 60,                  # Ventana de tiempo (segundos)
+    'horizontal_scan_hosts': 20,        # Hosts distintos desde una IP
+    'block_scan_ports': 10,             # ...y además puertos distintos (en bloque)
+    'distributed_scan_sources': 50,     # IPs origen distintas en un mismo puerto
+    'distributed_scan_min_hosts': 3,    # Hosts mínimos para contar una IP como escáner
+    
     'syn_flood_threshold': 100,     # Paquetes SYN para alertar
     'syn_flood_window': 1,          # Ventana de tiempo (segundos)
     
     'icmp_flood_threshold': 50,     # Paquetes ICMP para alertar
     'icmp_flood_window': 1,         # Ventana de tiempo (segundos)
     
+    # Estado por IP origen: tope de IPs y expiración por inactividad
+    'tracker_max_sources': 100000,
+    'tracker_idle_timeout': 120,    # segundos
+    
+    # Puertos distintos por IP en port scan: 'exact' (set), 'hll'
+    # (HyperLogLog aproximado, ~300 bytes por IP) o 'bitmap' (8 KB por IP)
+    'port_scan_counter': 'exact',
+    'hll_precision': 8,             # 2^8 registros, error típico ~6.5%
+    
+    # Top de IPs con más SYN en el resumen final (Count-Min Sketch; unos µs por SYN)
+    'syn_top_sources': False,
+    
+    # Métricas: latencia por detector, colas, trackers y sink
+    'metrics': True,                # Instrumentación (coste ~100 ns por detector y paquete)
+    'metrics_port': None,           # Puerto del endpoint /metrics (p.ej. 9108; None = apagado)
+    'metrics_host': '127.0.0.1',
+    'metrics_log_interval': 60,     # Línea de resumen en consola cada N segundos (0 = nunca)
+    
+    # Snapshot periódico de los trackers para no perder las ventanas al
+    # reiniciar (None = desactivado; en multiproceso, un fichero por trabajador)
+    'state_file': '/var/lib/sins/ids_state.pkl',
+    'state_interval': 60,           # Segundos entre snapshots
+    
+    # Reensamblado TCP para la inspección de payloads
+    'stream_depth': 8192,                    # Bytes analizados por flujo (0 = por segmento)
+    'stream_max_flows': 50000,               # Tope de flujos en la tabla
+    'stream_max_memory': 32 * 1024 * 1024,   # Tope de memoria de la tabla (bytes)
+    'stream_idle_timeout': 60,               # Segundos sin tráfico para olvidar un flujo
+    
     # Patrones SQL Injection
     'sql_patterns': [
         "' OR '1'='1",
@@ -65,10 +129,29 @@ SSH_MONITOR = {
     # Archivo de log a monitorear
     'log_file': '/var/log/auth.log',  # Fedora/RHEL usa /var/log/secure
     
+    # Posición de lectura (inodo + offset) para continuar tras un reinicio
+    'checkpoint_file': '/var/lib/sins/ssh_auth.offset',
+    
+    # Origen de los logs: 'file' (log_file) o 'journal' (systemd-journald,
+    # Fedora/RHEL; requiere python3-systemd)
+    'source': 'file',
+    'journal_units': ['sshd.service'],  # Debian/Ubuntu: 'ssh.service'
+    'journal_cursor_file': '/var/lib/sins/ssh_journal.cursor',
+    
+    # Snapshot de los intentos fallidos en curso (None = desactivado)
+    'state_file': '/var/lib/sins/ssh_state.pkl',
+    'state_interval': 60,
+    
     # Umbrales de detección
     'failed_login_threshold': 5,    # Intentos fallidos para alertar
     'time_window': 300,             # Ventana de tiempo (segundos)
     
+    # Eventos de sshd_parser que cuentan como intento fallido
+    # (failed_login, invalid_user, max_attempts, auth_failure). Los demás
+    # repiten un intento que sshd ya registra como "Failed password"
+    # (Invalid user, PAM, máximo de intentos): añadirlos cuenta doble
+    'failed_events': ['failed_login'],
+    
     # Palabras clave en logs
     'failed_keywords': [
         'Failed password',
@@ -109,7 +192,34 @@ HONEYPOT = {
     
     # Host y configuración
     'host': '0.0.0.0',  # Escuchar en todas las interfaces
-    'backlog': 5        # Cola de conexiones
+    'backlog': 1024,    # Cola de conexiones (el kernel la limita a net.core.somaxconn)
+    
+    # Sesiones (todas en un único bucle asyncio)
+    'max_sessions': 5000,     # Conexiones simultáneas (por trabajador); las de más se cierran
+    'session_timeout': 5,     # Segundos sin recibir nada antes de cerrar la sesión
+    'session_bytes': 65536,   # Máximo de bytes leídos por sesión
+    'session_duration': 30,   # Máximo de segundos por sesión
+    'stats_interval': 60,     # Segundos entre líneas de estadísticas (0 = desactivado)
+    
+    # Cola de alertas hacia la BD: 'drop_oldest', 'coalesce' o 'spill' (como NETWORK_IDS)
+    'alert_max_queue': 10000,
+    'alert_overflow': 'coalesce',
+    'alert_spill_file': '/var/lib/sins/honeypot_alerts.spill.jsonl',
+    
+    # Transcripciones de las sesiones (JSON lines gzip, rotativo; None = desactivado)
+    'capture_file': '/var/lib/sins/honeypot_capture.jsonl.gz',
+    'capture_max_bytes': 50 * 1024 * 1024,  # Tamaño comprimido antes de rotar
+    'capture_backups': 5,                   # Ficheros rotados que se conservan
+    
+    # Agregación por (IP, servicio, tipo de ataque) y ventana: el primer hit
+    # se registra al momento y los demás en una fila al cerrar la ventana,
+    # con su número en Paquetes_Detectados (0 = una por conexión)
+    'aggregate_window': 60,       # Segundos
+    'aggregate_max_keys': 10000,  # Ventanas abiertas; al llenarse se cierra la más antigua
+    'payload_sample': 512,        # Bytes del payload de muestra guardados en Payload
+    
+    # Procesos que comparten los puertos con SO_REUSEPORT (1 = un solo proceso)
+    'workers': 1
 }
 
 # =============================================================================
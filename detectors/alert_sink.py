@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Alert Sink - Escritor de alertas compartido por todos los detectores
+Mantiene conexiones persistentes a SQL Server y agrupa las alertas en
+INSERT multi-fila desde un hilo en segundo plano
+
+La cola entre detección y persistencia es acotada: submit() nunca
+bloquea en E/S de red. Al llenarse se aplica la política de desborde:
+- drop_oldest: descarta la alerta pendiente más antigua
+- coalesce:    fusiona la alerta con una pendiente del mismo tipo/IP
+               (incrementa 'count'); si no hay ninguna, se descarta
+- spill:       vuelca la alerta a un fichero JSON lines que se reinyecta
+               cuando la cola se vacía
+
+Uso:
+    sink = AlertSink(db_config, table='Live_Alerts', overflow='coalesce')
+    sink.submit({'type': 'Port Scanning', 'src_ip': '10.0.0.5', 'severity': 'MEDIUM',
+                 'ts': record.ts})
+    ...
+    sink.stats()  # queued, dropped, coalesced, spilled, flushed, failed, depth
+    sink.close()  # Escribe las alertas pendientes
+"""
+
+import json
+import os
+import queue
+import time
+from collections import deque
+from datetime import datetime
+from threading import Thread, Condition
+
+from metrics import LatencyHistogram
+
+try:
+    import pymssql
+except ImportError:  # Solo necesario al escribir en SQL Server
+    pymssql = None
+
+# Columnas de Live_Alerts: (columna SQL, clave en la alerta, valor por defecto)
+# 'ts' es el tiempo del evento (epoch, p.ej. el timestamp del paquete); se
+# convierte a DATETIME en el hilo de escritura, fuera del camino caliente
+ALERT_COLUMNS = (
+    ('TipoAtaque', 'type', None),
+    ('IP_Origen', 'src_ip', None),
+    ('Severidad', 'severity', None),
+    ('Puerto_Destino', 'dst_port', 0),
+    ('Protocolo', 'protocol', 'TCP'),
+    ('Timestamp', 'ts', None),
+)
+
+# Columnas opcionales de Live_Alerts que un detector puede añadir con
+# AlertSink(extra_columns=...), p.ej. alertas agregadas con contador
+COUNT_COLUMN = ('Paquetes_Detectados', 'count', 1)
+PAYLOAD_COLUMN = ('Payload', 'payload', None)
+
+# Límites de SQL Server para una sola sentencia INSERT ... VALUES
+MAX_SQL_PARAMS = 2100
+MAX_VALUES_ROWS = 1000
+
+OVERFLOW_POLICIES = ('drop_oldest', 'coalesce', 'spill')
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones persistentes a SQL Server
+    Evita pagar el login TCP+TDS en cada alerta
+    """
+
+    def __init__(self, db_config, size=2):
+        self.db_config = db_config
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        """Obtiene una conexión libre o abre una nueva"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            if pymssql is None:
+                raise RuntimeError("pymssql no instalado. Ejecuta: sudo pip3 install pymssql")
+            return pymssql.connect(**self.db_config)
+
+    def release(self, conn, broken=False):
+        """Devuelve la conexión al pool (o la descarta si falló)"""
+        if broken:
+            self._discard(conn)
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._discard(conn)
+
+    def close(self):
+        """Cierra todas las conexiones libres"""
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class AlertSink:
+    """
+    Cola acotada de alertas con escritura por lotes en Live_Alerts
+    Un hilo en segundo plano vacía la cola cuando alcanza batch_size
+    alertas o cuando la más antigua supera max_delay segundos
+    """
+
+    def __init__(self, db_config, table='Live_Alerts', batch_size=100,
+                 max_delay=1.0, pool_size=2, max_queue=10000,
+                 overflow='drop_oldest', spill_path=None, on_alert=None,
+                 extra_columns=()):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Política de desborde desconocida: {overflow}")
+        if overflow == 'spill' and not spill_path:
+            raise ValueError("La política 'spill' requiere spill_path")
+
+        self.table = table
+        self.pool = ConnectionPool(db_config, size=pool_size)
+        self.columns = ALERT_COLUMNS + tuple(extra_columns)
+
+        max_rows = min(MAX_VALUES_ROWS, MAX_SQL_PARAMS // len(self.columns))
+        self.batch_size = max(1, min(batch_size, max_rows))
+        self.max_delay = max_delay
+        self.max_queue = max(1, max_queue)
+        self.overflow = overflow
+        self.spill_path = spill_path
+
+        # Callback ejecutado en el hilo de escritura (p.ej. log en consola)
+        self.on_alert = on_alert
+
+        self._pending = deque()
+        self._by_key = {}
+        self._oldest = None
+        self._spill_file = None
+        self._cond = Condition()
+        self._thread = None
+        self._running = False
+
+        self.counters = {
+            'queued': 0,
+            'dropped': 0,
+            'coalesced': 0,
+            'spilled': 0,
+            'flushed': 0,
+            'failed': 0
+        }
+        # Latencia de cada INSERT multi-fila (adquirir conexión + commit)
+        self.flush_latency = LatencyHistogram()
+
+    def start(self):
+        """Arranca el hilo de escritura (idempotente)"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._thread = Thread(target=self._run, name='alert-sink', daemon=True)
+            self._thread.start()
+
+    def submit(self, alert):
+        """Encola una alerta sin bloquear en la base de datos"""
+        if not self._running:
+            self.start()
+
+        # Alertas sin tiempo de evento (honeypot, SSH): el de encolado
+        if 'ts' not in alert:
+            alert['ts'] = time.time()
+
+        with self._cond:
+            key = (alert.get('type'), alert.get('src_ip'))
+
+            if len(self._pending) >= self.max_queue:
+                if self.overflow == 'coalesce':
+                    self._coalesce(key, alert)
+                    return
+                if self.overflow == 'spill':
+                    self._spill(alert)
+                    return
+                # drop_oldest
+                oldest = self._pending.popleft()
+                self._forget(oldest)
+                self.counters['dropped'] += 1
+
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append(alert)
+            self._by_key[key] = alert
+            self.counters['queued'] += 1
+
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def stats(self):
+        """Copia de los contadores más la profundidad actual de la cola"""
+        with self._cond:
+            snapshot = dict(self.counters)
+            snapshot['depth'] = len(self._pending)
+        return snapshot
+
+    def flush(self):
+        """Escribe inmediatamente todas las alertas pendientes"""
+        with self._cond:
+            batch = self._take_all()
+        self._write(batch)
+        self._replay_spill()
+
+    def write_batch(self, alerts):
+        """
+        Escribe una lista de alertas ya conocida (ingesta histórica) en el
+        hilo llamante, con INSERT multi-fila de batch_size filas y sin
+        pasar por la cola acotada
+        """
+        for alert in alerts:
+            alert.setdefault('ts', time.time())
+        with self._cond:
+            self.counters['queued'] += len(alerts)
+        self._write(alerts)
+
+    def close(self):
+        """Detiene el hilo, escribe lo pendiente y cierra el pool"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self.pool.close()
+
+    def _coalesce(self, key, alert):
+        """Fusiona la alerta con una pendiente del mismo tipo e IP"""
+        pending = self._by_key.get(key)
+        if pending is None:
+            self.counters['dropped'] += 1
+            return
+        pending['count'] = pending.get('count', 1) + alert.get('count', 1)
+        self.counters['coalesced'] += 1
+
+    def _spill(self, alert):
+        """Vuelca la alerta a disco cuando la cola está llena"""
+        try:
+            if self._spill_file is None:
+                self._spill_file = open(self.spill_path, 'a', encoding='utf-8')
+            self._spill_file.write(json.dumps(alert, default=str) + '\n')
+            self.counters['spilled'] += 1
+        except OSError:
+            self.counters['dropped'] += 1
+
+    def _replay_spill(self):
+        """
+        Reinyecta en la base de datos las alertas volcadas a disco
+        El fichero .replay solo se borra si todo se escribió; si no, se
+        reescribe con los lotes fallidos y se reintenta en la siguiente
+        vuelta (mientras tanto el desborde sigue yendo a spill_path)
+        """
+        if self.spill_path is None:
+            return
+        replay_path = self.spill_path + '.replay'
+        with self._cond:
+            if not os.path.exists(replay_path):
+                if self._spill_file is None:
+                    return
+                self._spill_file.close()
+                self._spill_file = None
+                os.replace(self.spill_path, replay_path)
+
+        failed = []
+        batch = []
+        with open(replay_path, encoding='utf-8') as f:
+            for line in f:
+                batch.append(json.loads(line))
+                if len(batch) >= self.batch_size:
+                    failed += self._write(batch)
+                    batch = []
+        failed += self._write(batch)
+
+        if not failed:
+            os.remove(replay_path)
+            return
+        temp_path = replay_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for alert in failed:
+                f.write(json.dumps(alert, default=str) + '\n')
+        os.replace(temp_path, replay_path)
+
+    def _forget(self, alert):
+        key = (alert.get('type'), alert.get('src_ip'))
+        if self._by_key.get(key) is alert:
+            del self._by_key[key]
+
+    def _take_all(self):
+        batch = list(self._pending)
+        self._pending.clear()
+        self._by_key.clear()
+        self._oldest = None
+        return batch
+
+    def _run(self):
+        """Bucle del hilo de escritura: agrupa por tamaño o antigüedad"""
+        while True:
+            with self._cond:
+                while self._running:
+                    if len(self._pending) >= self.batch_size:
+                        break
+                    if self._pending:
+                        remaining = self.max_delay - (time.monotonic() - self._oldest)
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+
+                if not self._running:
+                    return
+                batch = self._take_all()
+
+            self._write(batch)
+            if not self._pending:
+                self._replay_spill()
+
+    def _write(self, batch):
+        """Inserta el lote con INSERT multi-fila; devuelve las alertas no escritas"""
+        if self.on_alert is not None:
+            for alert in batch:
+                try:
+                    self.on_alert(alert)
+                except Exception as e:
+                    print(f"✗ Error en callback de alerta: {e}")
+
+        failed = []
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+
+            columns = ', '.join(column for column, _, _ in self.columns)
+            row = '(' + ', '.join(['%s'] * len(self.columns)) + ')'
+            query = (
+                f"INSERT INTO {self.table} ({columns}) "
+                f"VALUES {', '.join([row] * len(chunk))}"
+            )
+
+            params = []
+            for alert in chunk:
+                for _, key, default in self.columns:
+                    value = alert.get(key, default)
+                    if key == 'ts':
+                        value = datetime.fromtimestamp(value) if value else datetime.now()
+                    params.append(value)
+
+            conn = None
+            started = time.perf_counter_ns()
+            try:
+                conn = self.pool.acquire()
+                cursor = conn.cursor()
+                cursor.execute(query, tuple(params))
+                conn.commit()
+                cursor.close()
+                self.pool.release(conn)
+                self.flush_latency.observe(time.perf_counter_ns() - started)
+
+                with self._cond:
+                    self.counters['flushed'] += len(chunk)
+                print(f"✓ {len(chunk)} ataque(s) registrado(s) en {self.table}")
+
+            except Exception as e:
+                if conn is not None:
+                    self.pool.release(conn, broken=True)
+                with self._cond:
+                    self.counters['failed'] += len(chunk)
+                failed += chunk
+                print(f"✗ Error guardando {len(chunk)} ataque(s) en BD: {e}")
+        return failed
+
+
+class MemorySink:
+    """
+    Sink en memoria con la misma interfaz que AlertSink (sin SQL Server)
+    Para replay de pcaps, benchmarks y pruebas: guarda las alertas en una
+    lista (acotada si max_alerts) y cuenta cuántas hay de cada tipo
+    """
+
+    def __init__(self, max_alerts=None, on_alert=None):
+        self.alerts = deque(maxlen=max_alerts)
+        self.by_type = {}
+        self.on_alert = on_alert
+        self.counters = {
+            'queued': 0,
+            'dropped': 0,
+            'coalesced': 0,
+            'spilled': 0,
+            'flushed': 0,
+            'failed': 0
+        }
+
+    def submit(self, alert):
+        if self.alerts.maxlen is not None and len(self.alerts) == self.alerts.maxlen:
+            self.counters['dropped'] += 1
+        self.alerts.append(alert)
+        attack_type = alert.get('type')
+        self.by_type[attack_type] = self.by_type.get(attack_type, 0) + 1
+        self.counters['queued'] += 1
+        self.counters['flushed'] += 1
+        if self.on_alert is not None:
+            self.on_alert(alert)
+
+    def stats(self):
+        snapshot = dict(self.counters)
+        snapshot['depth'] = 0
+        return snapshot
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class QueueSink:
+    """
+    Sink de un proceso trabajador: reenvía las alertas (con su índice)
+    a un multiprocessing.Queue que el proceso principal vuelca en su sink
+    """
+
+    def __init__(self, alert_queue, worker):
+        self.alert_queue = alert_queue
+        self.worker = worker
+
+    def submit(self, alert):
+        alert['worker'] = self.worker
+        self.alert_queue.put(alert)
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
@@ -2,70 +2,343 @@
 """
 Honeypot Simple - Atrae y registra ataques reales
 Simula servicios vulnerables para capturar atacantes
+
+Todos los puertos se sirven desde un único bucle asyncio: cada conexión
+es un asyncio.Protocol ligero (sin hilo ni tarea por cliente), con un
+backlog configurable, un tope de sesiones simultáneas y presupuestos de
+bytes y tiempo por sesión. SSH, HTTP, FTP y MySQL tienen máquinas de
+estado (honeypot_protocols.py) que mantienen la conversación; las
+transcripciones se vuelcan en streaming a un gzip rotativo
+(session_capture.py). El registro nunca bloquea el bucle: las alertas
+van a la cola del AlertSink y la consola se escribe desde su hilo.
+
+Los hits se agregan por (IP origen, servicio, tipo de ataque) en
+ventanas de aggregate_window segundos: el primero se registra en el
+acto con su propia hora y el resto de la ventana en una sola fila al
+cerrarla, con el número de hits en Paquetes_Detectados y una muestra
+del payload. Un escáner que abre 50k conexiones al 2222 genera dos
+filas por ventana, no 50k.
 """
 
-import socket
-import threading
-import pymssql
-import datetime
+import asyncio
+import itertools
+import resource
 import time
+from datetime import datetime
+from alert_sink import AlertSink, COUNT_COLUMN, PAYLOAD_COLUMN
+from honeypot_protocols import CannedSession, session_class
+from metrics import MetricsLogger
+from session_capture import SessionCapture
+from trackers import HitAggregator
+
+# Configuración opcional (config.py junto a los detectores, ver config.example.py)
+try:
+    from config import HONEYPOT as HONEYPOT_CONFIG
+except ImportError:
+    HONEYPOT_CONFIG = {}
+
+# Bytes del envío anterior que se vuelven a clasificar con el siguiente
+# (más que la palabra clave más larga de classify_attack)
+CLASSIFY_OVERLAP = 16
+
+# Conexión DIRECTA a Windows (NO usar Linked Server)
+DB_CONFIG = {
+    'server': '127.0.0.1',
+    'port': 1432,
+    'user': 'sa',
+    'password': 'TU_PASSWORD_AQUI',
+    'database': 'CentralSIEM'
+}
+
+# Servicios simulados por defecto (puerto -> nombre)
+DEFAULT_SERVICES = {
+    2222: 'SSH Honeypot',
+    8080: 'HTTP Honeypot',
+    3306: 'MySQL Honeypot',
+    5432: 'PostgreSQL Honeypot',
+    1433: 'MSSQL Honeypot',
+    21: 'FTP Honeypot'
+}
+
+
+class HoneypotSession(asyncio.Protocol):
+    """
+    Una conexión de atacante: la máquina de estado del servicio responde
+    a cada mensaje hasta que la sesión termina o agota su presupuesto de
+    bytes o de tiempo. Al cerrar se registra el ataque con una muestra
+    del inicio de lo recibido. La clasificación se hace sobre todo lo
+    recibido (hasta session_bytes), trozo a trozo según llega
+    """
+
+    __slots__ = ('honeypot', 'port', 'transport', 'peer', 'timer', 'machine',
+                 'sid', 'received', 'sample', 'tail', 'attack_type', 'deadline', 'reason')
+
+    def __init__(self, honeypot, port):
+        self.honeypot = honeypot
+        self.port = port
+        self.transport = None
+        self.peer = None
+        self.timer = None
+        self.machine = None
+
+    def connection_made(self, transport):
+        honeypot = self.honeypot
+        if honeypot.active >= honeypot.max_sessions:
+            # Tope de sesiones: cerrar sin atender (y sin reservar nada)
+            honeypot.stats['rejected'] += 1
+            transport.abort()
+            return
+        honeypot.active += 1
+        honeypot.stats['connections'] += 1
+        self.transport = transport
+        self.peer = transport.get_extra_info('peername') or ('?', 0)
+        self.machine = honeypot.machines[self.port](self.peer[0])
+        self.sid = next(honeypot.session_ids)
+        self.received = 0
+        self.sample = b''
+        self.tail = b''
+        self.attack_type = honeypot.default_types[self.port]
+        self.reason = 'closed'
+
+        loop = honeypot.loop
+        self.deadline = loop.time() + honeypot.session_duration
+        if honeypot.capture is not None:
+            honeypot.capture.record(self.sid, 'open', ip=self.peer[0],
+                                    src_port=self.peer[1], port=self.port)
+        greeting = self.machine.greeting()
+        if greeting:
+            self.send(greeting)
+        self.timer = loop.call_later(honeypot.session_timeout, self.on_timeout)
+
+    def send(self, data):
+        self.transport.write(data)
+        if self.honeypot.capture is not None:
+            self.honeypot.capture.record(self.sid, 'out', data)
+
+    def data_received(self, data):
+        honeypot = self.honeypot
+        left = honeypot.session_bytes - self.received
+        if len(data) > left:
+            data = data[:left]
+        self.received += len(data)
+        if honeypot.capture is not None:
+            honeypot.capture.record(self.sid, 'in', data)
+        if len(self.sample) < honeypot.payload_sample:
+            self.sample += data[:honeypot.payload_sample - len(self.sample)]
+        if self.attack_type == honeypot.default_types[self.port]:
+            # Hasta encontrar un tipo concreto; el final del trozo anterior
+            # cubre las palabras clave partidas entre dos envíos
+            self.attack_type = honeypot.classify_attack(
+                honeypot.services[self.port], self.tail + data)
+            self.tail = data[-CLASSIFY_OVERLAP:]
+
+        # Respuesta falsa del servicio para parecer real
+        reply, done = self.machine.feed(data)
+        if reply:
+            self.send(reply)
+        if done:
+            self.finish('done')
+        elif self.received >= honeypot.session_bytes:
+            honeypot.stats['truncated'] += 1
+            self.finish('bytes')
+        else:
+            # Timeout de inactividad sin pasar del límite de duración
+            self.timer.cancel()
+            loop = honeypot.loop
+            remaining = self.deadline - loop.time()
+            self.timer = loop.call_later(min(honeypot.session_timeout, remaining), self.on_timeout)
+
+    def finish(self, reason):
+        """Cierra la sesión tras enviar la última respuesta"""
+        self.reason = reason
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.transport.close()
+
+    def on_timeout(self):
+        self.timer = None
+        if self.honeypot.loop.time() >= self.deadline:
+            self.reason = 'duration'
+            self.honeypot.stats['truncated'] += 1
+        else:
+            self.reason = 'idle'
+            self.honeypot.stats['timeouts'] += 1
+        self.transport.abort()
+
+    def connection_lost(self, exc):
+        if self.transport is None:
+            return
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        honeypot = self.honeypot
+        honeypot.active -= 1
+        if honeypot.capture is not None:
+            honeypot.capture.record(self.sid, 'close', reason=self.reason, bytes_in=self.received)
+        if self.received:
+            honeypot.log_attack(self.port, self.peer[0], self.peer[1], self.sample,
+                                self.attack_type)
+        self.transport = None
+        self.machine = None
+
+
+def report_attack(attack):
+    """Log en consola de un ataque (ejecutado en el hilo del AlertSink)"""
+    print(f"\n⚠️  ATAQUE DETECTADO ⚠️")
+    print(f"Servicio: {attack.get('service')}")
+    print(f"IP Origen: {attack['src_ip']}:{attack.get('src_port')}")
+    print(f"Tipo: {attack['type']} ({attack['severity']})")
+    if 'first_seen' in attack:
+        print(f"Hits: {attack['count']} más "
+              f"({datetime.fromtimestamp(attack['first_seen'])} → "
+              f"{datetime.fromtimestamp(attack['last_seen'])})")
+    else:
+        print(f"Timestamp: {datetime.fromtimestamp(attack['ts'])}")
+    if attack.get('payload'):
+        print(f"Datos recibidos: {attack['payload'][:100]!r}...")
+    print("-" * 50)
+
+
+def make_sink(settings):
+    """
+    Escritor de alertas compartido (pool de conexiones + INSERT por lotes)
+    La cola es acotada y el log en consola se hace en su hilo, fuera del
+    bucle. También lo usa el proceso principal del modo multiproceso
+    """
+    return AlertSink(
+        DB_CONFIG,
+        table='Live_Alerts',
+        max_queue=settings.get('alert_max_queue', 10000),
+        overflow=settings.get('alert_overflow', 'coalesce'),
+        spill_path=settings.get('alert_spill_file'),
+        on_alert=report_attack,
+        extra_columns=(COUNT_COLUMN, PAYLOAD_COLUMN)
+    )
+
 
 class SimpleHoneypot:
     """
     Honeypot que simula servicios vulnerables para atraer atacantes reales
     """
     
-    def __init__(self):
-        self.db_config = {
-            'server': '127.0.0.1',
-            'port': 1432,
-            'user': 'sa',
-            'password': 'TU_PASSWORD_AQUI',
-            'database': 'CentralSIEM'
-        }
+    def __init__(self, settings=None, sink=None):
+        self.settings = HONEYPOT_CONFIG if settings is None else settings
+        self.db_config = DB_CONFIG
         
-        # Servicios a simular
-        self.services = {
-            2222: 'SSH Honeypot',
-            8080: 'HTTP Honeypot',
-            3306: 'MySQL Honeypot',
-            5432: 'PostgreSQL Honeypot',
-            1433: 'MSSQL Honeypot',
-            21: 'FTP Honeypot'
-        }
+        # Servicios a simular (config.py: {puerto: 'SSH'}, ...)
+        ports = self.settings.get('ports')
+        if ports:
+            self.services = {port: f'{name} Honeypot' for port, name in ports.items()}
+        else:
+            self.services = dict(DEFAULT_SERVICES)
+        self.machines = {port: self.session_factory(service) for port, service in self.services.items()}
+        self.default_types = {port: self.classify_attack(service, b'') for port, service in self.services.items()}
+        
+        # Servidor: cola de aceptación, tope de sesiones y presupuestos por sesión
+        self.host = self.settings.get('host', '0.0.0.0')
+        self.backlog = self.settings.get('backlog', 1024)
+        self.max_sessions = self.settings.get('max_sessions', 5000)
+        self.session_timeout = self.settings.get('session_timeout', 5)
+        self.session_bytes = self.settings.get('session_bytes', 65536)
+        self.session_duration = self.settings.get('session_duration', 30)
+        self.session_ids = itertools.count(1)
+        
+        # Transcripciones de las sesiones (None = sin captura)
+        self.capture = None
+        capture_file = self.settings.get('capture_file')
+        if capture_file:
+            self.capture = SessionCapture(
+                capture_file,
+                max_bytes=self.settings.get('capture_max_bytes', 50 * 1024 * 1024),
+                backups=self.settings.get('capture_backups', 5)
+            )
+        self.stats_interval = self.settings.get('stats_interval', 60)
+        
+        # Agregación de hits repetidos (0 = una alerta por conexión)
+        window = self.settings.get('aggregate_window', 60)
+        self.hits = None
+        if window:
+            self.hits = HitAggregator(window, self.settings.get('aggregate_max_keys', 10000))
+        self.payload_sample = self.settings.get('payload_sample', 512)
+        self._flush_timer = None
+        
+        # Modo multiproceso (honeypot_workers.py): varios procesos con el
+        # mismo puerto (SO_REUSEPORT); solo el primero anuncia los servicios
+        self.reuse_port = False
+        self.announce = True
+        
+        self.loop = None
+        self.active = 0
+        self.stats = {'connections': 0, 'attacks': 0, 'rejected': 0, 'timeouts': 0, 'truncated': 0}
+        self._stop = None
+        
+        self.sink = sink if sink is not None else make_sink(self.settings)
+    
+    def session_factory(self, service):
+        """Máquina de estado del servicio; si no tiene, respuesta fija"""
+        cls = session_class(service)
+        if cls is not None:
+            return cls
+        response = self.fake_response(service)
+        return lambda ip: CannedSession(ip, response)
     
-def log_attack(self, service, client_ip, client_port, data):
-    """Registra ataque en la base de datos"""
-    try:
-        # Conexión DIRECTA a Windows (NO usar Linked Server)
-        conn = pymssql.connect(
-            server=self.db_config['server'],  # 10.0.90.66
-            port=self.db_config['port'],      # 1433
-            user=self.db_config['user'],      # chadi
-            password=self.db_config['password'], # pass
-            database=self.db_config['database']  # SensorDB
-        )
-        cursor = conn.cursor()
-        
-        attack_type = self.classify_attack(service, data)
-        severity = self.get_severity(attack_type)
-        service_port = [port for port, name in self.services.items() if name == service][0]
-        
-        query = """
-            INSERT INTO Live_Alerts 
-            (TipoAtaque, IP_Origen, Severidad, Puerto_Destino, Protocolo, Timestamp)
-            VALUES (%s, %s, %s, %s, %s, GETDATE())
+    def fake_response(self, service):
+        """Respuesta falsa del servicio para parecer real"""
+        if 'SSH' in service:
+            return b"SSH-2.0-OpenSSH_7.4\r\n"
+        elif 'HTTP' in service:
+            return b"HTTP/1.1 200 OK\r\nServer: Apache/2.4.41\r\n\r\n"
+        elif 'MySQL' in service:
+            return b"\x4a\x00\x00\x00\x0a5.7.33-0ubuntu0.18.04.1\x00"
+        elif 'FTP' in service:
+            return b"220 FTP Server Ready\r\n"
+        return b"Service Ready\r\n"
+    
+    def log_attack(self, port, client_ip, client_port, data, attack_type=None):
         """
+        Registra el ataque: suma un hit a su ventana de agregación o,
+        si es el primero, lo encola directamente y abre la ventana
+        (nunca bloquea).
+        data es la muestra guardada en Payload; attack_type, si la sesión
+        ya lo clasificó con todo lo recibido
+        """
+        service = self.services[port]
+        if attack_type is None:
+            attack_type = self.classify_attack(service, data)
+        self.stats['attacks'] += 1
         
-        cursor.execute(query, (attack_type, client_ip, severity, service_port, 'TCP'))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        print(f"✓ Ataque registrado: {attack_type} desde {client_ip}")
+        now = time.time()
+        key = (client_ip, port, attack_type)
+        if self.hits is not None and self.hits.count(key, now):
+            return
         
-    except Exception as e:
-        print(f"✗ Error guardando ataque: {e}")
+        alert = {
+            'type': attack_type,
+            'src_ip': client_ip,
+            'severity': self.get_severity(attack_type),
+            'dst_port': port,
+            'protocol': 'TCP',
+            'service': service,
+            'src_port': client_port,
+            'payload': data[:self.payload_sample].decode('utf-8', 'backslashreplace'),
+            'ts': now
+        }
+        self.sink.submit(alert)
+        if self.hits is not None:
+            self.hits.open(key, alert, now)
+    
+    def flush_hits(self, final=False):
+        """Envía al sink las ventanas de agregación vencidas (todas si final)"""
+        if self.hits is None:
+            return
+        alerts = self.hits.drain() if final else self.hits.due(time.time())
+        for alert in alerts:
+            self.sink.submit(alert)
+    
+    def _flush_tick(self):
+        self.flush_hits()
+        self._flush_timer = self.loop.call_later(1, self._flush_tick)
     
     def classify_attack(self, service, data):
         """Clasifica el tipo de ataque basado en el servicio y datos"""
@@ -105,116 +378,132 @@ def log_attack(self, service, client_ip, client_port, data):
         
         return 'MEDIUM'
     
-    def handle_client(self, client_socket, client_address, service):
-        """Maneja conexión de cliente (atacante)"""
-        client_ip = client_address[0]
-        client_port = client_address[1]
-        
-        print(f"\n⚠️  CONEXIÓN DETECTADA ⚠️")
-        print(f"Servicio: {service}")
-        print(f"IP Origen: {client_ip}:{client_port}")
-        print(f"Timestamp: {datetime.datetime.now()}")
+    def raise_fd_limit(self):
+        """Sube el límite de descriptores abiertos para admitir max_sessions"""
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = self.max_sessions + len(self.services) + 64
+        if soft == resource.RLIM_INFINITY or soft >= wanted:
+            return
+        limit = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+        if limit < wanted:
+            print(f"⚠️  Límite de descriptores {limit}: menos de {self.max_sessions} sesiones posibles")
+    
+    def session_stats(self):
+        """Contadores de sesiones más las sesiones abiertas ahora"""
+        snapshot = dict(self.stats)
+        snapshot['active'] = self.active
+        snapshot['windows'] = len(self.hits) if self.hits is not None else 0
+        return snapshot
+    
+    def stats_line(self):
+        """Resumen de una línea para el log periódico"""
+        sink = self.sink.stats()
+        return (f"sesiones={self.active} conexiones={self.stats['connections']} "
+                f"ataques={self.stats['attacks']} rechazadas={self.stats['rejected']} "
+                f"timeouts={self.stats['timeouts']} recortadas={self.stats['truncated']} "
+                f"ventanas={len(self.hits) if self.hits is not None else 0} "
+                f"cola={sink.get('depth', 0)} descartadas={sink.get('dropped', 0)}")
+    
+    async def serve(self):
+        """Abre todos los servicios en el bucle actual y atiende hasta stop()"""
+        self.loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        servers = []
+        for port, service in self.services.items():
+            try:
+                server = await self.loop.create_server(
+                    lambda port=port: HoneypotSession(self, port),
+                    self.host, port,
+                    backlog=self.backlog,
+                    reuse_address=True,
+                    reuse_port=self.reuse_port
+                )
+                servers.append(server)
+                if self.announce:
+                    print(f"✓ {service} escuchando en puerto {port}")
+            except OSError as e:
+                print(f"✗ Error en {service}: {e}")
         
+        if not servers:
+            print("✗ Ningún servicio pudo arrancar")
+            return
+        if self.hits is not None:
+            self._flush_timer = self.loop.call_later(1, self._flush_tick)
+        if self.capture is not None:
+            self.capture.start()
         try:
-            # Recibir datos del atacante
-            client_socket.settimeout(5)
-            data = client_socket.recv(4096)
-            
-            if data:
-                print(f"Datos recibidos: {data[:100]}...")
-                
-                # Registrar ataque
-                self.log_attack(service, client_ip, client_port, data)
-                
-                # Enviar respuesta falsa para parecer real
-                if 'SSH' in service:
-                    response = b"SSH-2.0-OpenSSH_7.4\r\n"
-                elif 'HTTP' in service:
-                    response = b"HTTP/1.1 200 OK\r\nServer: Apache/2.4.41\r\n\r\n"
-                elif 'MySQL' in service:
-                    response = b"\x4a\x00\x00\x00\x0a5.7.33-0ubuntu0.18.04.1\x00"
-                elif 'FTP' in service:
-                    response = b"220 FTP Server Ready\r\n"
-                else:
-                    response = b"Service Ready\r\n"
-                
-                client_socket.send(response)
-        
-        except socket.timeout:
-            print("Timeout - conexión cerrada")
-        except Exception as e:
-            print(f"Error manejando cliente: {e}")
+            await self._stop.wait()
         finally:
-            client_socket.close()
-            print("-" * 50)
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            for server in servers:
+                server.close()
+            for server in servers:
+                await server.wait_closed()
+            self.flush_hits(final=True)
+            if self.capture is not None:
+                self.capture.close()
     
-    def start_service(self, port, service_name):
-        """Inicia un servicio honeypot en un puerto"""
-        try:
-            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            server.bind(('0.0.0.0', port))
-            server.listen(5)
-            
-            print(f"✓ {service_name} escuchando en puerto {port}")
-            
-            while True:
-                client_socket, client_address = server.accept()
-                
-                # Manejar cada conexión en un thread separado
-                client_thread = threading.Thread(
-                    target=self.handle_client,
-                    args=(client_socket, client_address, service_name)
-                )
-                client_thread.daemon = True
-                client_thread.start()
-        
-        except Exception as e:
-            print(f"✗ Error en {service_name}: {e}")
+    def stop(self):
+        """Detiene serve() (seguro desde otro hilo)"""
+        if self.loop is not None and self._stop is not None:
+            self.loop.call_soon_threadsafe(self._stop.set)
     
-    def start_all(self):
-        """Inicia todos los servicios honeypot"""
+    def print_banner(self):
+        """Cabecera de arranque"""
         print("\n🍯 HONEYPOT - Sistema de Captura de Ataques Reales")
         print("=" * 60)
         print("Los siguientes servicios están simulados para atraer atacantes:")
+        print(f"(backlog {self.backlog}, máx. {self.max_sessions} sesiones, "
+              f"timeout {self.session_timeout} s, máx. {self.session_bytes} bytes "
+              f"y {self.session_duration} s por sesión)")
+        if self.capture is not None:
+            print(f"Transcripciones: {self.capture.path}")
         print()
-        
-        threads = []
-        for port, service in self.services.items():
-            thread = threading.Thread(
-                target=self.start_service,
-                args=(port, service)
-            )
-            thread.daemon = True
-            thread.start()
-            threads.append(thread)
-            time.sleep(0.1)
-        
-        print()
-        print("=" * 60)
-        print("✓ Todos los honeypots activos")
         print("⚠️  ADVERTENCIA: Estos son señuelos para capturar atacantes")
         print("Presiona Ctrl+C para detener")
         print("=" * 60)
         print()
-        
+    
+    def start_all(self):
+        """Inicia todos los servicios honeypot"""
+        self.print_banner()
+        self.raise_fd_limit()
+        logger = None
+        if self.stats_interval:
+            logger = MetricsLogger(self.stats_line, self.stats_interval)
+            logger.start()
         try:
-            # Mantener el programa corriendo
-            while True:
-                time.sleep(1)
+            asyncio.run(self.serve())
         except KeyboardInterrupt:
             print("\n\n✓ Honeypot detenido")
+        finally:
+            if logger is not None:
+                logger.close()
+            self.sink.close()
+            print(f"Resumen: {self.stats_line()}")
 
 def main():
+    import argparse
     import os
-    import sys
+    
+    parser = argparse.ArgumentParser(description='SIEM Real - Honeypot')
+    parser.add_argument('--workers', type=int, default=HONEYPOT_CONFIG.get('workers', 1),
+                        help='Procesos que comparten los puertos (SO_REUSEPORT)')
+    args = parser.parse_args()
     
     # Verificar permisos para puertos bajos
     if os.geteuid() != 0:
         print("⚠️  Advertencia: Algunos puertos (<1024) requieren privilegios root")
         print("Ejecuta con sudo para todos los honeypots")
     
-    honeypot = SimpleHoneypot()
+    if args.workers > 1:
+        from honeypot_workers import ReusePortHoneypot
+        honeypot = ReusePortHoneypot(workers=args.workers)
+    else:
+        honeypot = SimpleHoneypot()
     honeypot.start_all()
 
 if __name__ == '__main__':
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Honeypot Protocols - Máquinas de estado de los servicios señuelo
+Cada sesión del honeypot tiene una máquina que habla lo justo del
+protocolo para que el atacante siga enviando: así se ve el intento
+completo (usuario y contraseña, petición HTTP, versión del cliente SSH)
+y no solo el primer paquete.
+
+- greeting(): lo que el servidor envía al conectar (b'' si espera)
+- feed(data): consume lo recibido y devuelve (respuesta, terminada)
+
+No guardan la sesión: solo el fragmento incompleto del mensaje actual
+(el presupuesto de bytes por sesión lo aplica el honeypot).
+
+Protocolos:
+- SSH:   intercambio de versiones y KEXINIT del cliente (sin cifrado)
+- HTTP:  peticiones con keep-alive, cuerpo por Content-Length
+- FTP:   USER/PASS siempre rechazados, SYST/QUIT; cierre tras 3 intentos
+- MySQL: handshake v10 y HandshakeResponse41 con 'Access denied'
+"""
+
+import os
+import struct
+
+SSH_BANNER = b"SSH-2.0-OpenSSH_7.4\r\n"
+HTTP_SERVER = b"Apache/2.4.41 (Ubuntu)"
+FTP_BANNER = b"220 FTP Server Ready\r\n"
+MYSQL_VERSION = b"5.7.33-0ubuntu0.18.04.1"
+
+# Límites de un mensaje (una línea, cabeceras HTTP, paquete SSH/MySQL)
+MAX_LINE = 8192
+MAX_PACKET = 35000
+
+
+class ProtocolSession:
+    """Base: guarda el fragmento pendiente del mensaje actual"""
+
+    __slots__ = ('ip', 'buffer')
+
+    def __init__(self, ip):
+        self.ip = ip
+        self.buffer = b''
+
+    def greeting(self):
+        return b''
+
+    def feed(self, data):
+        """
+        Sin protocolo que hablar: cerrar tras el primer envío sin responder
+        (lo recibido ya lo registra la sesión del honeypot antes de feed)
+        """
+        return b'', True
+
+    def lines(self, data):
+        """Líneas completas recibidas (sin \\r\\n); None si una línea es demasiado larga"""
+        buffer = self.buffer + data
+        lines = buffer.split(b'\n')
+        self.buffer = lines.pop()
+        if len(self.buffer) > MAX_LINE:
+            return None
+        return [line.rstrip(b'\r') for line in lines]
+
+
+class CannedSession(ProtocolSession):
+    """Servicio sin emulación: responde una vez al primer envío y cierra"""
+
+    __slots__ = ('response',)
+
+    def __init__(self, ip, response):
+        super().__init__(ip)
+        self.response = response
+
+    def feed(self, data):
+        return self.response, True
+
+
+class SSHSession(ProtocolSession):
+    """
+    Versión del servidor -> línea SSH- del cliente -> KEXINIT del cliente
+    Con el KEXINIT (algoritmos ofrecidos) ya se puede identificar la
+    herramienta; para seguir haría falta el intercambio de claves real
+    """
+
+    __slots__ = ('state',)
+
+    def __init__(self, ip):
+        super().__init__(ip)
+        self.state = 'ident'
+
+    def greeting(self):
+        return SSH_BANNER
+
+    def feed(self, data):
+        self.buffer += data
+        if self.state == 'ident':
+            # El cliente empieza por su versión: "SSH-2.0-<software>\r\n"
+            end = self.buffer.find(b'\n')
+            if end < 0:
+                if len(self.buffer) > MAX_LINE:
+                    return b"Protocol mismatch.\r\n", True
+                return b'', False
+            if not self.buffer.startswith(b'SSH-'):
+                return b"Protocol mismatch.\r\n", True
+            self.buffer = self.buffer[end + 1:]
+            self.state = 'kexinit'
+
+        # Paquete binario: uint32 longitud + contenido
+        if len(self.buffer) < 4:
+            return b'', False
+        length = struct.unpack('>I', self.buffer[:4])[0]
+        if length > MAX_PACKET or len(self.buffer) >= 4 + length:
+            return b'', True
+        return b'', False
+
+
+class HTTPSession(ProtocolSession):
+    """Peticiones HTTP/1.x con keep-alive; /admin pide autenticación"""
+
+    __slots__ = ('body_left', 'keep_alive')
+
+    PAGES = {
+        b'/': (b'200 OK', b"<html><body><h1>It works!</h1></body></html>\n"),
+        b'/index.html': (b'200 OK', b"<html><body><h1>It works!</h1></body></html>\n"),
+    }
+
+    def __init__(self, ip):
+        super().__init__(ip)
+        self.body_left = 0
+        self.keep_alive = True
+
+    def feed(self, data):
+        self.buffer += data
+        replies = []
+        while True:
+            if self.body_left:
+                taken = min(self.body_left, len(self.buffer))
+                self.body_left -= taken
+                self.buffer = self.buffer[taken:]
+                if self.body_left:
+                    break
+            end = self.buffer.find(b'\r\n\r\n')
+            if end < 0:
+                if len(self.buffer) > MAX_LINE:
+                    self.keep_alive = False
+                    return b''.join(replies) + self.response(b'400 Bad Request'), True
+                break
+
+            head = self.buffer[:end]
+            self.buffer = self.buffer[end + 4:]
+            request, _, headers = head.partition(b'\r\n')
+            parts = request.split(b' ')
+            if len(parts) != 3 or not parts[2].startswith(b'HTTP/'):
+                self.keep_alive = False
+                return b''.join(replies) + self.response(b'400 Bad Request'), True
+
+            fields = {}
+            for line in headers.split(b'\r\n'):
+                name, _, value = line.partition(b':')
+                fields[name.strip().lower()] = value.strip()
+            try:
+                self.body_left = int(fields.get(b'content-length', b'0'))
+            except ValueError:
+                self.body_left = 0
+            connection = fields.get(b'connection', b'').lower()
+            self.keep_alive = (parts[2] == b'HTTP/1.1' and connection != b'close'
+                               or connection == b'keep-alive')
+            replies.append(self.route(parts[0], parts[1]))
+            if not self.keep_alive:
+                return b''.join(replies), True
+        return b''.join(replies), False
+
+    def route(self, method, path):
+        path = path.split(b'?', 1)[0]
+        if path.startswith(b'/admin') or path.startswith(b'/manager'):
+            return self.response(b'401 Unauthorized',
+                                 extra=b'WWW-Authenticate: Basic realm="Restricted"\r\n')
+        status, body = self.PAGES.get(path, (b'404 Not Found', b"<html><body><h1>Not Found</h1></body></html>\n"))
+        if method == b'HEAD':
+            return self.response(status, length=len(body))
+        return self.response(status, body)
+
+    def response(self, status, body=b'', extra=b'', length=None):
+        return (b"HTTP/1.1 " + status + b"\r\nServer: " + HTTP_SERVER + b"\r\n" + extra
+                + b"Content-Type: text/html\r\nContent-Length: "
+                + str(len(body) if length is None else length).encode()
+                + (b"\r\n\r\n" if self.keep_alive else b"\r\nConnection: close\r\n\r\n") + body)
+
+
+class FTPSession(ProtocolSession):
+    """USER/PASS siempre rechazados; se cierra tras max_attempts contraseñas"""
+
+    __slots__ = ('username', 'attempts')
+
+    max_attempts = 3
+
+    def __init__(self, ip):
+        super().__init__(ip)
+        self.username = None
+        self.attempts = 0
+
+    def greeting(self):
+        return FTP_BANNER
+
+    def feed(self, data):
+        lines = self.lines(data)
+        if lines is None:
+            return b"500 Command line too long.\r\n", True
+        replies = []
+        for line in lines:
+            command, _, argument = line.partition(b' ')
+            command = command.upper()
+            if command == b'USER':
+                self.username = argument
+                replies.append(b"331 Password required for " + argument[:64] + b"\r\n")
+            elif command == b'PASS':
+                self.attempts += 1
+                if self.attempts >= self.max_attempts:
+                    replies.append(b"421 Too many login failures, closing control connection.\r\n")
+                    return b''.join(replies), True
+                replies.append(b"530 Login incorrect.\r\n")
+            elif command == b'QUIT':
+                replies.append(b"221 Goodbye.\r\n")
+                return b''.join(replies), True
+            elif command == b'SYST':
+                replies.append(b"215 UNIX Type: L8\r\n")
+            elif command in (b'FEAT', b'AUTH'):
+                replies.append(b"502 Command not implemented.\r\n")
+            elif command:
+                replies.append(b"530 Please login with USER and PASS.\r\n")
+        return b''.join(replies), False
+
+
+class MySQLSession(ProtocolSession):
+    """Handshake v10 -> HandshakeResponse41 del cliente -> error 1045"""
+
+    __slots__ = ('connection_id',)
+
+    def __init__(self, ip):
+        super().__init__(ip)
+        self.connection_id = int.from_bytes(os.urandom(2), 'little') + 1
+
+    @staticmethod
+    def packet(sequence, payload):
+        return struct.pack('<I', len(payload))[:3] + bytes((sequence,)) + payload
+
+    def greeting(self):
+        salt = bytes(b % 94 + 33 for b in os.urandom(20))   # Imprimible, sin NUL
+        capabilities = 0xf7ff | 0x81bf << 16                  # PROTOCOL_41, PLUGIN_AUTH... (sin SSL)
+        payload = (b'\x0a' + MYSQL_VERSION + b'\x00'
+                   + struct.pack('<I', self.connection_id)
+                   + salt[:8] + b'\x00'
+                   + struct.pack('<H', capabilities & 0xffff)
+                   + b'\x21' + struct.pack('<H', 0x0002)
+                   + struct.pack('<H', capabilities >> 16)
+                   + bytes((len(salt) + 1,)) + b'\x00' * 10
+                   + salt[8:] + b'\x00'
+                   + b'mysql_native_password\x00')
+        return self.packet(0, payload)
+
+    def feed(self, data):
+        self.buffer += data
+        if len(self.buffer) < 4:
+            return b'', False
+        length = int.from_bytes(self.buffer[:3], 'little')
+        if len(self.buffer) < 4 + length:
+            return (b'', True) if length > MAX_PACKET else (b'', False)
+
+        sequence = self.buffer[3]
+        payload = self.buffer[4:4 + length]
+        if length == 32:
+            # SSLRequest: no hay TLS que ofrecer
+            return b'', True
+        username = payload[32:].split(b'\x00', 1)[0] if length > 32 else b''
+        message = (b"Access denied for user '" + username[:64] + b"'@'"
+                   + self.ip.encode() + b"' (using password: YES)")
+        error = b'\xff' + struct.pack('<H', 1045) + b'#28000' + message
+        return self.packet((sequence + 1) & 0xff, error), True
+
+
+# Servicio (subcadena del nombre) -> máquina de estado
+PROTOCOLS = (
+    ('SSH', SSHSession),
+    ('HTTP', HTTPSession),
+    ('FTP', FTPSession),
+    ('MySQL', MySQLSession),
+)
+
+
+def session_class(service):
+    """Máquina de estado del servicio o None si no tiene emulación"""
+    for name, cls in PROTOCOLS:
+        if name in service:
+            return cls
+    return None
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Honeypot Workers - Modo multiproceso del honeypot
+N procesos trabajadores abren todos los puertos del honeypot con
+SO_REUSEPORT: el kernel reparte las conexiones entrantes entre ellos
+(por hash de la 4-tupla), así la clasificación y el registro de ataques
+usan varios núcleos sin compartir nada entre procesos. Cada trabajador
+ejecuta su propio bucle asyncio de SimpleHoneypot y envía cada hit al
+proceso principal, que los agrega (una ventana por IP, servicio y tipo
+aunque las conexiones caigan en trabajadores distintos), los escribe en
+un único AlertSink y muestra las estadísticas de cada trabajador. Cada
+trabajador escribe sus transcripciones en su propio fichero
+(captura.w<N>.jsonl.gz).
+
+Requiere Linux >= 3.9 (SO_REUSEPORT con reparto de carga).
+"""
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from threading import Thread, Lock
+
+from alert_sink import QueueSink
+from honeypot import SimpleHoneypot, HONEYPOT_CONFIG, make_sink
+from metrics import MetricsLogger
+from trackers import HitAggregator
+
+# Cada cuántos segundos informa un trabajador de sus contadores
+STATS_EVERY = 5
+
+
+async def run_worker(index, honeypot, alert_queue):
+    """Sirve los puertos hasta SIGINT/SIGTERM informando de las estadísticas"""
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, honeypot.stop)
+    serving = asyncio.ensure_future(honeypot.serve())
+    while not serving.done():
+        await asyncio.wait({serving}, timeout=STATS_EVERY)
+        alert_queue.put({'_worker_stats': index, 'stats': honeypot.session_stats()})
+    await serving
+
+
+def worker_path(path, index):
+    """Fichero propio de un trabajador: captura.jsonl.gz -> captura.w0.jsonl.gz"""
+    directory, name = os.path.split(path)
+    stem, dot, extension = name.partition('.')
+    return os.path.join(directory, f"{stem}.w{index}{dot}{extension}")
+
+
+def worker_main(index, alert_queue, settings):
+    """Proceso trabajador: un SimpleHoneypot con los puertos compartidos"""
+    honeypot = SimpleHoneypot(settings, sink=QueueSink(alert_queue, index))
+    honeypot.reuse_port = True
+    honeypot.announce = index == 0
+    # La agregación se hace en el proceso principal, con los hits de todos
+    honeypot.hits = None
+    if honeypot.announce:
+        honeypot.print_banner()
+    honeypot.raise_fd_limit()
+    if honeypot.capture is not None:
+        honeypot.capture.path = worker_path(honeypot.capture.path, index)
+
+    try:
+        asyncio.run(run_worker(index, honeypot, alert_queue))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        alert_queue.put({'_worker_done': index, 'stats': honeypot.session_stats()})
+
+
+class ReusePortHoneypot:
+    """
+    Honeypot repartido en N procesos que comparten los puertos
+    """
+
+    def __init__(self, workers=None, settings=None):
+        self.settings = HONEYPOT_CONFIG if settings is None else settings
+        self.workers = workers or os.cpu_count() or 1
+
+        # Proceso principal: solo el sink (con log en consola) y la agregación
+        self.sink = make_sink(self.settings)
+        self.stats_interval = self.settings.get('stats_interval', 60)
+        window = self.settings.get('aggregate_window', 60)
+        self.hits = None
+        if window:
+            self.hits = HitAggregator(window, self.settings.get('aggregate_max_keys', 10000))
+
+        self._procs = []
+        self._alert_queue = None
+        self._merger = None
+        self.worker_stats = {}
+        # Agregación compartida entre el hilo de fusión y stop_workers();
+        # tras el vaciado final ya no se envía nada al sink
+        self._hits_lock = Lock()
+        self._closed = False
+
+    def start_workers(self):
+        """Lanza los trabajadores y el hilo que fusiona sus alertas"""
+        self._alert_queue = multiprocessing.Queue()
+        for index in range(self.workers):
+            proc = multiprocessing.Process(
+                target=worker_main,
+                args=(index, self._alert_queue, self.settings),
+                name=f'honeypot-worker-{index}',
+                daemon=True
+            )
+            proc.start()
+            self._procs.append(proc)
+
+        self._merger = Thread(target=self._merge_alerts, name='honeypot-merger', daemon=True)
+        self._merger.start()
+
+    def stop_workers(self):
+        """
+        Detiene los trabajadores, espera sus últimas alertas y cierra todas
+        las ventanas de agregación (aunque algún trabajador muriera sin avisar)
+        """
+        for proc in self._procs:
+            if proc.is_alive():
+                proc.terminate()
+        for proc in self._procs:
+            proc.join(timeout=10)
+        if self._merger is not None:
+            self._merger.join(timeout=10)
+        with self._hits_lock:
+            self._flush_hits(final=True)
+            self._closed = True
+
+    def _merge_alerts(self):
+        """
+        Agrega los hits de todos los trabajadores y pasa las alertas al
+        sink único; cada segundo cierra las ventanas vencidas aunque no
+        lleguen hits nuevos. Termina cuando todos los trabajadores han
+        avisado de su fin o han salido (uno matado no avisa) y la cola
+        está vacía; el vaciado final lo hace stop_workers()
+        """
+        done = set()
+        next_flush = time.monotonic() + 1
+        while len(done) < self.workers:
+            try:
+                alert = self._alert_queue.get(timeout=max(0, next_flush - time.monotonic()))
+            except queue.Empty:
+                alert = None
+                if all(proc.exitcode is not None for proc in self._procs):
+                    # Lo que enviaron antes de salir ya está en la cola
+                    break
+
+            if alert is None:
+                pass
+            elif '_worker_stats' in alert:
+                self.worker_stats[alert['_worker_stats']] = alert['stats']
+            elif '_worker_done' in alert:
+                self.worker_stats[alert['_worker_done']] = alert['stats']
+                done.add(alert['_worker_done'])
+            else:
+                with self._hits_lock:
+                    self._merge_hit(alert)
+
+            if time.monotonic() >= next_flush:
+                self.flush_hits()
+                next_flush = time.monotonic() + 1
+
+    def _merge_hit(self, alert):
+        if self._closed:
+            return
+        key = (alert['src_ip'], alert['dst_port'], alert['type'])
+        if self.hits is not None and self.hits.count(key, alert['ts']):
+            return
+        self.sink.submit(alert)
+        if self.hits is not None:
+            self.hits.open(key, alert, alert['ts'])
+
+    def flush_hits(self):
+        """Envía al sink las ventanas de agregación vencidas"""
+        with self._hits_lock:
+            if not self._closed:
+                self._flush_hits()
+
+    def _flush_hits(self, final=False):
+        if self.hits is None:
+            return
+        alerts = self.hits.drain() if final else self.hits.due(time.time())
+        for alert in alerts:
+            self.sink.submit(alert)
+
+    def totals(self):
+        """Suma de los contadores de todos los trabajadores"""
+        totals = {'connections': 0, 'attacks': 0, 'rejected': 0, 'timeouts': 0,
+                  'truncated': 0, 'active': 0, 'windows': 0}
+        for stats in list(self.worker_stats.values()):
+            for key in totals:
+                totals[key] += stats.get(key, 0)
+        return totals
+
+    def stats_line(self):
+        """Totales y conexiones por trabajador para el log periódico"""
+        totals = self.totals()
+        totals['windows'] = len(self.hits) if self.hits is not None else 0
+        sink = self.sink.stats()
+        per_worker = ' '.join(
+            f"w{index}={stats['connections']}"
+            for index, stats in sorted(self.worker_stats.items())
+        )
+        return (f"sesiones={totals['active']} conexiones={totals['connections']} "
+                f"ataques={totals['attacks']} rechazadas={totals['rejected']} "
+                f"timeouts={totals['timeouts']} recortadas={totals['truncated']} ventanas={totals['windows']} "
+                f"cola={sink.get('depth', 0)} descartadas={sink.get('dropped', 0)} [{per_worker}]")
+
+    def start_all(self):
+        """Inicia los trabajadores y espera hasta Ctrl+C"""
+        print(f"Trabajadores: {self.workers} (SO_REUSEPORT)")
+
+        self.start_workers()
+        logger = None
+        if self.stats_interval:
+            logger = MetricsLogger(self.stats_line, self.stats_interval)
+            logger.start()
+        try:
+            for proc in self._procs:
+                proc.join()
+        except KeyboardInterrupt:
+            print("\n\n✓ Honeypot detenido")
+        finally:
+            if logger is not None:
+                logger.close()
+            self.stop_workers()
+            self.sink.close()
+            print(f"Resumen: {self.stats_line()}")
+            for index, stats in sorted(self.worker_stats.items()):
+                print(f"Trabajador {index}: {stats['connections']} conexiones, "
+                      f"{stats['attacks']} ataques, {stats['rejected']} rechazadas")
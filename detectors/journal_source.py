@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Journal Source - Lectura de sshd desde systemd-journald
+En Fedora/RHEL (nodo central) sshd registra en el journal y no en
+/var/log/auth.log. Se usa la API nativa (python3-systemd): el filtro
+por _SYSTEMD_UNIT lo aplica journald y se leen los campos
+estructurados (MESSAGE, hora real del evento) sin un pipe de texto.
+
+El cursor de la última entrada procesada se guarda de forma atómica;
+al reiniciar se continúa tras él y se vacía el atraso acumulado por
+lotes antes de esperar entradas nuevas.
+
+Requiere: sudo dnf install python3-systemd  (o pip install systemd-python)
+"""
+
+import json
+import time
+
+from log_tailer import write_json_atomic
+
+try:
+    from systemd import journal
+except ImportError:  # Solo necesario con source = 'journal'
+    journal = None
+
+DEFAULT_UNITS = ('sshd.service',)
+
+
+class JournalSource:
+    """
+    Genera (mensaje, timestamp) de las unidades indicadas, con cursor persistente
+    """
+
+    def __init__(self, units=DEFAULT_UNITS, cursor_path=None, batch_size=500,
+                 wait_timeout=1.0, start_at_end=True):
+        self.units = list(units)
+        self.cursor_path = cursor_path
+        self.batch_size = batch_size
+        self.wait_timeout = wait_timeout
+        self.start_at_end = start_at_end
+
+        self.reader = None
+        self.cursor = None
+        self.running = False
+        self._saved = None
+        self.stats = {'entries': 0, 'batches': 0}
+
+    def open(self):
+        """Abre el journal con el filtro por unidad y se posiciona"""
+        if journal is None:
+            raise RuntimeError("python3-systemd no instalado (dnf install python3-systemd)")
+
+        reader = journal.Reader()
+        for index, unit in enumerate(self.units):
+            if index:
+                reader.add_disjunction()
+            reader.add_match(_SYSTEMD_UNIT=unit)
+
+        cursor = self.load_cursor()
+        if cursor:
+            reader.seek_cursor(cursor)
+            # seek_cursor deja delante la entrada ya procesada: saltarla
+            entry = reader.get_next()
+            if entry and not reader.test_cursor(cursor):
+                reader.get_previous()
+        elif self.start_at_end:
+            reader.seek_tail()
+            reader.get_previous()
+        else:
+            reader.seek_head()
+
+        self.reader = reader
+        self.cursor = cursor
+
+    def load_cursor(self):
+        if not self.cursor_path:
+            return None
+        try:
+            with open(self.cursor_path, 'r') as f:
+                return json.load(f).get('cursor')
+        except (OSError, ValueError):
+            return None
+
+    def save_cursor(self):
+        if not self.cursor_path or not self.cursor or self.cursor == self._saved:
+            return
+        try:
+            write_json_atomic(self.cursor_path, {'cursor': self.cursor})
+            self._saved = self.cursor
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar el cursor {self.cursor_path}: {e}")
+
+    def entries(self):
+        """
+        Genera (MESSAGE, timestamp epoch) indefinidamente (hasta stop())
+        El atraso se vacía por lotes de batch_size, guardando el cursor
+        tras cada lote; después se espera con journal.wait()
+        """
+        if self.reader is None:
+            self.open()
+        reader = self.reader
+        self.running = True
+        try:
+            while self.running:
+                drained = 0
+                while drained < self.batch_size:
+                    entry = reader.get_next()
+                    if not entry:
+                        break
+                    drained += 1
+                    message = entry.get('MESSAGE')
+                    if isinstance(message, bytes):
+                        message = message.decode('utf-8', 'replace')
+                    stamp = entry.get('_SOURCE_REALTIME_TIMESTAMP') or entry.get('__REALTIME_TIMESTAMP')
+                    ts = stamp.timestamp() if stamp is not None else time.time()
+                    yield message or '', ts
+                    self.cursor = entry.get('__CURSOR', self.cursor)
+
+                if drained:
+                    self.stats['entries'] += drained
+                    self.stats['batches'] += 1
+                    self.save_cursor()
+                if drained < self.batch_size:
+                    # Sin atraso: esperar entradas nuevas
+                    reader.wait(self.wait_timeout)
+        finally:
+            self.save_cursor()
+            self.close()
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Log Tailer - Seguimiento de ficheros de log dentro del proceso
+Sustituye a `tail -F`: espera cambios con inotify (o sondeo si no está
+disponible), lee en bloques grandes, decodifica un bloque entero de
+una vez y sobrevive a rotaciones y truncados.
+
+Guarda un checkpoint (inodo + offset en bytes tras la última línea
+entregada) de forma atómica, así al reiniciar se continúa donde se
+dejó: si el fichero rotó mientras estaba parado, se busca en el
+directorio el fichero con el inodo guardado (log.1, log-20240101...),
+se termina y luego se lee el nuevo desde el principio. Con la rotación
+en marcha se sigue leyendo el inodo antiguo por el descriptor abierto
+hasta EOF, se llame como se llame ahora.
+
+position() devuelve la posición de la última línea entregada; un
+detector puede guardarla en su snapshot de estado y pasarla como
+`position` al reiniciar, así estado y posición son del mismo instante.
+
+Uso:
+    tailer = LogTailer('/var/log/auth.log', checkpoint_path='/var/lib/sins/auth.offset')
+    for line in tailer.lines():
+        ...
+"""
+
+import ctypes
+import json
+import os
+import select
+import time
+
+# Máscaras de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+def find_rotated(path, inode):
+    """
+    Fichero rotado de path con ese inodo (log.1, log-20240101, ...) o
+    None si ya no existe (borrado o comprimido, que crea otro inodo)
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name != name and entry.name.startswith(name) and entry.inode() == inode:
+                    return entry.path
+    except OSError:
+        pass
+    return None
+
+
+def write_json_atomic(path, data):
+    """Escribe data como JSON en path sin dejar nunca un fichero a medias"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Inotify:
+    """Vigilancia inotify mínima (ctypes) de un directorio"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'inotify_add_watch {directory}')
+
+    def wait(self, timeout):
+        """Espera un evento (o timeout) y descarta los pendientes"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LogTailer:
+    """
+    Sigue un fichero de log como `tail -F` con checkpoint persistente
+    """
+
+    def __init__(self, path, checkpoint_path=None, read_size=1 << 16,
+                 poll_interval=1.0, checkpoint_interval=5.0, start_at_end=True,
+                 position=None):
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        # Posición inicial guardada con el estado del detector (prioridad
+        # sobre el checkpoint, que puede ser de otro instante)
+        self.start_position = position
+        self.read_size = read_size
+        self.poll_interval = poll_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.start_at_end = start_at_end
+
+        self.file = None
+        self.inode = None
+        self.offset = 0             # Fin de la última línea entregada
+        self.partial = b''
+        self.running = False
+        self._saved = None
+        self._last_save = 0.0
+        self.stats = {'lines': 0, 'bytes': 0, 'rotations': 0, 'truncations': 0}
+
+    # --- checkpoint ---------------------------------------------------
+
+    def load_checkpoint(self):
+        if not self.checkpoint_path:
+            return None
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                state = json.load(f)
+            if state.get('path') == self.path:
+                return state
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def position(self):
+        """{path, inode, offset} de la última línea entregada (o None)"""
+        if self.inode is None:
+            return None
+        return {'path': self.path, 'inode': self.inode, 'offset': self.offset}
+
+    def save_checkpoint(self, force=False):
+        """Escribe {path, inode, offset} de forma atómica (tmp + rename)"""
+        if not self.checkpoint_path or self.inode is None:
+            return
+        state = (self.inode, self.offset)
+        now = time.monotonic()
+        if state == self._saved or (not force and now - self._last_save < self.checkpoint_interval):
+            return
+        try:
+            write_json_atomic(self.checkpoint_path, self.position())
+            self._saved = state
+            self._last_save = now
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar el checkpoint {self.checkpoint_path}: {e}")
+
+    # --- apertura y rotación -----------------------------------------
+
+    def _open(self, path, offset):
+        self._close_file()
+        self.file = open(path, 'rb', buffering=0)
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.file.seek(offset)
+        self.offset = offset
+        self.partial = b''
+
+    def _close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _resume(self):
+        """
+        Abre el fichero según el checkpoint. Devuelve la ruta del fichero
+        rotado que hay que terminar antes (o None)
+        """
+        state = self.start_position
+        if not state or state.get('path') != self.path:
+            state = self.load_checkpoint()
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            current = None
+
+        if state is not None:
+            if current is not None and current.st_ino == state['inode']:
+                offset = state['offset'] if state['offset'] <= current.st_size else 0
+                self._open(self.path, offset)
+                return None
+            # Rotó mientras estábamos parados: buscar el fichero anterior
+            rotated = find_rotated(self.path, state['inode'])
+            if rotated is not None:
+                self._open(rotated, state['offset'])
+                return rotated
+            print(f"⚠️  {self.path} rotó y el fichero anterior ya no está, leyendo el actual")
+            if current is not None:
+                self._open(self.path, 0)
+            return None
+
+        if current is not None:
+            self._open(self.path, current.st_size if self.start_at_end else 0)
+        return None
+
+    def _check_rotation(self):
+        """
+        Detecta rotación (otro inodo en la ruta) y truncado (tamaño menor
+        que el offset). Devuelve True si hay que reabrir tras vaciar el actual
+        """
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if self.file is None or current.st_ino != self.inode:
+            return True
+        if current.st_size < self.offset:
+            self.stats['truncations'] += 1
+            print(f"⚠️  {self.path} truncado, leyendo desde el principio")
+            self._open(self.path, 0)
+        return False
+
+    # --- lectura ----------------------------------------------------------
+
+    def _drain(self):
+        """
+        Lee hasta EOF en bloques grandes y genera las líneas completas
+        El offset avanza con cada línea entregada (su fin en el fichero),
+        así un checkpoint o snapshot tomado entre dos líneas no relee
+        ninguna ya procesada
+        """
+        while self.file is not None:
+            chunk = self.file.read(self.read_size)
+            if not chunk:
+                return
+            self.stats['bytes'] += len(chunk)
+            data = self.partial + chunk
+            cut = data.rfind(b'\n') + 1
+            self.partial = data[cut:]
+            if cut:
+                # Un solo decode por bloque en lugar de uno por línea; los
+                # '\n' del texto son los mismos que los de los bytes
+                lines = data[:cut - 1].decode('utf-8', 'replace').split('\n')
+                self.stats['lines'] += len(lines)
+                # data empieza en self.offset (inicio de la línea parcial)
+                start = self.offset
+                end = 0
+                for line in lines:
+                    end = data.index(b'\n', end) + 1
+                    self.offset = start + end
+                    yield line
+            if len(chunk) < self.read_size:
+                return
+
+    def lines(self):
+        """Genera las líneas nuevas del log indefinidamente (hasta stop())"""
+        self.running = True
+        rotated = self._resume()
+        watcher = None
+        try:
+            watcher = Inotify(os.path.dirname(os.path.abspath(self.path)))
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify no disponible ({e}), usando sondeo cada {self.poll_interval}s")
+
+        try:
+            while self.running:
+                yield from self._drain()
+
+                if rotated is not None:
+                    # Terminado el fichero rotado: pasar al actual desde 0
+                    rotated = None
+                    if os.path.exists(self.path):
+                        self._open(self.path, 0)
+                    continue
+
+                if self._check_rotation():
+                    # Vaciar lo que quede del fichero antiguo y reabrir
+                    yield from self._drain()
+                    self.stats['rotations'] += 1
+                    self._open(self.path, 0)
+                    continue
+
+                self.save_checkpoint()
+                if watcher is not None:
+                    watcher.wait(self.poll_interval)
+                else:
+                    time.sleep(self.poll_interval)
+        finally:
+            self.save_checkpoint(force=True)
+            self._close_file()
+            if watcher is not None:
+                watcher.close()
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Metrics - Instrumentación ligera de los detectores
+- LatencyHistogram: histograma de latencias en cubetas potencia de 2
+  (ns), con observe() O(1) barato para dejarlo activo en producción
+- MetricsRegistry: contadores, gauges e histogramas leídos bajo demanda
+  (callables), en formato de texto de Prometheus
+- MetricsServer: endpoint HTTP local /metrics
+- MetricsLogger: línea de resumen periódica en consola
+
+Uso:
+    registry = MetricsRegistry()
+    registry.counter('packets_total', 'Paquetes procesados', lambda: detector.packets)
+    MetricsServer(registry, port=9108).start()
+"""
+
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Event
+
+# Cubeta i: latencias < 2^i ns. Se publican de 2^8 ns (256 ns) a 2^30 ns (~1 s)
+HISTOGRAM_BUCKETS = 32
+EXPORT_BUCKETS = range(8, 31)
+
+
+class LatencyHistogram:
+    """Histograma de latencias en ns con cubetas logarítmicas (base 2)"""
+
+    __slots__ = ('count', 'sum', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+
+    def observe(self, ns):
+        self.count += 1
+        self.sum += ns
+        index = ns.bit_length()
+        self.buckets[index if index < HISTOGRAM_BUCKETS else HISTOGRAM_BUCKETS - 1] += 1
+
+    def merge(self, other):
+        """Suma las observaciones de otro histograma (p.ej. de otro proceso)"""
+        self.count += other.count
+        self.sum += other.sum
+        for index, hits in enumerate(other.buckets):
+            self.buckets[index] += hits
+
+    def quantile(self, q):
+        """Cuantil aproximado en ns (interpolado dentro de la cubeta)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, hits in enumerate(self.buckets):
+            if hits and seen + hits >= rank:
+                low = (1 << (index - 1)) if index else 0
+                high = 1 << index
+                return low + (high - low) * (rank - seen) / hits
+            seen += hits
+        return float(1 << (HISTOGRAM_BUCKETS - 1))
+
+    def cumulative(self):
+        """[(límite superior en segundos, observaciones acumuladas), ...]"""
+        result = []
+        seen = sum(self.buckets[:EXPORT_BUCKETS.start])
+        for index in EXPORT_BUCKETS:
+            seen += self.buckets[index]
+            result.append(((1 << index) / 1e9, seen))
+        return result
+
+
+def format_ns(ns):
+    """Duración legible: 850ns, 12.3µs, 4.1ms"""
+    if ns < 1000:
+        return f"{ns:.0f}ns"
+    if ns < 1e6:
+        return f"{ns / 1e3:.1f}µs"
+    return f"{ns / 1e6:.1f}ms"
+
+
+def _labels(label, value):
+    return f'{{{label}="{value}"}}' if label else ''
+
+
+class MetricsRegistry:
+    """
+    Métricas leídas bajo demanda: cada familia guarda un callable que
+    devuelve un número o un dict {valor de etiqueta: número}, así el
+    camino caliente solo incrementa atributos y no toca el registro
+    """
+
+    def __init__(self, prefix='sins_ids'):
+        self.prefix = prefix
+        self._families = []
+
+    def counter(self, name, help_text, fn, label=None):
+        self._families.append(('counter', name, help_text, fn, label))
+
+    def gauge(self, name, help_text, fn, label=None):
+        self._families.append(('gauge', name, help_text, fn, label))
+
+    def histogram(self, name, help_text, fn, label=None):
+        """fn devuelve un LatencyHistogram o un dict {etiqueta: LatencyHistogram}"""
+        self._families.append(('histogram', name, help_text, fn, label))
+
+    def collect(self):
+        """[(tipo, nombre, ayuda, etiqueta, {valor etiqueta: valor}), ...]"""
+        families = []
+        for kind, name, help_text, fn, label in self._families:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            if value is None:
+                continue
+            if not isinstance(value, dict):
+                value = {None: value}
+            families.append((kind, f"{self.prefix}_{name}", help_text, label, value))
+        return families
+
+    def render(self):
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)"""
+        lines = []
+        for kind, name, help_text, label, values in self.collect():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in values.items():
+                if kind != 'histogram':
+                    lines.append(f"{name}{_labels(label, key)} {value}")
+                    continue
+                prefix = f'{label}="{key}",' if label else ''
+                for bound, seen in value.cumulative():
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound:.9g}"}} {seen}')
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {value.count}')
+                lines.append(f"{name}_sum{_labels(label, key)} {value.sum / 1e9:.9f}")
+                lines.append(f"{name}_count{_labels(label, key)} {value.count}")
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Endpoint HTTP /metrics en un hilo en segundo plano (solo local por defecto)"""
+
+    def __init__(self, registry, host='127.0.0.1', port=9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        print(f"✓ Métricas en http://{self.host}:{self.port}/metrics")
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class MetricsLogger:
+    """Imprime line_fn() cada interval segundos desde un hilo en segundo plano"""
+
+    def __init__(self, line_fn, interval=60):
+        self.line_fn = line_fn
+        self.interval = interval
+        self._stop = Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = Thread(target=self._run, name='metrics-log', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                print(f"📊 {time.strftime('%H:%M:%S')} {self.line_fn()}")
+            except Exception as e:
+                print(f"✗ Error en métricas: {e}")
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
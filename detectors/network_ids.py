@@ -4,7 +4,7 @@ SIEM Real - Detector de Ataques con Snort
 Sistema de Detección de Intrusiones que captura ataques reales
 
 Detecta:
-- Port Scanning (Nmap)
+- Port Scanning (Nmap): vertical, horizontal, en bloque y distribuido
 - Brute Force SSH/FTP
 - SQL Injection
 - XSS Attacks
@@ -13,273 +13,893 @@ Detecta:
 """
 
 import subprocess
-import re
 import json
-import datetime
 import socket
-import pymssql
 from scapy.all import sniff, IP, TCP, UDP, ICMP
-from collections import defaultdict, deque
+from scapy.error import Scapy_Exception
+from collections import deque
+from datetime import datetime
 from threading import Thread, Lock
 import time
+from alert_sink import AlertSink, MemorySink, COUNT_COLUMN
+from trackers import (AlertSuppressor, SourceTracker, PortScanEntry, CounterEntry,
+                      SlidingWindowCounter, HostScanEntry, ServiceScanEntry)
+from signatures import SignatureEngine, CATEGORIES
+from sketches import HyperLogLog, PortBitmap, CountMinSketch, PORT_SPACE
+from streams import FlowTable
+from metrics import LatencyHistogram, MetricsRegistry, MetricsServer, MetricsLogger, format_ns
+from registry import (DETECTORS, register_detector, load_plugins, classify, build_dispatch,
+                      PKT_TCP_SYN, PKT_TCP_DATA, PKT_TCP_CLOSE, PKT_ICMP)
+from raw_capture import PacketRecord, RawSocketCapture, read_pcap
+from snapshots import StateSnapshotter
+
+# Configuración opcional (config.py junto a los detectores, ver config.example.py)
+try:
+    from config import NETWORK_IDS as NETWORK_IDS_CONFIG
+except ImportError:
+    NETWORK_IDS_CONFIG = {}
+
+# Fragmento BPF de los detectores de SYN
+BPF_TCP_SYN = 'tcp[tcpflags] == tcp-syn'
+
+# Puertos de servicios en claro donde se buscan payloads (SQLi, XSS)
+DEFAULT_PAYLOAD_PORTS = [21, 80, 1433, 2222, 3306, 5432, 8000, 8080]
+
+# Formato del snapshot de estado (state_file); otro valor se ignora al cargar
+STATE_VERSION = 1
+
+# Longitud del payload TCP: total IP - cabecera IP - cabecera TCP
+BPF_TCP_PAYLOAD = '(ip[2:2] - ((ip[0] & 0xf) << 2) - ((tcp[12] & 0xf0) >> 2)) > 0'
+BPF_TCP_CLOSE = 'tcp[tcpflags] & (tcp-fin|tcp-rst) != 0'
+
+# Conexión a base de datos; las alertas van a la tabla del nodo remoto (Windows)
+DB_CONFIG = {
+    'server': '127.0.0.1',
+    'port': 1432,
+    'user': 'sa',
+    'password': 'TU_PASSWORD_AQUI',
+    'database': 'CentralSIEM'
+}
+ALERT_TABLE = '[SENSOR_REMOTO].[SensorDB].[dbo].[Live_Alerts]'
+
+# Supresión de alertas duplicadas (segundos por tipo de ataque)
+ALERT_SUPPRESSION_TTL = {
+    'Port Scanning': 60,
+    'Horizontal Port Scan': 60,
+    'Block Port Scan': 60,
+    'Distributed Port Scan': 60,
+    'SYN Flood Attack': 10,
+    'ICMP Flood Attack': 10,
+    'SQL Injection Attempt': 30,
+    'XSS Attack Attempt': 30
+}
 
 class RealAttackDetector:
     """
     Detector de ataques reales usando análisis de paquetes
     """
     
-    def __init__(self, interface='eth0'):
+    def __init__(self, interface='eth0', settings=None, sink=None):
         self.interface = interface
+        self.settings = NETWORK_IDS_CONFIG if settings is None else settings
         self.attack_buffer = deque(maxlen=1000)
         self.lock = Lock()
         
-        # Contadores para detección de patrones
-        self.port_scan_tracker = defaultdict(lambda: {'ports': set(), 'time': time.time()})
-        self.brute_force_tracker = defaultdict(lambda: {'attempts': 0, 'time': time.time()})
-        self.ddos_tracker = defaultdict(lambda: {'count': 0, 'time': time.time()})
+        # Contadores para detección de patrones (acotados por IP origen)
+        max_sources = self.settings.get('tracker_max_sources', 100000)
+        idle_timeout = self.settings.get('tracker_idle_timeout', 120)
+        
+        # Conteo de puertos distintos por IP: 'exact' (set), 'hll' (HyperLogLog,
+        # ~300 bytes por IP) o 'bitmap' (exacto, 8 KB por IP)
+        self.port_counter = self.settings.get('port_scan_counter', 'exact')
+        if self.port_counter == 'hll':
+            precision = self.settings.get('hll_precision', 8)
+            port_scan_entry = lambda now: PortScanEntry(now, HyperLogLog(precision))
+        elif self.port_counter == 'bitmap':
+            port_scan_entry = lambda now: PortScanEntry(now, PortBitmap())
+        else:
+            port_scan_entry = PortScanEntry
+        self.port_scan_tracker = SourceTracker(port_scan_entry, max_sources, idle_timeout)
+        
+        # Sondeos SYN por IP origen a nivel global (top de fuentes más activas
+        # en el resumen final). Opcional: cuesta unos µs por SYN
+        self.syn_sources = None
+        if self.settings.get('syn_top_sources', False):
+            self.syn_sources = CountMinSketch()
+        
+        # Barridos entre hosts: por IP origen, hosts y puertos distintos
+        # (horizontal / en bloque); por puerto destino, IPs origen distintas
+        # (distribuido). Siempre con HyperLogLog: memoria fija por entrada
+        hll_precision = self.settings.get('hll_precision', 8)
+        self.host_scan_tracker = SourceTracker(
+            lambda now: HostScanEntry(now, HyperLogLog(hll_precision), HyperLogLog(hll_precision)),
+            max_sources, idle_timeout
+        )
+        self.service_scan_tracker = SourceTracker(
+            lambda now: ServiceScanEntry(now, HyperLogLog(hll_precision)),
+            65536, idle_timeout
+        )
+        # Modo multiproceso: puertos cuyo HyperLogLog de IPs origen cambió
+        # desde el último envío al coordinador ({puerto: (ts, origen, destino)});
+        # None en un solo proceso (ver sharded_ids.py)
+        self.service_scan_updates = None
+        self.brute_force_tracker = SourceTracker(CounterEntry, max_sources, idle_timeout)
         
         # Umbrales de detección
         self.PORT_SCAN_THRESHOLD = 10  # 10 puertos diferentes en 60 segundos
+        self.SCAN_WINDOW = self.settings.get('scan_window', 60)
+        self.HORIZONTAL_SCAN_THRESHOLD = self.settings.get('horizontal_scan_hosts', 20)
+        self.BLOCK_SCAN_PORTS = self.settings.get('block_scan_ports', 10)
+        self.DISTRIBUTED_SCAN_THRESHOLD = self.settings.get('distributed_scan_sources', 50)
+        # Una IP solo cuenta como escáner de un puerto si ya ha tocado varios
+        # hosts (un cliente normal habla con un único servidor)
+        self.DISTRIBUTED_SCAN_MIN_HOSTS = self.settings.get('distributed_scan_min_hosts', 3)
         self.BRUTE_FORCE_THRESHOLD = 5  # 5 intentos fallidos en 60 segundos
-        self.DDOS_THRESHOLD = 100  # 100 paquetes en 10 segundos
+        self.DDOS_THRESHOLD = self.settings.get('syn_flood_threshold', 100)  # SYN en la ventana
+        self.ICMP_FLOOD_THRESHOLD = self.settings.get('icmp_flood_threshold', 50)
+        
+        # Ventanas deslizantes (segundos), un contador por detector e IP
+        self.SYN_FLOOD_WINDOW = self.settings.get('syn_flood_window', 10)
+        self.ICMP_FLOOD_WINDOW = self.settings.get('icmp_flood_window', 10)
+        self.syn_flood_tracker = SourceTracker(
+            lambda now: SlidingWindowCounter(now, self.SYN_FLOOD_WINDOW),
+            max_sources, idle_timeout
+        )
+        self.icmp_flood_tracker = SourceTracker(
+            lambda now: SlidingWindowCounter(now, self.ICMP_FLOOD_WINDOW),
+            max_sources, idle_timeout
+        )
+        
+        # Supresión de alertas duplicadas (segundos por tipo de ataque)
+        self.ALERT_SUPPRESSION_TTL = dict(ALERT_SUPPRESSION_TTL)
+        self.suppressor = AlertSuppressor(ttls=self.ALERT_SUPPRESSION_TTL)
+        
+        # Detectores habilitados (propios y de plugins, ver registry.py) y
+        # prefiltro BPF (descarta en el kernel el tráfico que ningún detector
+        # inspecciona, p.ej. TLS masivo)
+        self.enabled_detectors = enabled_detectors(self.settings)
+        self.payload_ports = self.settings.get('payload_ports', DEFAULT_PAYLOAD_PORTS)
+        # Mismo filtro en Python (sin BPF o con --pcap todo el TCP llega aquí);
+        # vacío = todos los puertos
+        self.payload_port_set = frozenset(self.payload_ports)
+        self.use_bpf = self.settings.get('bpf_prefilter', True)
+        
+        # Motor de captura: 'scapy' (disección completa) o 'raw' (AF_PACKET)
+        self.capture_backend = self.settings.get('capture_backend', 'scapy')
+        
+        # Instrumentación: llamadas, ns acumulados y latencia por detector
+        # (dos lecturas de perf_counter_ns por llamada; metrics=False la quita)
+        self.metrics_enabled = self.settings.get('metrics', True)
+        self.detector_latency = None
+        if self.metrics_enabled:
+            self.detector_latency = {name: LatencyHistogram() for name in self.enabled_detectors}
+        self.detector_errors = dict.fromkeys(self.enabled_detectors, 0)
+        self.packets = 0
+        self.alerts_emitted = 0
+        self.alerts_suppressed = 0
+        self.capture = None
+        
+        # Snapshots periódicos del estado (solo en vivo, ver start_snapshots)
+        self.snapshots = None
+        
+        # Firmas de payload (regex propias + config.py + wordlists), compiladas una vez
+        self.signatures = SignatureEngine.from_config(self.settings)
+        
+        # Reensamblado TCP: las firmas se buscan sobre el flujo cliente->servidor
+        # hasta stream_depth bytes (0 = analizar cada segmento por separado)
+        self.stream_depth = self.settings.get('stream_depth', 8192)
+        self.flow_table = None
+        if self.stream_depth:
+            self.flow_table = FlowTable(
+                self.signatures,
+                depth=self.stream_depth,
+                max_flows=self.settings.get('stream_max_flows', 50000),
+                max_memory=self.settings.get('stream_max_memory', 32 * 1024 * 1024),
+                idle_timeout=self.settings.get('stream_idle_timeout', 60)
+            )
         
         # Conexión a base de datos
-        self.db_config = {
-            'server': '127.0.0.1',
-            'port': 1432,
-            'user': 'sa',
-            'password': 'TU_PASSWORD_AQUI',
-            'database': 'CentralSIEM'
-        }
+        self.db_config = DB_CONFIG
+        
+        # Escritor de alertas compartido (pool de conexiones + INSERT por lotes)
+        self.sink = sink if sink is not None else make_sink(self.settings)
+        
+        # Instanciar los detectores al final (los plugins pueden usar el estado)
+        self.detectors = {name: DETECTORS[name].factory(self, self.settings)
+                          for name in self.enabled_detectors}
+        self.build_dispatch()
+    
+    def build_dispatch(self):
+        """
+        Precalcula, por clase de paquete, la tupla (nombre, clases, detector,
+        histograma) de los detectores a los que hay que llamar
+        """
+        latency = self.detector_latency or {}
+        self.dispatch = build_dispatch([
+            (name, DETECTORS[name].packets, self.detectors[name], latency.get(name))
+            for name in self.enabled_detectors
+        ])
+    
+    def build_bpf_filter(self):
+        """Expresión BPF de los detectores habilitados (None = sin filtro)"""
+        return build_bpf_filter(self)
+    
     def detect_port_scan(self, packet):
         """Detecta port scanning (Nmap, Masscan, etc.)"""
-        if packet.haslayer(TCP) and packet[TCP].flags == 2:  # SYN flag
-            src_ip = packet[IP].src
-            dst_port = packet[TCP].dport
-            
-            current_time = time.time()
-            tracker = self.port_scan_tracker[src_ip]
-            
-            # Limpiar datos antiguos
-            if current_time - tracker['time'] > 60:
-                tracker['ports'].clear()
-                tracker['time'] = current_time
-            
-            tracker['ports'].add(dst_port)
-            
-            # Si se escanean muchos puertos en poco tiempo
-            if len(tracker['ports']) >= self.PORT_SCAN_THRESHOLD:
+        src_ip = packet.src
+        dst_port = packet.dport
+        
+        current_time = packet.ts
+        tracker = self.port_scan_tracker.get(src_ip, current_time)
+        
+        # Limpiar datos antiguos
+        if current_time - tracker.start > 60:
+            tracker.ports.clear()
+            tracker.start = current_time
+        
+        tracker.ports.add(dst_port)
+        if self.syn_sources is not None:
+            self.syn_sources.add(src_ip)
+        
+        # Si se escanean muchos puertos en poco tiempo (O(1) con sketches;
+        # la estimación de HyperLogLog se acota al número de puertos posibles)
+        ports_scanned = min(len(tracker.ports), PORT_SPACE)
+        if ports_scanned >= self.PORT_SCAN_THRESHOLD:
+            return {
+                'type': 'Port Scanning',
+                'severity': 'MEDIUM',
+                'src_ip': src_ip,
+                'dst_ip': packet.dst,
+                'ports_scanned': ports_scanned,
+                'description': f'Port scan detectado desde {src_ip}: {ports_scanned} puertos'
+            }
+        return None
+    
+    def detect_host_scan(self, packet):
+        """
+        Detecta barridos entre hosts en una sola pasada:
+        - Horizontal: un puerto (o pocos) en muchos hosts
+        - En bloque: muchos puertos en muchos hosts
+        - Distribuido: muchas IPs origen sondeando el mismo puerto
+        """
+        src_ip = packet.src
+        dst_port = packet.dport
+        current_time = packet.ts
+        
+        tracker = self.host_scan_tracker.get(src_ip, current_time)
+        if current_time - tracker.start > self.SCAN_WINDOW:
+            tracker.hosts.clear()
+            tracker.ports.clear()
+            tracker.start = current_time
+        tracker.hosts.add(packet.dst)
+        tracker.ports.add(dst_port)
+        hosts_scanned = len(tracker.hosts)
+        
+        # Solo las IPs que ya barren varios hosts crean estado por puerto
+        sources = 0
+        if hosts_scanned >= self.DISTRIBUTED_SCAN_MIN_HOSTS:
+            service = self.service_scan_tracker.get(dst_port, current_time)
+            if current_time - service.start > self.SCAN_WINDOW:
+                service.sources.clear()
+                service.start = current_time
+            service.sources.add(src_ip)
+            sources = len(service.sources)
+            if self.service_scan_updates is not None:
+                self.service_scan_updates[dst_port] = (current_time, src_ip, packet.dst)
+        
+        if hosts_scanned >= self.HORIZONTAL_SCAN_THRESHOLD:
+            ports_scanned = min(len(tracker.ports), PORT_SPACE)
+            if ports_scanned >= self.BLOCK_SCAN_PORTS:
                 return {
-                    'type': 'Port Scanning',
-                    'severity': 'MEDIUM',
+                    'type': 'Block Port Scan',
+                    'severity': 'HIGH',
                     'src_ip': src_ip,
-                    'dst_ip': packet[IP].dst,
-                    'ports_scanned': len(tracker['ports']),
-                    'description': f'Port scan detectado desde {src_ip}: {len(tracker["ports"])} puertos'
+                    'dst_ip': packet.dst,
+                    'hosts_scanned': hosts_scanned,
+                    'ports_scanned': ports_scanned,
+                    'description': f'Escaneo en bloque desde {src_ip}: ~{hosts_scanned} hosts, ~{ports_scanned} puertos'
                 }
+            return {
+                'type': 'Horizontal Port Scan',
+                'severity': 'MEDIUM',
+                'src_ip': src_ip,
+                'dst_ip': packet.dst,
+                'dst_port': dst_port,
+                'hosts_scanned': hosts_scanned,
+                'description': f'Barrido horizontal desde {src_ip}: ~{hosts_scanned} hosts (puerto {dst_port})'
+            }
+        
+        if sources >= self.DISTRIBUTED_SCAN_THRESHOLD:
+            return distributed_scan_alert(src_ip, packet.dst, dst_port, sources)
         return None
     
     def detect_syn_flood(self, packet):
         """Detecta SYN flood (tipo de DDoS)"""
-        if packet.haslayer(TCP) and packet[TCP].flags == 2:  # SYN flag
-            src_ip = packet[IP].src
-            current_time = time.time()
-            tracker = self.ddos_tracker[src_ip]
-            
-            # Limpiar datos antiguos
-            if current_time - tracker['time'] > 10:
-                tracker['count'] = 0
-                tracker['time'] = current_time
-            
-            tracker['count'] += 1
-            
-            # Si hay demasiados SYN en poco tiempo
-            if tracker['count'] >= self.DDOS_THRESHOLD:
-                return {
-                    'type': 'SYN Flood Attack',
-                    'severity': 'CRITICAL',
-                    'src_ip': src_ip,
-                    'dst_ip': packet[IP].dst,
-                    'packet_count': tracker['count'],
-                    'description': f'SYN Flood detectado: {tracker["count"]} paquetes en 10 segundos'
-                }
+        src_ip = packet.src
+        current_time = packet.ts
+        tracker = self.syn_flood_tracker.get(src_ip, current_time)
+        count = tracker.add(current_time)
+        
+        # Si hay demasiados SYN en la ventana deslizante
+        if count >= self.DDOS_THRESHOLD:
+            return {
+                'type': 'SYN Flood Attack',
+                'severity': 'CRITICAL',
+                'src_ip': src_ip,
+                'dst_ip': packet.dst,
+                'packet_count': count,
+                'description': f'SYN Flood detectado: {count} paquetes en {self.SYN_FLOOD_WINDOW} segundos'
+            }
         return None
     
     def detect_icmp_flood(self, packet):
         """Detecta ICMP flood (Ping flood)"""
-        if packet.haslayer(ICMP):
-            src_ip = packet[IP].src
-            current_time = time.time()
-            tracker = self.ddos_tracker[src_ip]
-            
-            if current_time - tracker['time'] > 10:
-                tracker['count'] = 0
-                tracker['time'] = current_time
-            
-            tracker['count'] += 1
-            
-            if tracker['count'] >= 50:  # 50 pings en 10 segundos
-                return {
-                    'type': 'ICMP Flood Attack',
-                    'severity': 'HIGH',
-                    'src_ip': src_ip,
-                    'dst_ip': packet[IP].dst,
-                    'packet_count': tracker['count'],
-                    'description': f'ICMP Flood detectado: {tracker["count"]} paquetes'
-                }
+        src_ip = packet.src
+        current_time = packet.ts
+        tracker = self.icmp_flood_tracker.get(src_ip, current_time)
+        count = tracker.add(current_time)
+        
+        if count >= self.ICMP_FLOOD_THRESHOLD:
+            return {
+                'type': 'ICMP Flood Attack',
+                'severity': 'HIGH',
+                'src_ip': src_ip,
+                'dst_ip': packet.dst,
+                'packet_count': count,
+                'description': f'ICMP Flood detectado: {count} paquetes en {self.ICMP_FLOOD_WINDOW} segundos'
+            }
         return None
     
     def detect_suspicious_payload(self, packet):
         """Detecta payloads sospechosos (SQL injection, XSS, etc.)"""
-        if packet.haslayer(TCP) and packet.haslayer('Raw'):
-            payload = str(packet['Raw'].load)
-            
-            # Patrones de SQL injection
-            sql_patterns = [
-                r"(\bOR\b|\bAND\b)\s+['\"]?\d+['\"]?\s*=\s*['\"]?\d+",
-                r"UNION\s+SELECT",
-                r"DROP\s+TABLE",
-                r"'; DROP",
-                r"--",
-                r"1=1",
-                r"admin'--"
-            ]
-            
-            # Patrones de XSS
-            xss_patterns = [
-                r"<script",
-                r"javascript:",
-                r"onerror=",
-                r"onload="
-            ]
-            
-            for pattern in sql_patterns:
-                if re.search(pattern, payload, re.IGNORECASE):
-                    return {
-                        'type': 'SQL Injection Attempt',
-                        'severity': 'CRITICAL',
-                        'src_ip': packet[IP].src,
-                        'dst_ip': packet[IP].dst,
-                        'dst_port': packet[TCP].dport if packet.haslayer(TCP) else 0,
-                        'description': f'SQL Injection detectado: patrón "{pattern}"'
-                    }
-            
-            for pattern in xss_patterns:
-                if re.search(pattern, payload, re.IGNORECASE):
-                    return {
-                        'type': 'XSS Attack Attempt',
-                        'severity': 'HIGH',
-                        'src_ip': packet[IP].src,
-                        'dst_ip': packet[IP].dst,
-                        'dst_port': packet[TCP].dport if packet.haslayer(TCP) else 0,
-                        'description': f'XSS detectado: patrón "{pattern}"'
-                    }
+        if self.payload_port_set and packet.dport not in self.payload_port_set:
+            return None
+        if self.flow_table is not None:
+            # Búsqueda incremental sobre el flujo reensamblado
+            found = self.flow_table.feed(packet)
+            if found:
+                return self.payload_alert(packet, self.signatures.resolve(found))
+        elif packet.payload:
+            # Una sola pasada sobre los bytes con todas las firmas
+            matches = self.signatures.match(packet.payload)
+            if matches:
+                return self.payload_alert(packet, matches)
         
         return None
     
+    def payload_alert(self, packet, matches):
+        """Construye la alerta de payload: la categoría más grave manda"""
+        categories = {signature.category for signature in matches}
+        for category, (attack_type, severity, label) in CATEGORIES.items():
+            if category in categories:
+                patterns = [s.pattern.decode('utf-8', 'replace') for s in matches]
+                first = next(p for s, p in zip(matches, patterns) if s.category == category)
+                extra = f' (+{len(patterns) - 1} firmas)' if len(patterns) > 1 else ''
+                return {
+                    'type': attack_type,
+                    'severity': severity,
+                    'src_ip': packet.src,
+                    'dst_ip': packet.dst,
+                    'dst_port': packet.dport,
+                    'signatures': patterns,
+                    'description': f'{label} detectado: patrón "{first}"{extra}'
+                }
+        return None
+    
     def save_to_database(self, attack_data):
-        """Guarda ataque detectado en la base de datos"""
-        try:
-            conn = pymssql.connect(**self.db_config)
-            cursor = conn.cursor()
-            
-            # Insertar en la tabla del nodo remoto (Windows)
-            query = """
-                INSERT INTO [SENSOR_REMOTO].[SensorDB].[dbo].[Live_Alerts] 
-                (TipoAtaque, IP_Origen, Severidad, Puerto_Destino, Protocolo, Timestamp)
-                VALUES (%s, %s, %s, %s, %s, GETDATE())
-            """
-            
-            cursor.execute(query, (
-                attack_data['type'],
-                attack_data['src_ip'],
-                attack_data['severity'],
-                attack_data.get('dst_port', 0),
-                attack_data.get('protocol', 'TCP')
-            ))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            print(f"✓ Ataque registrado: {attack_data['type']} desde {attack_data['src_ip']}")
-            
-        except Exception as e:
-            print(f"✗ Error guardando en BD: {e}")
+        """Encola el ataque detectado para escritura por lotes en la base de datos"""
+        self.sink.submit(attack_data)
     
     def packet_handler(self, packet):
-        """Manejador principal de paquetes"""
-        if not packet.haslayer(IP):
-            return
-        
-        # Lista de detectores
-        detectors = [
-            self.detect_port_scan,
-            self.detect_syn_flood,
-            self.detect_icmp_flood,
-            self.detect_suspicious_payload
-        ]
-        
-        # Ejecutar cada detector
-        for detector in detectors:
+        """Manejador principal de paquetes (callback prn de scapy)"""
+        record = to_record(packet)
+        if record is not None:
+            self.process_record(record)
+    
+    def process_record(self, record):
+        """Ejecuta los detectores sobre un PacketRecord (scapy o socket raw)"""
+        self.packets += 1
+        
+        # Snapshot pendiente: se toma aquí, en el hilo dueño del estado (fork)
+        snapshots = self.snapshots
+        if snapshots is not None and snapshots.due:
+            snapshots.save(self.state_snapshot)
+        
+        # Clasificar una vez y ejecutar solo los detectores de esa clase
+        for name, _, detector, latency in self.dispatch[classify(record)]:
             try:
-                attack = detector(packet)
+                if latency is None:
+                    attack = detector(record)
+                else:
+                    start = time.perf_counter_ns()
+                    attack = detector(record)
+                    latency.observe(time.perf_counter_ns() - start)
                 if attack:
                     with self.lock:
-                        # Evitar duplicados recientes
-                        attack_key = f"{attack['type']}_{attack['src_ip']}"
-                        if attack_key not in [a.get('key') for a in self.attack_buffer]:
-                            attack['key'] = attack_key
-                            attack['timestamp'] = datetime.datetime.now().isoformat()
-                            self.attack_buffer.append(attack)
-                            
-                            # Guardar en base de datos
-                            self.save_to_database(attack)
-                            
-                            # Log en consola
-                            print(f"\n⚠️  ATAQUE DETECTADO ⚠️")
-                            print(f"Tipo: {attack['type']}")
-                            print(f"Severidad: {attack['severity']}")
-                            print(f"Origen: {attack['src_ip']}")
-                            print(f"Descripción: {attack['description']}")
-                            print("-" * 50)
+                        # Evitar duplicados recientes (índice O(1) con TTL, en
+                        # tiempo del paquete para que el replay sea fiel)
+                        attack_key = attack.get('key') or f"{attack['type']}_{attack['src_ip']}"
+                        if not self.suppressor.should_emit(attack['type'], attack_key, record.ts):
+                            self.alerts_suppressed += 1
+                            continue
+                        self.alerts_emitted += 1
+                        attack['key'] = attack_key
+                        # Tiempo del evento; el sink le da formato al escribir
+                        attack['ts'] = record.ts
+                        self.attack_buffer.append(attack)
+                    
+                    # Encolar fuera del lock: la escritura en BD y el log en
+                    # consola ocurren en el hilo del AlertSink
+                    self.save_to_database(attack)
             except Exception as e:
+                self.detector_errors[name] += 1
                 print(f"Error en detector: {e}")
     
+    def trackers(self):
+        """Trackers de estado por nombre"""
+        return {
+            'port_scan': self.port_scan_tracker,
+            'host_scan': self.host_scan_tracker,
+            'service_scan': self.service_scan_tracker,
+            'syn_flood': self.syn_flood_tracker,
+            'icmp_flood': self.icmp_flood_tracker,
+            'brute_force': self.brute_force_tracker
+        }
+    
+    def tracker_stats(self):
+        """Tamaño y memoria aproximada de los trackers por IP origen"""
+        return {name: tracker.stats() for name, tracker in self.trackers().items()}
+    
+    def state_snapshot(self):
+        """Estado de los detectores para un snapshot (trackers, supresión, top SYN)"""
+        return {
+            'version': STATE_VERSION,
+            'saved': time.time(),
+            'trackers': {name: tracker.export() for name, tracker in self.trackers().items()},
+            'suppressor': self.suppressor.export(),
+            'syn_sources': self.syn_sources
+        }
+    
+    def restore_state(self, state):
+        """Carga un snapshot descartando lo que ya ha salido de su ventana"""
+        if state.get('version') != STATE_VERSION:
+            print(f"⚠️  Snapshot de estado con versión {state.get('version')}, ignorado")
+            return 0
+        now = time.time()
+        loaded = 0
+        for name, tracker in self.trackers().items():
+            loaded += tracker.restore(state['trackers'].get(name, ()), now)
+        self.suppressor.restore(state.get('suppressor', {}), now)
+        if self.syn_sources is not None and state.get('syn_sources') is not None:
+            self.syn_sources = state['syn_sources']
+        print(f"✓ Estado restaurado: {loaded} entradas "
+              f"(snapshot de hace {now - state['saved']:.0f} s)")
+        return loaded
+    
+    def start_snapshots(self, path=None):
+        """
+        Carga el último snapshot (state_file) y arranca los periódicos
+        cada state_interval segundos. Solo en vivo: en un replay el
+        tiempo de los paquetes no es el actual
+        """
+        path = path or self.settings.get('state_file')
+        if not path:
+            return None
+        snapshots = StateSnapshotter(path, self.settings.get('state_interval', 60))
+        state = snapshots.load()
+        if state:
+            self.restore_state(state)
+        try:
+            snapshots.start()
+        except OSError as e:
+            print(f"⚠️  Sin snapshots de estado ({e})")
+            return None
+        self.snapshots = snapshots
+        return snapshots
+    
+    def stop_snapshots(self):
+        """Guarda el estado final y detiene los snapshots"""
+        if self.snapshots is not None:
+            self.snapshots.close(self.state_snapshot)
+            self.snapshots = None
+    
+    def build_metrics(self, registry=None):
+        """Registra las métricas del detector, del sink y de la captura"""
+        registry = register_metrics(registry or MetricsRegistry(), self)
+        registry.gauge('tracker_entries', 'Entradas por tracker', lambda: {
+            'port_scan': len(self.port_scan_tracker),
+            'host_scan': len(self.host_scan_tracker),
+            'service_scan': len(self.service_scan_tracker),
+            'syn_flood': len(self.syn_flood_tracker),
+            'icmp_flood': len(self.icmp_flood_tracker),
+            'brute_force': len(self.brute_force_tracker),
+            'suppressor': len(self.suppressor)
+        }, 'tracker')
+        if self.flow_table is not None:
+            registry.gauge('stream_flows', 'Flujos TCP en reensamblado', lambda: len(self.flow_table))
+            registry.gauge('stream_bytes', 'Memoria de la tabla de flujos',
+                           lambda: self.flow_table.memory)
+        
+        registry.counter('state_snapshots_total', 'Snapshots de estado escritos',
+                         lambda: self.snapshots.stats['snapshots'] if self.snapshots else None)
+        registry.gauge('state_snapshot_bytes', 'Tamaño del último snapshot de estado',
+                       lambda: self.snapshots.stats['bytes'] if self.snapshots else None)
+        registry.gauge('state_snapshot_pause_seconds', 'Pausa de la captura en el último snapshot (fork)',
+                       lambda: self.snapshots.stats['pause_ms'] / 1000 if self.snapshots else None)
+        return registry
+    
+    def metrics_line(self):
+        """Resumen de una línea para el log periódico"""
+        return metrics_line(self)
+    
+    def start_metrics(self):
+        """Arranca el endpoint /metrics y el log periódico según la configuración"""
+        return start_metrics(self)
+    
     def start_monitoring(self):
         """Inicia el monitoreo de red"""
         print(f"\n🛡️  SIEM Real - Iniciando detección de ataques")
         print(f"Interface: {self.interface}")
+        print(f"Captura: {self.capture_backend}")
+        
+        bpf_filter = self.build_bpf_filter() if self.use_bpf else None
+        print(f"Filtro BPF: {bpf_filter or '(ninguno)'}")
         print(f"Presiona Ctrl+C para detener\n")
         print("=" * 50)
         print("MONITOREANDO TRÁFICO DE RED...")
         print("=" * 50)
         
+        metrics = self.start_metrics()
+        self.start_snapshots()
         try:
-            sniff(
-                iface=self.interface,
-                prn=self.packet_handler,
-                store=0
-            )
+            if self.capture_backend == 'raw':
+                # Socket AF_PACKET + parseo de cabeceras con struct
+                self.capture = RawSocketCapture(self.interface, bpf_filter=bpf_filter)
+                self.capture.run(self.process_record)
+            else:
+                sniff_packets(self.interface, bpf_filter, self.packet_handler)
         except KeyboardInterrupt:
             print("\n\n✓ Monitoreo detenido por el usuario")
         except Exception as e:
             print(f"\n✗ Error en monitoreo: {e}")
+        finally:
+            for service in metrics:
+                service.close()
+            self.stop_snapshots()
+            self.sink.close()
+            self.print_summary()
+    
+    def replay(self, path, realtime=False):
+        """
+        Pasa un fichero pcap/pcapng por los detectores (sin root)
+        Por defecto lo más rápido posible; con realtime=True respeta los
+        tiempos originales entre paquetes. Las ventanas usan siempre el
+        timestamp de cada paquete, así el resultado es el mismo en ambos modos
+        Devuelve el número de paquetes procesados
+        """
+        if self.capture_backend == 'raw':
+            # Mismo parseo con struct que el socket raw
+            records = read_pcap(path)
+        else:
+            from scapy.utils import PcapReader
+            records = (to_record(packet) for packet in PcapReader(path))
+        
+        packets = 0
+        first_ts = None
+        started = time.monotonic()
+        for record in records:
+            if record is None:
+                continue
+            if realtime:
+                if first_ts is None:
+                    first_ts = record.ts
+                delay = (record.ts - first_ts) - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            self.process_record(record)
+            packets += 1
+        return packets
+    
+    def print_summary(self):
+        """Resumen al terminar: alertas del sink, trackers y fuentes más activas"""
+        stats = self.sink.stats()
+        print(f"Alertas: {stats['queued']} encoladas, {stats['flushed']} escritas, "
+              f"{stats['dropped']} descartadas, {stats['coalesced']} fusionadas")
+        for name, tracker in self.tracker_stats().items():
+            print(f"Tracker {name}: {tracker['entries']} IPs, "
+                  f"~{tracker['approx_bytes'] // 1024} KB, {tracker['evicted']} expulsadas")
+        if self.syn_sources is not None:
+            for src_ip, probes in self.syn_sources.heavy_hitters(5):
+                print(f"Top SYN: {src_ip} (~{probes} sondeos)")
+        if self.capture is not None:
+            kernel = self.capture.kernel_stats()
+            print(f"Kernel: {kernel['packets']} paquetes, {kernel['drops']} descartados")
+        if self.detector_latency and self.packets:
+            print(f"Métricas: {self.metrics_line()}")
+
+def distributed_scan_alert(src_ip, dst_ip, dst_port, sources):
+    """Alerta de escaneo distribuido (también la usa el coordinador multiproceso)"""
+    return {
+        'type': 'Distributed Port Scan',
+        'severity': 'HIGH',
+        'src_ip': src_ip,
+        'dst_ip': dst_ip,
+        'dst_port': dst_port,
+        'sources': sources,
+        # Un escaneo distribuido se agrupa por puerto, no por IP origen
+        'key': f'Distributed Port Scan_{dst_port}',
+        'description': f'Escaneo distribuido del puerto {dst_port}: ~{sources} IPs origen'
+    }
+
+
+# Piezas compartidas con el coordinador multiproceso (sharded_ids.py), que
+# solo escribe alertas y publica métricas: reciben `ids`, el objeto con
+# settings, sink, contadores, etc. (un RealAttackDetector o el coordinador)
+
+def report_attack(attack):
+    """Log en consola de un ataque (ejecutado en el hilo del AlertSink)"""
+    print(f"\n⚠️  ATAQUE DETECTADO ⚠️")
+    print(f"Tipo: {attack['type']}")
+    print(f"Severidad: {attack['severity']}")
+    print(f"Origen: {attack['src_ip']}")
+    if 'ts' in attack:
+        print(f"Hora: {datetime.fromtimestamp(attack['ts']).strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Descripción: {attack['description']}")
+    print("-" * 50)
+
+
+def make_sink(settings):
+    """
+    Escritor de alertas compartido (pool de conexiones + INSERT por lotes)
+    La cola es acotada para que el callback de captura nunca bloquee en E/S
+    """
+    return AlertSink(
+        DB_CONFIG,
+        table=ALERT_TABLE,
+        max_queue=settings.get('alert_max_queue', 10000),
+        overflow=settings.get('alert_overflow', 'coalesce'),
+        spill_path=settings.get('alert_spill_file'),
+        on_alert=report_attack,
+        extra_columns=(COUNT_COLUMN,)
+    )
+
+
+def enabled_detectors(settings):
+    """Nombres de los detectores habilitados (propios y de plugins, ver registry.py)"""
+    load_plugins(settings.get('plugins', []))
+    names = []
+    for name in settings.get('detectors', list(DETECTORS)):
+        if name in DETECTORS:
+            names.append(name)
+        else:
+            print(f"⚠️  Detector desconocido en config.py: {name}")
+    return names
+
+
+def build_bpf_filter(ids):
+    """
+    Compila la expresión BPF a partir de ids.enabled_detectors
+    Devuelve None si no hay nada que filtrar
+    """
+    fragments = []
+    for name in ids.enabled_detectors:
+        fragment = DETECTORS[name].bpf_fragment(ids)
+        if fragment is None:
+            # Un detector sin fragmento necesita ver todo el tráfico
+            return None
+        if fragment not in fragments:
+            fragments.append(fragment)
+    
+    if not fragments:
+        return None
+    return 'ip and (' + ' or '.join(f'({f})' for f in fragments) + ')'
+
+
+def to_record(packet):
+    """Convierte un paquete scapy en el PacketRecord que usan los detectores"""
+    if not packet.haslayer(IP):
+        return None
+    
+    ip = packet[IP]
+    record = PacketRecord(float(packet.time), ip.src, ip.dst, ip.proto)
+    if packet.haslayer(TCP):
+        tcp = packet[TCP]
+        record.sport = tcp.sport
+        record.dport = tcp.dport
+        record.flags = int(tcp.flags)
+        record.seq = tcp.seq
+        if packet.haslayer('Raw'):
+            record.payload = packet['Raw'].load
+    elif packet.haslayer(UDP):
+        record.sport = packet[UDP].sport
+        record.dport = packet[UDP].dport
+    return record
+
+
+def register_metrics(registry, ids):
+    """Métricas de paquetes, detectores, alertas, sink y captura"""
+    latency = lambda: ids.detector_latency
+    
+    registry.counter('packets_total', 'Paquetes analizados', lambda: ids.packets)
+    registry.counter('detector_calls_total', 'Llamadas por detector',
+                     lambda: {n: h.count for n, h in latency().items()}, 'detector')
+    registry.counter('detector_seconds_total', 'Tiempo acumulado por detector',
+                     lambda: {n: h.sum / 1e9 for n, h in latency().items()}, 'detector')
+    registry.histogram('detector_latency_seconds', 'Latencia por paquete y detector',
+                       latency, 'detector')
+    registry.counter('detector_errors_total', 'Excepciones por detector',
+                     lambda: ids.detector_errors, 'detector')
+    registry.counter('alerts_total', 'Alertas emitidas', lambda: ids.alerts_emitted)
+    registry.counter('alerts_suppressed_total', 'Alertas suprimidas por duplicadas',
+                     lambda: ids.alerts_suppressed)
+    
+    registry.gauge('sink_queue_depth', 'Alertas pendientes de escribir',
+                   lambda: ids.sink.stats().get('depth', 0))
+    registry.counter('sink_alerts_total', 'Alertas por estado en el sink', lambda: {
+        state: value for state, value in ids.sink.stats().items() if state != 'depth'
+    }, 'state')
+    registry.histogram('sink_flush_latency_seconds', 'Latencia de cada INSERT por lotes',
+                       lambda: getattr(ids.sink, 'flush_latency', None))
+    
+    registry.counter('capture_kernel_packets_total', 'Paquetes recibidos por el socket raw',
+                     lambda: ids.capture.kernel_stats()['packets'] if ids.capture else None)
+    registry.counter('capture_kernel_drops_total', 'Paquetes descartados por el kernel',
+                     lambda: ids.capture.kernel_stats()['drops'] if ids.capture else None)
+    return registry
+
+
+def metrics_line(ids):
+    """Resumen de una línea para el log periódico"""
+    parts = [f"paquetes={ids.packets}", f"alertas={ids.alerts_emitted}"]
+    for name, histogram in (ids.detector_latency or {}).items():
+        parts.append(f"{name} p50={format_ns(histogram.quantile(0.5))} "
+                     f"p99={format_ns(histogram.quantile(0.99))}")
+    stats = ids.sink.stats()
+    parts.append(f"cola={stats.get('depth', 0)} descartadas={stats.get('dropped', 0)}")
+    flush = getattr(ids.sink, 'flush_latency', None)
+    if flush is not None and flush.count:
+        parts.append(f"flush p99={format_ns(flush.quantile(0.99))}")
+    if ids.capture is not None:
+        parts.append(f"drops kernel={ids.capture.kernel_stats()['drops']}")
+    return ' | '.join(parts)
+
+
+def start_metrics(ids):
+    """
+    Arranca el endpoint /metrics (ids.build_metrics()) y el log periódico
+    (ids.metrics_line) según ids.settings. Devuelve los servicios a cerrar
+    """
+    services = []
+    port = ids.settings.get('metrics_port')
+    if port:
+        server = MetricsServer(ids.build_metrics(),
+                               host=ids.settings.get('metrics_host', '127.0.0.1'),
+                               port=port)
+        try:
+            server.start()
+            services.append(server)
+        except OSError as e:
+            print(f"⚠️  No se pudo abrir el endpoint de métricas: {e}")
+    interval = ids.settings.get('metrics_log_interval', 60)
+    if interval:
+        logger = MetricsLogger(ids.metrics_line, interval)
+        logger.start()
+        services.append(logger)
+    return services
+
+
+# Detectores propios (mismo API que los plugins, ver registry.py)
+
+def sniff_packets(interface, bpf_filter, prn):
+    """
+    sniff() de scapy con el prefiltro BPF. Sin libpcap/tcpdump scapy no
+    puede compilar el filtro: se avisa y se captura sin él (cada detector
+    ya descarta lo que no le corresponde, solo cuesta más CPU)
+    """
+    if bpf_filter:
+        try:
+            return sniff(iface=interface, filter=bpf_filter, prn=prn, store=0)
+        except Scapy_Exception as e:
+            print(f"⚠️  No se pudo aplicar el filtro BPF ({e}), capturando sin filtro")
+    return sniff(iface=interface, prn=prn, store=0)
+
+
+@register_detector('port_scan', PKT_TCP_SYN, bpf=BPF_TCP_SYN)
+def port_scan_detector(ids, settings):
+    """Escaneo vertical: muchos puertos desde una IP"""
+    return ids.detect_port_scan
+
+
+@register_detector('host_scan', PKT_TCP_SYN, bpf=BPF_TCP_SYN)
+def host_scan_detector(ids, settings):
+    """Barridos horizontales, en bloque y distribuidos"""
+    return ids.detect_host_scan
+
+
+@register_detector('syn_flood', PKT_TCP_SYN, bpf=BPF_TCP_SYN)
+def syn_flood_detector(ids, settings):
+    """SYN flood por IP origen en ventana deslizante"""
+    return ids.detect_syn_flood
+
+
+@register_detector('icmp_flood', PKT_ICMP, bpf='icmp')
+def icmp_flood_detector(ids, settings):
+    """Ping flood por IP origen en ventana deslizante"""
+    return ids.detect_icmp_flood
+
+
+def payload_bpf(ids):
+    """
+    Segmentos TCP con datos hacia los puertos de servicios en claro, más
+    los FIN/RST sin datos para cerrar los flujos del reensamblado
+    """
+    segments = f'({BPF_TCP_PAYLOAD} or {BPF_TCP_CLOSE})'
+    if not ids.payload_ports:
+        return f'tcp and {segments}'
+    ports = ' or '.join(f'tcp dst port {port}' for port in ids.payload_ports)
+    return f'({ports}) and {segments}'
+
+
+@register_detector('payload', PKT_TCP_DATA | PKT_TCP_CLOSE, bpf=payload_bpf)
+def payload_detector(ids, settings):
+    """Firmas de SQL injection y XSS en el flujo TCP"""
+    return ids.detect_suspicious_payload
+
 
 def main():
     """Función principal"""
+    import argparse
     import sys
     
+    parser = argparse.ArgumentParser(description='SIEM Real - Network IDS')
+    parser.add_argument('interface', nargs='?', default=NETWORK_IDS_CONFIG.get('interface', 'eth0'),
+                        help='Interfaz de red a monitorear')
+    parser.add_argument('--backend', choices=['scapy', 'raw'],
+                        help='Motor de captura (por defecto: scapy)')
+    parser.add_argument('--workers', type=int, default=NETWORK_IDS_CONFIG.get('workers', 1),
+                        help='Procesos de análisis (reparto por IP origen)')
+    parser.add_argument('--pcap', help='Analizar un fichero pcap/pcapng en lugar de capturar')
+    parser.add_argument('--realtime', action='store_true',
+                        help='Con --pcap, respetar los tiempos originales de la traza')
+    args = parser.parse_args()
+    
+    # Replay offline: sin root ni base de datos, alertas en memoria y consola
+    if args.pcap:
+        detector = RealAttackDetector(interface=args.interface, sink=MemorySink())
+        detector.sink.on_alert = report_attack
+        if args.backend:
+            detector.capture_backend = args.backend
+        print(f"\n🛡️  SIEM Real - Replay de {args.pcap}")
+        start = time.perf_counter()
+        try:
+            packets = detector.replay(args.pcap, realtime=args.realtime)
+        except KeyboardInterrupt:
+            print("\n\n✓ Replay detenido por el usuario")
+            packets = 0
+        elapsed = time.perf_counter() - start
+        print("=" * 50)
+        print(f"✓ {packets} paquetes en {elapsed:.2f} s "
+              f"({packets / elapsed if elapsed else 0:.0f} paquetes/s)")
+        for attack_type, count in sorted(detector.sink.by_type.items()):
+            print(f"  {attack_type}: {count}")
+        detector.print_summary()
+        return
+    
     # Verificar que se ejecuta como root (necesario para captura de paquetes)
     if os.geteuid() != 0:
         print("✗ Este script debe ejecutarse como root (sudo)")
         sys.exit(1)
     
-    # Obtener interfaz de red
-    interface = sys.argv[1] if len(sys.argv) > 1 else 'eth0'
-    
-    # Crear detector
-    detector = RealAttackDetector(interface=interface)
+    # Crear detector (multiproceso si se piden varios trabajadores)
+    if args.workers > 1:
+        from sharded_ids import ShardedAttackDetector
+        detector = ShardedAttackDetector(interface=args.interface, workers=args.workers)
+        if args.backend:
+            detector.capture_backend = args.backend
+    else:
+        detector = RealAttackDetector(interface=args.interface)
+        if args.backend:
+            detector.capture_backend = args.backend
     
     # Iniciar monitoreo
     detector.start_monitoring()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Raw Capture - Motor de captura ligero para el Network IDS
+Lee tramas de un socket AF_PACKET (con anillo mmap TPACKET_V3 cuando
+el kernel lo soporta) y extrae solo los campos fijos de las cabeceras
+IPv4/TCP/ICMP con struct, sin construir objetos scapy por paquete
+
+Solo Linux. Requiere root (o CAP_NET_RAW).
+"""
+
+import mmap
+import select
+import socket
+import struct
+import time
+
+# Constantes de <linux/if_packet.h> y <linux/if_ether.h>
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+ETH_P_8021Q = 0x8100
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+
+PROTO_ICMP = 1
+PROTO_TCP = 6
+PROTO_UDP = 17
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+
+_u16 = struct.Struct('!H')
+_ipv4 = struct.Struct('!BxHxxxxxBxx4s4s')  # ver/ihl, total, proto, src, dst
+_ports = struct.Struct('!HH')
+_u32 = struct.Struct('!I')
+_block_hdr = struct.Struct('=III')          # block_status, num_pkts, offset_to_first_pkt
+_tp_stats = struct.Struct('=II')            # tp_packets, tp_drops (se ponen a 0 al leer)
+_tp3_hdr = struct.Struct('=IIIIIIHH')       # next, sec, nsec, snaplen, len, status, mac, net
+
+
+class PacketRecord:
+    """Registro compacto con los campos que usan los detectores"""
+
+    __slots__ = ('ts', 'src', 'dst', 'proto', 'flags', 'sport', 'dport', 'seq', 'payload')
+
+    def __init__(self, ts, src, dst, proto, flags=0, sport=0, dport=0, seq=0, payload=b''):
+        self.ts = ts
+        self.src = src
+        self.dst = dst
+        self.proto = proto
+        self.flags = flags
+        self.sport = sport
+        self.dport = dport
+        self.seq = seq
+        self.payload = payload
+
+    def __repr__(self):
+        return (f"PacketRecord({self.src}:{self.sport} -> {self.dst}:{self.dport} "
+                f"proto={self.proto} flags={self.flags:#x} payload={len(self.payload)}B)")
+
+
+def parse_frame(frame, ts):
+    """
+    Parsea una trama Ethernet y devuelve un PacketRecord (o None si no es IPv4)
+    frame puede ser bytes o memoryview; solo se copia el payload TCP
+    """
+    if len(frame) < 34:
+        return None
+
+    offset = 12
+    ethertype = _u16.unpack_from(frame, offset)[0]
+    if ethertype == ETH_P_8021Q:
+        offset += 4
+        ethertype = _u16.unpack_from(frame, offset)[0]
+    if ethertype != ETH_P_IP:
+        return None
+    offset += 2
+
+    if len(frame) < offset + 20:
+        return None
+    ver_ihl, total_len, proto, src, dst = _ipv4.unpack_from(frame, offset)
+    if ver_ihl >> 4 != 4:
+        return None
+
+    l4 = offset + (ver_ihl & 0x0F) * 4
+    end = min(len(frame), offset + total_len)
+    record = PacketRecord(ts, socket.inet_ntoa(src), socket.inet_ntoa(dst), proto)
+
+    if proto == PROTO_TCP and end >= l4 + 20:
+        record.sport, record.dport = _ports.unpack_from(frame, l4)
+        record.seq = _u32.unpack_from(frame, l4 + 4)[0]
+        record.flags = frame[l4 + 13]
+        data = l4 + (frame[l4 + 12] >> 4) * 4
+        if data < end:
+            record.payload = bytes(frame[data:end])
+    elif proto == PROTO_UDP and end >= l4 + 8:
+        record.sport, record.dport = _ports.unpack_from(frame, l4)
+
+    return record
+
+
+def read_pcap(path):
+    """
+    Lee un fichero pcap/pcapng y genera PacketRecord con el timestamp
+    de captura de cada paquete (mismo parseo que el socket raw)
+    """
+    from scapy.utils import RawPcapReader
+
+    reader = RawPcapReader(path)
+    try:
+        scale = 1e9 if getattr(reader, 'nano', False) else 1e6
+        linktype = getattr(reader, 'linktype', 1)
+        for frame, meta in reader:
+            if hasattr(meta, 'tsresol'):
+                # pcapng: timestamp de 64 bits en unidades de tsresol
+                if meta.linktype != 1:
+                    continue
+                ts = ((meta.tshigh << 32) | meta.tslow) / meta.tsresol
+            else:
+                if linktype != 1:
+                    continue
+                ts = meta.sec + meta.usec / scale
+            record = parse_frame(frame, ts)
+            if record is not None:
+                yield record
+    finally:
+        reader.close()
+
+
+class RawSocketCapture:
+    """
+    Captura desde AF_PACKET entregando PacketRecord a un callback
+    Usa un anillo TPACKET_V3 (bloques compartidos con el kernel, sin
+    copia por recv) y cae a recv_into si no está disponible
+    """
+
+    def __init__(self, interface, bpf_filter=None, block_size=1 << 20,
+                 block_count=64, frame_size=2048, block_timeout_ms=100):
+        self.interface = interface
+        self.bpf_filter = bpf_filter
+        self.block_size = block_size
+        self.block_count = block_count
+        self.frame_size = frame_size
+        self.block_timeout_ms = block_timeout_ms
+
+        self.sock = None
+        self.ring = None
+        self.packets = 0
+        self.kernel_packets = 0
+        self.kernel_drops = 0
+        self.running = False
+
+    def open(self):
+        """Abre el socket, adjunta el BPF y configura el anillo"""
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        if self.interface:
+            self.sock.bind((self.interface, 0))
+
+        if self.bpf_filter:
+            try:
+                from scapy.arch.linux import attach_filter
+                attach_filter(self.sock, self.bpf_filter, self.interface)
+            except Exception as e:
+                print(f"⚠️  No se pudo adjuntar el filtro BPF: {e}")
+
+        try:
+            self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            req = struct.pack(
+                '=IIIIIII',
+                self.block_size, self.block_count, self.frame_size,
+                (self.block_size // self.frame_size) * self.block_count,
+                self.block_timeout_ms, 0, 0
+            )
+            self.sock.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+            self.ring = mmap.mmap(self.sock.fileno(), self.block_size * self.block_count,
+                                  mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        except OSError as e:
+            print(f"⚠️  TPACKET_V3 no disponible ({e}), usando recv_into")
+            self.ring = None
+
+    def kernel_stats(self):
+        """
+        Paquetes recibidos y descartados por el kernel (anillo lleno) desde
+        la apertura; PACKET_STATISTICS se reinicia en cada lectura, así que
+        se acumula aquí
+        """
+        if self.sock is not None:
+            try:
+                raw = self.sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 12)
+                received, drops = _tp_stats.unpack_from(raw)
+                self.kernel_packets += received
+                self.kernel_drops += drops
+            except OSError:
+                pass
+        return {'packets': self.kernel_packets, 'drops': self.kernel_drops}
+
+    def close(self):
+        self.running = False
+        self.kernel_stats()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def run(self, callback):
+        """Bucle de captura: llama a callback(record) por cada paquete IPv4"""
+        if self.sock is None:
+            self.open()
+        self.running = True
+        try:
+            if self.ring is not None:
+                self._run_ring(callback)
+            else:
+                self._run_recv(callback)
+        finally:
+            self.close()
+
+    def _run_ring(self, callback):
+        ring = self.ring
+        view = memoryview(ring)
+        poller = select.poll()
+        poller.register(self.sock, select.POLLIN | select.POLLERR)
+        block = 0
+
+        try:
+            while self.running:
+                base = block * self.block_size
+                status, num_pkts, first = _block_hdr.unpack_from(ring, base + 8)
+                if not status & TP_STATUS_USER:
+                    poller.poll(self.block_timeout_ms)
+                    continue
+
+                offset = base + first
+                for _ in range(num_pkts):
+                    next_off, sec, nsec, snaplen, _, _, mac, _ = _tp3_hdr.unpack_from(ring, offset)
+                    start = offset + mac
+                    record = parse_frame(view[start:start + snaplen], sec + nsec * 1e-9)
+                    if record is not None:
+                        self.packets += 1
+                        callback(record)
+                    offset += next_off
+
+                # Devolver el bloque al kernel
+                struct.pack_into('=I', ring, base + 8, TP_STATUS_KERNEL)
+                block = (block + 1) % self.block_count
+        finally:
+            view.release()
+
+    def _run_recv(self, callback):
+        buf = bytearray(65536)
+        view = memoryview(buf)
+        while self.running:
+            size = self.sock.recv_into(buf)
+            record = parse_frame(view[:size], time.time())
+            if record is not None:
+                self.packets += 1
+                callback(record)
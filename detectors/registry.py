@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Registry - API de plugins de detección para el Network IDS
+Cada detector se registra con el tipo de paquetes que le interesan y,
+opcionalmente, el fragmento BPF que los captura. El IDS clasifica cada
+paquete una sola vez (una máscara de bits) y llama solo a los
+detectores de esa clase a través de una tabla de despacho precalculada.
+
+Plugin de ejemplo (mi_detector.py, activado desde config.py con
+NETWORK_IDS['plugins'] = ['mi_detector'] y 'detectors': [..., 'dns_tunnel']):
+
+    from registry import register_detector, PKT_UDP
+
+    @register_detector('dns_tunnel', PKT_UDP, bpf='udp port 53')
+    def dns_tunnel(ids, settings):
+        limit = settings.get('dns_tunnel_max_len', 200)
+        def inspect(record):
+            if record.dport == 53 and len(record.payload) > limit:
+                return {'type': 'DNS Tunneling', 'severity': 'HIGH',
+                        'src_ip': record.src, 'description': '...'}
+        return inspect
+
+La fábrica recibe el RealAttackDetector y la sección NETWORK_IDS y
+devuelve un callable(record) -> alerta (dict) o None.
+"""
+
+import importlib
+
+from raw_capture import PROTO_TCP, PROTO_ICMP, PROTO_UDP, TCP_SYN, TCP_FIN, TCP_RST
+
+# Clases de paquete (bits); un paquete puede tener varias (SYN con datos)
+PKT_TCP_SYN = 0x01      # SYN puro (inicio de conexión / sondeo)
+PKT_TCP_DATA = 0x02     # Segmento TCP con payload
+PKT_TCP_CLOSE = 0x04    # FIN o RST
+PKT_TCP_OTHER = 0x08    # Resto de TCP (ACK puros, SYN/ACK...)
+PKT_ICMP = 0x10
+PKT_UDP = 0x20
+PKT_OTHER = 0x40
+
+PKT_TCP = PKT_TCP_SYN | PKT_TCP_DATA | PKT_TCP_CLOSE | PKT_TCP_OTHER
+PKT_ALL = 0x7F
+
+# Detectores registrados, en orden de registro (nombre -> DetectorSpec)
+DETECTORS = {}
+
+
+class DetectorSpec:
+    """Detector registrado: fábrica, clases de paquete y fragmento BPF"""
+
+    __slots__ = ('name', 'factory', 'packets', 'bpf', 'description')
+
+    def __init__(self, name, factory, packets, bpf=None, description=''):
+        self.name = name
+        self.factory = factory
+        self.packets = packets
+        self.bpf = bpf              # str, callable(ids) -> str, o None (sin prefiltro)
+        self.description = description
+
+    def bpf_fragment(self, ids):
+        return self.bpf(ids) if callable(self.bpf) else self.bpf
+
+
+def register_detector(name, packets, bpf=None, description=''):
+    """Decorador que registra la fábrica de un detector"""
+    def decorator(factory):
+        DETECTORS[name] = DetectorSpec(name, factory, packets, bpf,
+                                       description or (factory.__doc__ or '').strip())
+        return factory
+    return decorator
+
+
+def load_plugins(modules):
+    """Importa los módulos de plugins (se registran al importarse)"""
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"✗ No se pudo cargar el plugin {module}: {e}")
+
+
+def classify(record):
+    """Máscara de clases de un PacketRecord (una sola vez por paquete)"""
+    proto = record.proto
+    if proto == PROTO_TCP:
+        flags = record.flags
+        mask = PKT_TCP_SYN if flags == TCP_SYN else 0
+        if record.payload:
+            mask |= PKT_TCP_DATA
+        if flags & (TCP_FIN | TCP_RST):
+            mask |= PKT_TCP_CLOSE
+        return mask or PKT_TCP_OTHER
+    if proto == PROTO_ICMP:
+        return PKT_ICMP
+    if proto == PROTO_UDP:
+        return PKT_UDP
+    return PKT_OTHER
+
+
+def build_dispatch(entries):
+    """
+    Tabla de despacho: lista indexada por máscara con la tupla de
+    entradas (name, packets, ...) cuyos packets comparten algún bit
+    """
+    return [tuple(entry for entry in entries if entry[1] & mask)
+            for mask in range(PKT_ALL + 1)]
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Session Capture - Transcripciones de las sesiones del honeypot
+Cada evento de una sesión (apertura, datos recibidos/enviados, cierre)
+se escribe en cuanto ocurre como una línea JSON en un fichero gzip, así
+nunca se guarda una sesión entera en memoria:
+- record() solo encola (cola acotada en bytes; si se llena se descarta
+  y se cuenta), un hilo en segundo plano serializa y comprime
+- al superar max_bytes comprimidos el fichero se rota como
+  logging.RotatingFileHandler: captura.jsonl.gz -> .1 -> .2 ... (backups)
+
+Formato (una línea por evento, leer con zcat):
+    {"ts": 1760771521.03, "sid": 7, "ev": "open", "ip": "1.2.3.4", "src_port": 51234, "port": 21}
+    {"ts": 1760771521.05, "sid": 7, "ev": "out", "data": "220 FTP Server Ready\\r\\n"}
+    {"ts": 1760771521.20, "sid": 7, "ev": "in", "data": "USER admin\\r\\n"}
+    {"ts": 1760771523.91, "sid": 7, "ev": "close", "reason": "done", "bytes_in": 34}
+'data' son los bytes decodificados como latin-1: el texto se lee tal
+cual y data.encode('latin-1') devuelve los bytes originales.
+
+Uso:
+    capture = SessionCapture('/var/lib/sins/honeypot_capture.jsonl.gz')
+    capture.record(sid, 'in', data=chunk)
+    ...
+    capture.close()
+"""
+
+import gzip
+import json
+import os
+import time
+from collections import deque
+from threading import Thread, Condition
+
+# Eventos comprimidos entre comprobaciones del tamaño del fichero
+WRITE_CHUNK = 256
+
+
+class SessionCapture:
+    """Escritor en segundo plano de eventos de sesión a gzip rotativo"""
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, backups=5,
+                 max_pending=8 * 1024 * 1024, max_delay=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+
+        self._pending = deque()
+        self._pending_bytes = 0
+        self._cond = Condition()
+        self._thread = None
+        self._running = False
+        self._raw = None
+        self._file = None
+
+        self.counters = {'events': 0, 'dropped': 0, 'written': 0, 'rotations': 0}
+
+    def start(self):
+        """Abre el fichero y arranca el hilo de escritura"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._open()
+        self._running = True
+        self._thread = Thread(target=self._run, name='session-capture', daemon=True)
+        self._thread.start()
+
+    def record(self, sid, event, data=b'', **fields):
+        """Encola un evento de la sesión sid (nunca bloquea en disco)"""
+        size = len(data) + 64
+        with self._cond:
+            if self._pending_bytes + size > self.max_pending:
+                self.counters['dropped'] += 1
+                return
+            self._pending.append((time.time(), sid, event, data, fields))
+            self._pending_bytes += size
+            self.counters['events'] += 1
+
+    def stats(self):
+        """Copia de los contadores más los bytes pendientes de escribir"""
+        with self._cond:
+            snapshot = dict(self.counters)
+            snapshot['pending_bytes'] = self._pending_bytes
+        return snapshot
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._running and not self._pending:
+                    self._cond.wait(self.max_delay)
+                batch = self._pending
+                self._pending = deque()
+                self._pending_bytes = 0
+                running = self._running
+            if batch:
+                self._write(batch)
+            if not running:
+                return
+
+    def _write(self, batch):
+        """Serializa y comprime el lote en bloques, rotando entre bloques"""
+        batch = list(batch)
+        for start in range(0, len(batch), WRITE_CHUNK):
+            lines = []
+            for ts, sid, event, data, fields in batch[start:start + WRITE_CHUNK]:
+                item = {'ts': round(ts, 3), 'sid': sid, 'ev': event}
+                if data:
+                    item['data'] = data.decode('latin-1')
+                item.update(fields)
+                lines.append(json.dumps(item, ensure_ascii=False))
+            try:
+                self._file.write(('\n'.join(lines) + '\n').encode('utf-8'))
+                self.counters['written'] += len(lines)
+                if self._raw.tell() >= self.max_bytes:
+                    self._rotate()
+            except OSError as e:
+                self.counters['dropped'] += len(lines)
+                print(f"✗ Error escribiendo la captura {self.path}: {e}")
+
+    def _open(self):
+        # Contiene credenciales de los atacantes: solo legible por root
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        self._raw = os.fdopen(fd, 'ab')
+        self._file = gzip.GzipFile(fileobj=self._raw, mode='ab')
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._raw.close()
+            self._file = None
+            self._raw = None
+
+    def _rotate(self):
+        """captura -> captura.1 -> ... -> captura.<backups> (se borra la más antigua)"""
+        self._close_file()
+        if self.backups:
+            for index in range(self.backups - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.unlink(self.path)
+        self._open()
+        self.counters['rotations'] += 1
+
+    def close(self):
+        """Escribe los eventos pendientes y cierra el fichero"""
+        if self._thread is not None:
+            with self._cond:
+                self._running = False
+                self._cond.notify()
+            self._thread.join(timeout=10)
+            self._thread = None
+        self._close_file()
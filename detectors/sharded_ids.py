@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Sharded IDS - Modo multiproceso del Network IDS
+Un proceso de captura reparte cada paquete por hash de la IP origen
+entre N procesos trabajadores. Cada trabajador tiene su propio
+RealAttackDetector (su fragmento de port_scan_tracker, syn_flood_tracker,
+etc.), así el estado de un atacante vive en un solo proceso y los
+trackers no necesitan locks. El proceso principal no analiza nada: solo
+captura, fusiona las alertas de todos los trabajadores en un único
+AlertSink y publica las métricas (sin firmas, trackers ni flujos).
+
+El escaneo distribuido (muchas IPs origen contra un mismo puerto) no se
+puede decidir en un trabajador, que solo ve sus IPs: cada uno envía
+periódicamente el HyperLogLog de IPs origen de los puertos que han
+cambiado y el proceso principal los une (máximo por registro) y aplica
+el umbral sobre el total.
+"""
+
+import multiprocessing
+import os
+import time
+import zlib
+from threading import Thread, Lock, Event
+
+from alert_sink import QueueSink
+from metrics import LatencyHistogram, MetricsRegistry
+from network_ids import (RealAttackDetector, NETWORK_IDS_CONFIG, DEFAULT_PAYLOAD_PORTS,
+                         ALERT_SUPPRESSION_TTL, sniff_packets, distributed_scan_alert,
+                         make_sink, enabled_detectors, build_bpf_filter, to_record,
+                         register_metrics, metrics_line, start_metrics)
+from raw_capture import PacketRecord, RawSocketCapture
+from sketches import HyperLogLog
+from trackers import AlertSuppressor
+
+# Campos de PacketRecord enviados a los trabajadores (tuplas compactas)
+RECORD_FIELDS = PacketRecord.__slots__
+
+# Segundos entre envíos de los HyperLogLog por puerto al coordinador
+SERVICE_SCAN_SYNC = 1.0
+
+# Segundos entre envíos de la latencia y los errores por detector
+STATS_SYNC = 5.0
+
+
+def service_scan_message(index, detector):
+    """
+    Registros del HyperLogLog de IPs origen de cada puerto cambiado desde
+    el último envío: {puerto: (inicio de ventana, registros, ts, origen, destino)}
+    """
+    ports = {}
+    for dst_port, (ts, src_ip, dst_ip) in detector.service_scan_updates.items():
+        entry = detector.service_scan_tracker.peek(dst_port)
+        if entry is not None:
+            ports[dst_port] = (entry.start, bytes(entry.sources.registers), ts, src_ip, dst_ip)
+    detector.service_scan_updates.clear()
+    return {'_service_scan': index, 'ports': ports}
+
+
+def worker_stats(index, detector):
+    """
+    Histogramas de latencia y errores por detector, acumulados desde el
+    arranque: el coordinador guarda el último de cada trabajador y los suma
+    """
+    return {'_worker_stats': index, 'latency': detector.detector_latency,
+            'errors': detector.detector_errors}
+
+
+def worker_main(index, workers, conn, alert_queue, interface, settings):
+    """Bucle de un trabajador: recibe lotes de cabeceras y ejecuta los detectores"""
+    detector = RealAttackDetector(
+        interface=interface,
+        settings=settings,
+        sink=QueueSink(alert_queue, index)
+    )
+    # Un snapshot por trabajador; con otro número de trabajadores las IPs
+    # cambian de proceso y el fichero no se reutiliza
+    state_file = settings.get('state_file')
+    if state_file:
+        detector.start_snapshots(f"{state_file}.{index}of{workers}")
+    detector.service_scan_updates = {}
+    packets = 0
+    last_sync = last_stats = time.monotonic()
+
+    try:
+        while True:
+            if conn.poll(SERVICE_SCAN_SYNC):
+                batch = conn.recv()
+                if batch is None:
+                    break
+                for fields in batch:
+                    detector.process_record(PacketRecord(*fields))
+                packets += len(batch)
+            if detector.service_scan_updates and time.monotonic() - last_sync >= SERVICE_SCAN_SYNC:
+                alert_queue.put(service_scan_message(index, detector))
+                last_sync = time.monotonic()
+            if time.monotonic() - last_stats >= STATS_SYNC:
+                alert_queue.put(worker_stats(index, detector))
+                last_stats = time.monotonic()
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        detector.stop_snapshots()
+        if detector.service_scan_updates:
+            alert_queue.put(service_scan_message(index, detector))
+        done = worker_stats(index, detector)
+        done['_worker_done'] = done.pop('_worker_stats')
+        done['packets'] = packets
+        alert_queue.put(done)
+
+
+class ServiceScanMerger:
+    """
+    Unión en el coordinador de los HyperLogLog de IPs origen por puerto
+    de todos los trabajadores. Se guarda el último de cada trabajador; los
+    de una ventana ya terminada (inicio más de window segundos anterior al
+    más reciente) se descartan al unir
+    """
+
+    def __init__(self, window=60, threshold=50, precision=8):
+        self.window = window
+        self.threshold = threshold
+        self.precision = precision
+        self.scans = {}     # puerto -> {trabajador: (inicio, registros)}
+
+    def update(self, worker, ports):
+        """Incorpora el envío de un trabajador; devuelve las alertas que supera el total"""
+        alerts = []
+        for dst_port, (start, registers, ts, src_ip, dst_ip) in ports.items():
+            entries = self.scans.setdefault(dst_port, {})
+            entries[worker] = (start, registers)
+            newest = max(start for start, _ in entries.values())
+            merged = HyperLogLog(self.precision)
+            for other, (start, registers) in list(entries.items()):
+                if newest - start > self.window:
+                    del entries[other]
+                else:
+                    merged.merge(registers)
+            sources = len(merged)
+            if sources >= self.threshold:
+                alert = distributed_scan_alert(src_ip, dst_ip, dst_port, sources)
+                alert['ts'] = ts
+                alerts.append(alert)
+        return alerts
+
+
+class ShardedAttackDetector:
+    """
+    Captura en el proceso principal y análisis repartido en N procesos
+    """
+
+    def __init__(self, interface='eth0', workers=None, settings=None,
+                 batch_size=256, max_batch_delay=0.05, sink=None):
+        self.interface = interface
+        self.settings = NETWORK_IDS_CONFIG if settings is None else settings
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay
+
+        # Proceso principal: solo lo que usan la captura (BPF), la fusión de
+        # alertas (supresor, sink con log en consola) y las métricas. Los
+        # detectores (firmas, trackers, flujos) viven en los trabajadores
+        self.enabled_detectors = enabled_detectors(self.settings)
+        self.payload_ports = self.settings.get('payload_ports', DEFAULT_PAYLOAD_PORTS)
+        self.use_bpf = self.settings.get('bpf_prefilter', True)
+        self.capture_backend = self.settings.get('capture_backend', 'scapy')
+        self.capture = None
+        self.lock = Lock()
+        self.suppressor = AlertSuppressor(ttls=ALERT_SUPPRESSION_TTL)
+        self.sink = sink if sink is not None else make_sink(self.settings)
+        self.packets = 0
+        self.alerts_emitted = 0
+        self.alerts_suppressed = 0
+        # Latencia y errores sumados de los trabajadores (ver _merge_stats)
+        self.detector_latency = None
+        self.detector_errors = dict.fromkeys(self.enabled_detectors, 0)
+        self.service_scans = ServiceScanMerger(
+            window=self.settings.get('scan_window', 60),
+            threshold=self.settings.get('distributed_scan_sources', 50),
+            precision=self.settings.get('hll_precision', 8)
+        )
+
+        self._procs = []
+        self._pipes = []
+        self._batches = []
+        self._last_flush = time.monotonic()
+        # Los lotes parciales también se envían desde un hilo temporizador
+        # (sin tráfico nuevo dispatch no se llama)
+        self._batch_lock = Lock()
+        self._stopping = Event()
+        self._flusher = None
+        self._alert_queue = None
+        self._merger = None
+        self.worker_packets = {}
+        self.worker_stats = {}
+
+    def start_workers(self):
+        """Lanza los trabajadores y el hilo que fusiona sus alertas"""
+        self._alert_queue = multiprocessing.Queue()
+        for index in range(self.workers):
+            recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+            proc = multiprocessing.Process(
+                target=worker_main,
+                args=(index, self.workers, recv_conn, self._alert_queue, self.interface, self.settings),
+                name=f'ids-worker-{index}',
+                daemon=True
+            )
+            proc.start()
+            recv_conn.close()
+            self._procs.append(proc)
+            self._pipes.append(send_conn)
+            self._batches.append([])
+
+        self._merger = Thread(target=self._merge_alerts, name='ids-merger', daemon=True)
+        self._merger.start()
+        self._flusher = Thread(target=self._flush_loop, name='ids-flusher', daemon=True)
+        self._flusher.start()
+
+    def dispatch(self, record):
+        """Envía el registro al trabajador que posee su IP origen"""
+        self.packets += 1
+        # crc32 y no hash(): el reparto es el mismo tras reiniciar, así cada
+        # trabajador recupera su propio snapshot de estado
+        shard = zlib.crc32(record.src.encode()) % self.workers
+        fields = tuple(getattr(record, field) for field in RECORD_FIELDS)
+        with self._batch_lock:
+            batch = self._batches[shard]
+            batch.append(fields)
+            if len(batch) >= self.batch_size:
+                self._send(shard)
+            elif time.monotonic() - self._last_flush > self.max_batch_delay:
+                self._flush()
+
+    def dispatch_packet(self, packet):
+        """Callback prn de scapy"""
+        record = to_record(packet)
+        if record is not None:
+            self.dispatch(record)
+
+    def flush(self):
+        """Envía los lotes parciales de todos los trabajadores"""
+        with self._batch_lock:
+            self._flush()
+
+    def _flush_loop(self):
+        """Cada max_batch_delay envía los lotes que nadie ha enviado"""
+        while not self._stopping.wait(self.max_batch_delay):
+            with self._batch_lock:
+                if time.monotonic() - self._last_flush >= self.max_batch_delay:
+                    self._flush()
+
+    def _flush(self):
+        for shard in range(self.workers):
+            if self._batches[shard]:
+                self._send(shard)
+        self._last_flush = time.monotonic()
+
+    def stop_workers(self):
+        """Vacía los lotes, detiene los trabajadores y espera sus alertas"""
+        self._stopping.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=10)
+        self.flush()
+        for conn in self._pipes:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            conn.close()
+        for proc in self._procs:
+            proc.join(timeout=10)
+        if self._merger is not None:
+            self._merger.join(timeout=10)
+
+    def _send(self, shard):
+        self._pipes[shard].send(self._batches[shard])
+        self._batches[shard] = []
+
+    def _merge_alerts(self):
+        """
+        Pasa las alertas de todos los trabajadores al sink único, une
+        sus HyperLogLog por puerto (escaneo distribuido) y suma sus
+        histogramas de latencia. Las claves que no son de una IP origen
+        (p.ej. el puerto destino de un escaneo distribuido) las puede ver
+        más de un trabajador: se
+        vuelven a filtrar con el supresor del coordinador por (tipo, clave)
+        """
+        remaining = self.workers
+        while remaining:
+            alert = self._alert_queue.get()
+            if '_worker_done' in alert:
+                self.worker_packets[alert['_worker_done']] = alert['packets']
+                self._merge_stats(alert['_worker_done'], alert)
+                remaining -= 1
+            elif '_worker_stats' in alert:
+                self._merge_stats(alert['_worker_stats'], alert)
+            elif '_service_scan' in alert:
+                for merged in self.service_scans.update(alert['_service_scan'], alert['ports']):
+                    self._emit(merged)
+            else:
+                self._emit(alert)
+
+    def _merge_stats(self, worker, stats):
+        """Suma la latencia y los errores por detector de todos los trabajadores"""
+        self.worker_stats[worker] = stats
+        latency = {}
+        errors = dict.fromkeys(self.enabled_detectors, 0)
+        for stats in self.worker_stats.values():
+            for name, histogram in (stats['latency'] or {}).items():
+                latency.setdefault(name, LatencyHistogram()).merge(histogram)
+            for name, count in stats['errors'].items():
+                errors[name] = errors.get(name, 0) + count
+        # Se sustituyen los dicts enteros: /metrics y el log leen uno completo
+        self.detector_latency = latency or None
+        self.detector_errors = errors
+
+    def _emit(self, alert):
+        """Supresión por (tipo, clave) en el coordinador y escritura en el sink"""
+        with self.lock:
+            if not self.suppressor.should_emit(alert['type'], alert['key'], alert['ts']):
+                self.alerts_suppressed += 1
+                return
+            self.alerts_emitted += 1
+        self.sink.submit(alert)
+
+    def build_metrics(self, registry=None):
+        """Métricas del coordinador (paquetes, sink, captura) y las sumadas de los trabajadores"""
+        registry = register_metrics(registry or MetricsRegistry(), self)
+        registry.gauge('tracker_entries', 'Entradas por tracker',
+                       lambda: {'suppressor': len(self.suppressor)}, 'tracker')
+        return registry
+
+    def metrics_line(self):
+        """Resumen de una línea para el log periódico"""
+        return metrics_line(self)
+
+    def start_monitoring(self):
+        """Inicia la captura repartiendo el análisis entre los trabajadores"""
+        bpf_filter = build_bpf_filter(self) if self.use_bpf else None
+
+        print(f"\n🛡️  SIEM Real - Iniciando detección de ataques (multiproceso)")
+        print(f"Interface: {self.interface}")
+        print(f"Captura: {self.capture_backend}")
+        print(f"Trabajadores: {self.workers}")
+        print(f"Filtro BPF: {bpf_filter or '(ninguno)'}")
+        print(f"Presiona Ctrl+C para detener\n")
+        print("=" * 50)
+        print("MONITOREANDO TRÁFICO DE RED...")
+        print("=" * 50)
+
+        self.start_workers()
+        metrics = start_metrics(self)
+        try:
+            if self.capture_backend == 'raw':
+                self.capture = RawSocketCapture(self.interface, bpf_filter=bpf_filter)
+                self.capture.run(self.dispatch)
+            else:
+                sniff_packets(self.interface, bpf_filter, self.dispatch_packet)
+        except KeyboardInterrupt:
+            print("\n\n✓ Monitoreo detenido por el usuario")
+        except Exception as e:
+            print(f"\n✗ Error en monitoreo: {e}")
+        finally:
+            for service in metrics:
+                service.close()
+            self.stop_workers()
+            self.sink.close()
+            for index in sorted(self.worker_packets):
+                print(f"Trabajador {index}: {self.worker_packets[index]} paquetes")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Snapshots - Persistencia periódica del estado de los detectores
+Guarda los trackers (entradas con __slots__) con pickle para que un
+reinicio o un despliegue no vacíe las ventanas de ataque en curso.
+
+- Un hilo temporizador marca `due` cada `interval` segundos; el hilo
+  dueño del estado (captura, monitor SSH) lo comprueba en su bucle y
+  llama a save() en un punto consistente, sin locks en el camino caliente
+- save() hace fork() (como el BGSAVE de Redis): el hijo ve una copia
+  congelada del estado (copy-on-write), la serializa y la escribe de
+  forma atómica (tmp + fsync + rename, permisos 0600) mientras el padre
+  sigue capturando. El padre solo paga el fork; serializar 100k IPs no
+  detiene la captura. Sin fork() (no POSIX) se serializa en el hilo
+- Al arrancar, load() devuelve el último estado y cada detector descarta
+  lo que ya está fuera de su ventana
+
+pickle solo se carga desde un directorio de confianza (root, 0600).
+
+Uso:
+    snapshots = StateSnapshotter('/var/lib/sins/ids_state.pkl', interval=60)
+    state = snapshots.load()
+    snapshots.start()
+    ...
+    if snapshots.due:
+        snapshots.save(detector.state_snapshot)
+    ...
+    snapshots.close(detector.state_snapshot)   # Snapshot final al parar
+"""
+
+import os
+import pickle
+import time
+import traceback
+from threading import Thread, Event
+
+
+def write_atomic(path, data):
+    """Escribe bytes en path sin dejar nunca un fichero a medias"""
+    tmp = f"{path}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    os.replace(tmp, path)
+
+
+class StateSnapshotter:
+    """Snapshots periódicos del estado escritos por un proceso hijo"""
+
+    def __init__(self, path, interval=60, use_fork=True):
+        self.path = path
+        self.interval = interval
+        self.use_fork = use_fork and hasattr(os, 'fork')
+        self.due = False
+        self._child = None
+        self._stop = Event()
+        self._thread = None
+        self.stats = {'snapshots': 0, 'failed': 0, 'skipped': 0, 'bytes': 0, 'pause_ms': 0.0}
+
+    def load(self):
+        """Último estado guardado, o None si no hay o no se puede leer"""
+        try:
+            with open(self.path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️  Snapshot de estado ilegible ({self.path}): {e}")
+            return None
+
+    def start(self):
+        """Arranca el hilo temporizador (marca due y recoge a los hijos)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread = Thread(target=self._run, name='state-snapshot', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._reap()
+            if self._child is None:
+                self.due = True
+            else:
+                # El snapshot anterior aún se está escribiendo
+                self.stats['skipped'] += 1
+
+    def save(self, state_fn):
+        """
+        Toma un snapshot de state_fn() (llamar desde el hilo dueño del
+        estado). Devuelve enseguida si se puede delegar en un hijo
+        """
+        self.due = False
+        if not self.use_fork:
+            self._write(state_fn())
+            return
+
+        started = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            # Hijo: solo serializar y escribir; nunca volver al bucle del padre
+            # (el padre solo ve el código de salida: el motivo va a stderr)
+            status = 1
+            try:
+                write_atomic(self.path, pickle.dumps(state_fn(), pickle.HIGHEST_PROTOCOL))
+                status = 0
+            except BaseException:
+                os.write(2, f"⚠️  Snapshot {self.path}: {traceback.format_exc()}".encode())
+            finally:
+                os._exit(status)
+        self._child = pid
+        self.stats['pause_ms'] = (time.perf_counter() - started) * 1000
+
+    def _reap(self, block=False):
+        """Recoge el hijo terminado y actualiza los contadores"""
+        if self._child is None:
+            return
+        try:
+            pid, status = os.waitpid(self._child, 0 if block else os.WNOHANG)
+        except ChildProcessError:
+            pid, status = self._child, 1
+        if pid == 0:
+            return
+        self._child = None
+        if os.waitstatus_to_exitcode(status) == 0:
+            self.stats['snapshots'] += 1
+            try:
+                self.stats['bytes'] = os.path.getsize(self.path)
+            except OSError:
+                pass
+        else:
+            self.stats['failed'] += 1
+            print(f"⚠️  No se pudo guardar el snapshot {self.path}")
+
+    def _write(self, state):
+        try:
+            data = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+            write_atomic(self.path, data)
+            self.stats['snapshots'] += 1
+            self.stats['bytes'] = len(data)
+        except (OSError, pickle.PicklingError) as e:
+            self.stats['failed'] += 1
+            print(f"⚠️  No se pudo guardar el snapshot {self.path}: {e}")
+
+    def close(self, state_fn=None):
+        """Detiene el temporizador, espera al hijo y escribe el estado final"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._reap(block=True)
+        if state_fn is not None:
+            self._write(state_fn())
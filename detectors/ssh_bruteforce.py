@@ -4,22 +4,72 @@ SSH Brute Force Detector - Detector de ataques reales de fuerza bruta
 Monitorea logs de SSH y detecta intentos de autenticación fallidos
 """
 
-import re
+import os
 import time
-import pymssql
 from collections import defaultdict
 from threading import Thread
-import subprocess
+from alert_sink import AlertSink
+from log_tailer import LogTailer
+from journal_source import JournalSource, DEFAULT_UNITS
+from sshd_parser import parse_sshd_message
+from snapshots import StateSnapshotter
+from ssh_ingest import SyslogClock
+
+# Configuración opcional (config.py junto a los detectores, ver config.example.py)
+try:
+    from config import SSH_MONITOR as SSH_MONITOR_CONFIG
+except ImportError:
+    SSH_MONITOR_CONFIG = {}
+
+# Checkpoint del log (inodo + offset) o cursor del journal para continuar
+# tras un reinicio
+DEFAULT_CHECKPOINT = '/var/lib/sins/ssh_auth.offset'
+DEFAULT_JOURNAL_CURSOR = '/var/lib/sins/ssh_journal.cursor'
+
+# Formato del snapshot de failed_attempts (state_file)
+STATE_VERSION = 1
+
+ALERT_TABLE = '[SENSOR_REMOTO].[SensorDB].[dbo].[Live_Alerts]'
+
+# Eventos que cuentan como intento fallido. Solo 'failed_login' por
+# defecto: sshd registra el mismo intento varias veces ("Invalid user X"
+# seguido de "Failed password for invalid user X", la línea PAM de
+# 'auth_failure', y 'max_attempts' al cortar la conexión) y contaría doble
+DEFAULT_FAILED_EVENTS = ('failed_login',)
+
+# Una línea con hora más antigua que esto indica cambio de año desde que
+# se creó el reloj de syslog (las cabeceras clásicas no llevan año)
+CLOCK_MAX_AGE = 180 * 86400
+
 
 class SSHBruteForceDetector:
     """
     Detecta ataques de fuerza bruta SSH reales analizando logs del sistema
     """
     
-    def __init__(self):
+    def __init__(self, settings=None, sink=None):
+        self.settings = SSH_MONITOR_CONFIG if settings is None else settings
         self.failed_attempts = defaultdict(list)
-        self.threshold = 5  # 5 intentos fallidos
-        self.time_window = 300  # en 5 minutos
+        self.threshold = self.settings.get('failed_login_threshold', 5)  # 5 intentos fallidos
+        self.time_window = self.settings.get('time_window', 300)  # en 5 minutos
+        self.log_file = self.settings.get('log_file', '/var/log/auth.log')
+        self.checkpoint_file = self.settings.get('checkpoint_file', DEFAULT_CHECKPOINT)
+        self.failed_events = frozenset(self.settings.get('failed_events', DEFAULT_FAILED_EVENTS))
+        # Hora de cada línea del fichero a partir de su cabecera de syslog
+        self.clock = SyslogClock(time.time())
+        
+        # Origen: 'file' (log_file) o 'journal' (systemd-journald, Fedora/RHEL)
+        self.source = self.settings.get('source', 'file')
+        self.journal_units = self.settings.get('journal_units', DEFAULT_UNITS)
+        self.journal_cursor_file = self.settings.get('journal_cursor_file', DEFAULT_JOURNAL_CURSOR)
+        
+        # Snapshot periódico de las ventanas en curso (None = sin snapshots)
+        self.state_file = self.settings.get('state_file')
+        self.state_interval = self.settings.get('state_interval', 60)
+        # Posición en log_file del mismo instante que el snapshot: al
+        # reiniciar se sigue desde ahí y no se cuenta dos veces ninguna línea
+        self.tailer = None
+        self.log_position = None
         
         # Configuración de BD
         self.db_config = {
@@ -29,53 +79,27 @@ class SSHBruteForceDetector:
             'password': 'TU_PASSWORD_AQUI',
             'database': 'CentralSIEM'
         }
+        
+        # Escritor de alertas compartido (pool de conexiones + INSERT por lotes)
+        # o el que se inyecte (MemorySink en la ingesta histórica)
+        self.sink = sink if sink is not None else AlertSink(self.db_config, table=ALERT_TABLE)
     
-    def parse_ssh_log(self, log_line):
+    def parse_ssh_log(self, log_line, timestamp=None):
         """
-        Parsea líneas del log de SSH
+        Parsea líneas del log de SSH y devuelve un SSHEvent (o None)
         Ejemplo: "Failed password for root from 192.168.1.100 port 52341 ssh2"
+        timestamp es la hora del evento si el origen la conoce (journal)
         """
-        # Patrón para intentos fallidos
-        failed_pattern = r'Failed password for (?:invalid user )?(\w+) from ([\d.]+) port (\d+)'
-        match = re.search(failed_pattern, log_line)
-        
-        if match:
-            username = match.group(1)
-            ip_address = match.group(2)
-            port = match.group(3)
-            
-            return {
-                'type': 'failed_login',
-                'username': username,
-                'ip': ip_address,
-                'port': port,
-                'timestamp': time.time()
-            }
-        
-        # Patrón para login exitoso después de intentos fallidos (posible compromiso)
-        success_pattern = r'Accepted password for (\w+) from ([\d.]+) port (\d+)'
-        match = re.search(success_pattern, log_line)
-        
-        if match:
-            username = match.group(1)
-            ip_address = match.group(2)
-            port = match.group(3)
-            
-            return {
-                'type': 'successful_login',
-                'username': username,
-                'ip': ip_address,
-                'port': port,
-                'timestamp': time.time()
-            }
-        
-        return None
+        return parse_sshd_message(log_line, timestamp or time.time())
     
-    def check_brute_force(self, ip_address):
+    def check_brute_force(self, ip_address, current_time=None):
         """
         Verifica si una IP está realizando brute force
+        current_time es la hora del último intento (al vaciar un atraso
+        la ventana se mide en tiempo del log, no del reloj)
         """
-        current_time = time.time()
+        if current_time is None:
+            current_time = time.time()
         
         # Limpiar intentos antiguos
         self.failed_attempts[ip_address] = [
@@ -89,34 +113,155 @@ class SSHBruteForceDetector:
         
         return False
     
+    def build_alert(self, attack_data):
+        """Fila de Live_Alerts para un ataque detectado"""
+        return {
+            'type': 'SSH Brute Force',
+            'src_ip': attack_data['ip'],
+            'severity': 'CRITICAL' if attack_data['attempts'] > 10 else 'HIGH',
+            'dst_port': 22,
+            'protocol': 'SSH',
+            'ts': attack_data.get('ts') or time.time()
+        }
+    
     def save_attack_to_db(self, attack_data):
-        """Guarda ataque en la base de datos"""
-        try:
-            conn = pymssql.connect(**self.db_config)
-            cursor = conn.cursor()
-            
-            query = """
-                INSERT INTO [SENSOR_REMOTO].[SensorDB].[dbo].[Live_Alerts] 
-                (TipoAtaque, IP_Origen, Severidad, Puerto_Destino, Protocolo, Timestamp)
-                VALUES (%s, %s, %s, %s, %s, GETDATE())
-            """
-            
-            cursor.execute(query, (
-                'SSH Brute Force',
-                attack_data['ip'],
-                'CRITICAL' if attack_data['attempts'] > 10 else 'HIGH',
-                22,
-                'SSH'
-            ))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            print(f"✓ Ataque SSH registrado: {attack_data['ip']} ({attack_data['attempts']} intentos)")
+        """Encola el ataque para escritura por lotes en la base de datos"""
+        self.sink.submit(self.build_alert(attack_data))
+        
+        print(f"✓ Ataque SSH encolado: {attack_data['ip']} ({attack_data['attempts']} intentos)")
+    
+    def register_event(self, parsed):
+        """
+        Cuenta un evento fallido en la ventana de su IP
+        Devuelve attack_data si la IP supera el umbral (o None)
+        """
+        if parsed.kind not in self.failed_events:
+            return None
+        
+        ip = parsed.ip
+        self.failed_attempts[ip].append(parsed.timestamp)
+        if not self.check_brute_force(ip, parsed.timestamp):
+            return None
+        
+        attack_data = {
+            'ip': ip,
+            'attempts': len(self.failed_attempts[ip]),
+            'username': parsed.username,
+            'ts': parsed.timestamp
+        }
+        # Limpiar para evitar duplicados inmediatos
+        self.failed_attempts[ip].clear()
+        return attack_data
+    
+    def prior_failures(self, parsed):
+        """Intentos fallidos pendientes de la IP de un login exitoso"""
+        attempts = self.failed_attempts.get(parsed.ip)
+        return len(attempts) if attempts else 0
+    
+    def expire(self, now):
+        """Olvida las IPs sin intentos dentro de la ventana (procesos largos)"""
+        stale = [ip for ip, attempts in self.failed_attempts.items()
+                 if not attempts or now - attempts[-1] >= self.time_window]
+        for ip in stale:
+            del self.failed_attempts[ip]
+    
+    def process_line(self, line):
+        """
+        Analiza una línea del log de SSH (syslog) y alerta si hay fuerza bruta
+        La ventana usa la hora de la cabecera (al retomar desde el checkpoint
+        las líneas pendientes no son de ahora); sin cabecera, la actual
+        """
+        if 'sshd' not in line:
+            return
+        timestamp = self.clock(line)
+        if timestamp is not None and time.time() - timestamp > CLOCK_MAX_AGE:
+            self.clock = SyslogClock(time.time())
+            timestamp = self.clock(line)
+        self.process_message(line, timestamp)
+    
+    def process_message(self, line, timestamp=None):
+        """Analiza un mensaje de sshd (línea de log o MESSAGE del journal)"""
+        parsed = self.parse_ssh_log(line, timestamp)
+        if parsed is None:
+            return
+        
+        attack_data = self.register_event(parsed)
+        if attack_data is not None:
+            print(f"\n⚠️  BRUTE FORCE DETECTADO ⚠️")
+            print(f"IP: {attack_data['ip']}")
+            print(f"Intentos fallidos: {attack_data['attempts']}")
+            print(f"Usuario objetivo: {attack_data['username']}")
+            print("-" * 50)
             
-        except Exception as e:
-            print(f"✗ Error guardando en BD: {e}")
+            # Guardar en BD
+            self.save_attack_to_db(attack_data)
+        
+        elif parsed.kind == 'successful_login':
+            # Verificar si hubo intentos fallidos previos (posible compromiso)
+            failures = self.prior_failures(parsed)
+            if failures:
+                print(f"\n⚠️  POSIBLE COMPROMISO ⚠️")
+                print(f"Login exitoso ({parsed.method}) después de {failures} intentos fallidos")
+                print(f"IP: {parsed.ip}")
+                print(f"Usuario: {parsed.username}")
+                print("-" * 50)
+    
+    def state_snapshot(self):
+        """Ventanas de intentos fallidos por IP para un snapshot"""
+        return {
+            'version': STATE_VERSION,
+            'saved': time.time(),
+            'failed_attempts': {ip: attempts for ip, attempts in self.failed_attempts.items() if attempts},
+            'log_position': self.tailer.position() if self.tailer is not None else None
+        }
+    
+    def restore_state(self, state):
+        """Carga un snapshot descartando los intentos fuera de time_window"""
+        if state.get('version') != STATE_VERSION:
+            return
+        now = time.time()
+        for ip, attempts in state['failed_attempts'].items():
+            recent = [t for t in attempts if now - t < self.time_window]
+            if recent:
+                self.failed_attempts[ip] = recent
+        self.log_position = state.get('log_position')
+        print(f"✓ Estado restaurado: {len(self.failed_attempts)} IPs con intentos recientes")
+    
+    def start_snapshots(self):
+        """Carga el último snapshot y arranca los periódicos (o None)"""
+        path = self.state_path(self.state_file)
+        if not path:
+            return None
+        snapshots = StateSnapshotter(path, self.state_interval)
+        state = snapshots.load()
+        if state:
+            self.restore_state(state)
+        try:
+            snapshots.start()
+        except OSError as e:
+            print(f"⚠️  Sin snapshots de estado ({e})")
+            return None
+        return snapshots
+    
+    def state_path(self, path):
+        """Crea el directorio de estado; devuelve None si no se puede escribir"""
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            except OSError as e:
+                print(f"⚠️  Sin checkpoint del log ({e})")
+                return None
+        return path
+    
+    def make_tailer(self):
+        """Seguidor del log con checkpoint"""
+        return LogTailer(self.log_file, checkpoint_path=self.state_path(self.checkpoint_file),
+                         position=self.log_position)
+    
+    def make_journal(self):
+        """Lector del journal filtrado por unidad, con cursor"""
+        return JournalSource(self.journal_units,
+                             cursor_path=self.state_path(self.journal_cursor_file))
     
     def monitor_ssh_logs(self):
         """
@@ -124,65 +269,63 @@ class SSHBruteForceDetector:
         """
         print("\n🔐 SSH Brute Force Detector - Iniciado")
         print("=" * 50)
-        print("Monitoreando /var/log/auth.log")
+        if self.source == 'journal':
+            print(f"Monitoreando journal: {', '.join(self.journal_units)}")
+        else:
+            print(f"Monitoreando {self.log_file}")
         print("Presiona Ctrl+C para detener\n")
         
+        snapshots = self.start_snapshots()
+        if self.source == 'journal':
+            source = self.make_journal().entries()
+        else:
+            self.tailer = self.make_tailer()
+            source = self.tailer.lines()
         try:
-            # Seguir el archivo de log en tiempo real (como tail -f)
-            process = subprocess.Popen(
-                ['tail', '-F', '/var/log/auth.log'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            
-            for line in iter(process.stdout.readline, ''):
-                if 'sshd' in line:
-                    parsed = self.parse_ssh_log(line)
-                    
-                    if parsed and parsed['type'] == 'failed_login':
-                        ip = parsed['ip']
-                        self.failed_attempts[ip].append(parsed['timestamp'])
-                        
-                        # Verificar brute force
-                        if self.check_brute_force(ip):
-                            attack_data = {
-                                'ip': ip,
-                                'attempts': len(self.failed_attempts[ip]),
-                                'username': parsed['username']
-                            }
-                            
-                            print(f"\n⚠️  BRUTE FORCE DETECTADO ⚠️")
-                            print(f"IP: {ip}")
-                            print(f"Intentos fallidos: {attack_data['attempts']}")
-                            print(f"Usuario objetivo: {parsed['username']}")
-                            print("-" * 50)
-                            
-                            # Guardar en BD
-                            self.save_attack_to_db(attack_data)
-                            
-                            # Limpiar para evitar duplicados inmediatos
-                            self.failed_attempts[ip].clear()
-                    
-                    elif parsed and parsed['type'] == 'successful_login':
-                        # Verificar si hubo intentos fallidos previos (posible compromiso)
-                        ip = parsed['ip']
-                        if ip in self.failed_attempts and len(self.failed_attempts[ip]) > 0:
-                            print(f"\n⚠️  POSIBLE COMPROMISO ⚠️")
-                            print(f"Login exitoso después de {len(self.failed_attempts[ip])} intentos fallidos")
-                            print(f"IP: {ip}")
-                            print(f"Usuario: {parsed['username']}")
-                            print("-" * 50)
+            if self.source == 'journal':
+                # Entradas estructuradas de journald (ya filtradas por unidad)
+                for message, timestamp in source:
+                    self.process_message(message, timestamp)
+                    if snapshots is not None and snapshots.due:
+                        snapshots.save(self.state_snapshot)
+            else:
+                # Seguir el archivo de log en tiempo real (como tail -F, sin
+                # subproceso) continuando desde el último checkpoint
+                for line in source:
+                    self.process_line(line)
+                    if snapshots is not None and snapshots.due:
+                        snapshots.save(self.state_snapshot)
         
         except KeyboardInterrupt:
             print("\n\n✓ Monitoreo SSH detenido")
         except Exception as e:
             print(f"\n✗ Error: {e}")
+        finally:
+            # Cierra el fichero/journal y guarda el checkpoint o cursor
+            source.close()
+            if snapshots is not None:
+                snapshots.close(self.state_snapshot)
+            self.sink.close()
 
 def main():
-    import os
+    import argparse
     import sys
     
+    parser = argparse.ArgumentParser(description='SIEM Real - SSH Brute Force Detector')
+    parser.add_argument('--ingest', nargs='+', metavar='FILE',
+                        help='Analizar logs históricos (auth.log*, también .gz) en lugar de seguir el log')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Con --ingest, procesos en paralelo (por defecto: uno por CPU)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Con --ingest, mostrar las detecciones sin escribir en BD')
+    args = parser.parse_args()
+    
+    # Ingesta histórica: no necesita root si los ficheros son legibles
+    if args.ingest:
+        from ssh_ingest import ingest
+        ingest(args.ingest, SSH_MONITOR_CONFIG, workers=args.workers, dry_run=args.dry_run)
+        return
+    
     # Verificar permisos
     if os.geteuid() != 0:
         print("✗ Este script debe ejecutarse como root (sudo)")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+SSH Ingest - Análisis histórico de logs de autenticación
+Pasa la lógica de SSHBruteForceDetector por muchos auth.log* (también
+rotados y comprimidos .gz) en modo lote:
+- un proceso por fichero (multiprocessing.Pool), los más grandes primero
+- lectura en bloques de 1 MB y filtro 'sshd' sobre bytes antes de decodificar
+- las ventanas de time_window usan la hora de cada línea, no la del reloj
+- las detecciones se escriben al final con INSERT multi-fila
+
+Cada fichero se evalúa por separado: un ataque que cruce justo el
+instante de una rotación puede contarse en dos ventanas más cortas.
+
+Uso:
+    python3 detectors/ssh_bruteforce.py --ingest /var/log/auth.log* --workers 8
+    python3 detectors/ssh_bruteforce.py --ingest incidente/secure-* --dry-run
+"""
+
+import gzip
+import multiprocessing
+import os
+import time
+from datetime import datetime
+
+from alert_sink import AlertSink, MemorySink, MAX_VALUES_ROWS
+from sshd_parser import parse_sshd_message
+
+MONTHS = {name: index for index, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+
+# Cada cuántos eventos se olvidan las IPs fuera de ventana
+EXPIRE_EVERY = 100000
+
+
+class SyslogClock:
+    """
+    Convierte la cabecera de una línea de syslog en epoch (hora local)
+    - Clásica "Oct 18 03:12:01 host ...": sin año; se toma el de la fecha
+      de modificación del fichero, o el anterior si el mes es posterior
+    - RFC 3339 "2026-10-18T03:12:01.123456+02:00 host ..." (rsyslog moderno)
+    Las líneas consecutivas suelen compartir segundo: se reutiliza el último
+    """
+
+    def __init__(self, reference):
+        ref = time.localtime(reference)
+        self.year = ref.tm_year
+        self.month = ref.tm_mon
+        self._last_key = None
+        self._last_ts = None
+
+    def __call__(self, line):
+        key = line[:15]
+        if key == self._last_key:
+            return self._last_ts
+        try:
+            if key[:4].isdigit():
+                ts = datetime.fromisoformat(line.split(' ', 1)[0]).timestamp()
+                key = None      # Fracciones de segundo: no se reutiliza
+            else:
+                month = MONTHS[key[:3]]
+                year = self.year - 1 if month > self.month else self.year
+                ts = time.mktime((year, month, int(key[4:6]), int(key[7:9]),
+                                  int(key[10:12]), int(key[13:15]), 0, 0, -1))
+        except (KeyError, ValueError):
+            return None
+        self._last_key = key
+        self._last_ts = ts
+        return ts
+
+
+def iter_lines(path, read_size=1 << 20):
+    """Líneas (bytes, sin '\\n') de un log plano o .gz leídas en bloques grandes"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        partial = b''
+        while True:
+            chunk = f.read(read_size)
+            if not chunk:
+                break
+            lines = (partial + chunk).split(b'\n')
+            partial = lines.pop()
+            yield from lines
+        if partial:
+            yield partial
+
+
+def scan_file(job):
+    """
+    Trabajador: analiza un fichero completo con su propio detector
+    Devuelve un dict con contadores, ataques y posibles compromisos
+    """
+    path, settings = job
+    from ssh_bruteforce import SSHBruteForceDetector
+
+    started = time.perf_counter()
+    detector = SSHBruteForceDetector(settings, sink=MemorySink())
+    clock = SyslogClock(os.stat(path).st_mtime)
+    result = {'path': path, 'lines': 0, 'events': 0, 'unparsed_time': 0,
+              'attacks': [], 'compromises': [], 'first_ts': None, 'last_ts': None}
+
+    try:
+        for raw in iter_lines(path):
+            result['lines'] += 1
+            if b'sshd' not in raw:
+                continue
+            line = raw.decode('utf-8', 'replace')
+            parsed = parse_sshd_message(line)
+            if parsed is None:
+                continue
+            parsed.timestamp = clock(line)
+            if parsed.timestamp is None:
+                result['unparsed_time'] += 1
+                continue
+
+            result['events'] += 1
+            if result['first_ts'] is None:
+                result['first_ts'] = parsed.timestamp
+            result['last_ts'] = parsed.timestamp
+
+            attack_data = detector.register_event(parsed)
+            if attack_data is not None:
+                result['attacks'].append(attack_data)
+            elif parsed.kind == 'successful_login':
+                failures = detector.prior_failures(parsed)
+                if failures:
+                    result['compromises'].append({'ip': parsed.ip, 'username': parsed.username,
+                                                  'attempts': failures, 'ts': parsed.timestamp})
+
+            if result['events'] % EXPIRE_EVERY == 0:
+                detector.expire(parsed.timestamp)
+    except (OSError, EOFError) as e:
+        # Fichero ilegible o .gz truncado: se conserva lo analizado hasta ahí
+        result['error'] = str(e)
+
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def format_ts(ts):
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') if ts else '-'
+
+
+def ingest(paths, settings, workers=None, dry_run=False):
+    """
+    Analiza los ficheros en paralelo y escribe las detecciones en lote
+    Devuelve la lista de ataques (attack_data) ordenada por tiempo
+    """
+    from ssh_bruteforce import SSHBruteForceDetector, ALERT_TABLE
+
+    paths = [path for path in paths if os.path.isfile(path)]
+    if not paths:
+        print("✗ No hay ficheros que analizar")
+        return []
+
+    # Los más grandes primero para repartir mejor la carga
+    paths.sort(key=os.path.getsize, reverse=True)
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    jobs = [(path, settings) for path in paths]
+
+    print(f"\n🔐 Ingesta histórica SSH: {len(paths)} fichero(s), {workers} proceso(s)")
+    print("=" * 50)
+
+    started = time.perf_counter()
+    totals = {'lines': 0, 'events': 0, 'unparsed_time': 0}
+    attacks = []
+    compromises = []
+
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        results = pool.imap_unordered(scan_file, jobs) if pool else map(scan_file, jobs)
+        for result in results:
+            for key in totals:
+                totals[key] += result[key]
+            attacks.extend(result['attacks'])
+            compromises.extend(result['compromises'])
+            status = f"✗ {result['error']}" if 'error' in result else '✓'
+            print(f"{status} {os.path.basename(result['path'])}: {result['lines']:,} líneas, "
+                  f"{result['events']:,} eventos, {len(result['attacks'])} ataques "
+                  f"({format_ts(result['first_ts'])} → {format_ts(result['last_ts'])}, "
+                  f"{result['seconds']:.1f} s)")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    elapsed = time.perf_counter() - started
+    attacks.sort(key=lambda attack: attack['ts'])
+    compromises.sort(key=lambda item: item['ts'])
+
+    print("=" * 50)
+    print(f"✓ {totals['lines']:,} líneas en {elapsed:.1f} s "
+          f"({totals['lines'] / elapsed if elapsed else 0:,.0f} líneas/s)")
+    print(f"  Eventos sshd: {totals['events']:,}")
+    if totals['unparsed_time']:
+        print(f"⚠️  {totals['unparsed_time']:,} eventos sin fecha reconocible (ignorados)")
+    print(f"  Ataques de fuerza bruta: {len(attacks)} "
+          f"desde {len({attack['ip'] for attack in attacks})} IPs")
+    for item in compromises:
+        print(f"⚠️  POSIBLE COMPROMISO: {item['username']} desde {item['ip']} "
+              f"tras {item['attempts']} intentos fallidos ({format_ts(item['ts'])})")
+
+    if attacks and not dry_run:
+        # Un solo detector para reutilizar db_config y build_alert
+        detector = SSHBruteForceDetector(settings, sink=MemorySink())
+        sink = AlertSink(detector.db_config, table=ALERT_TABLE, batch_size=MAX_VALUES_ROWS)
+        try:
+            sink.write_batch([detector.build_alert(attack) for attack in attacks])
+        finally:
+            sink.close()
+        stats = sink.stats()
+        print(f"✓ {stats['flushed']} ataques escritos en BD ({stats['failed']} fallidos)")
+
+    return attacks
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+SSHD Parser - Parser de mensajes de sshd para el detector de fuerza bruta
+Cada tipo de mensaje tiene una palabra clave y una regex precompilada:
+una línea solo llega a la regex si contiene la palabra clave (búsqueda
+de subcadena en C), así la gran mayoría de líneas de sshd (sesiones,
+desconexiones...) se descartan sin ejecutar ninguna expresión regular.
+
+Tipos reconocidos (los de SSH_MONITOR['failed_keywords'] y más):
+- failed_login:      Failed password|publickey|keyboard-interactive for [invalid user] X from IP
+- invalid_user:      Invalid user X from IP [port P]
+- auth_failure:      pam_unix(sshd:auth): authentication failure; ... rhost=IP [user=X]
+- max_attempts:      maximum authentication attempts exceeded for [invalid user] X from IP
+- successful_login:  Accepted password|publickey|keyboard-interactive for X from IP
+
+Las IPs origen pueden ser IPv4, IPv6 o IPv4 mapeada (::ffff:a.b.c.d).
+"""
+
+import re
+from operator import itemgetter
+
+# Los grupos se llaman como los parámetros de SSHEvent
+_IP = r'(?P<ip>[0-9A-Fa-f:.]+)'         # IPv4/IPv6 (sshd no añade corchetes)
+_PORT = r'(?: port (?P<port>\d+))?'
+_USER = r'(?:(?P<invalid_user>invalid user) )?(?P<username>\S*)'
+
+
+class SSHEvent:
+    """
+    Evento de autenticación de sshd. Los campos son los grupos de la regex
+    sin convertir (port es texto, como en el parser anterior); los que el
+    mensaje no trae quedan en None y invalid_user se evalúa como booleano
+    """
+
+    __slots__ = ('kind', 'username', 'ip', 'port', 'method', 'invalid_user', 'timestamp')
+
+    def __init__(self, kind, username, ip, port=None, method=None,
+                 invalid_user=None, timestamp=None):
+        self.kind = kind
+        self.username = username
+        self.ip = ip
+        self.port = port
+        self.method = method
+        self.invalid_user = invalid_user
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return (f"SSHEvent({self.kind}, user={self.username!r}, ip={self.ip}, "
+                f"port={self.port}, method={self.method})")
+
+
+# Orden de los campos en SSHEvent; una regla que no tiene un grupo lo deja en None
+FIELDS = ('username', 'ip', 'port', 'method', 'invalid_user')
+_MISSING = (None,)
+
+
+def _rule(keyword, kind, pattern):
+    """
+    Regla (palabra clave, tipo, regex, pick): pick extrae de
+    match.groups() + _MISSING los campos en el orden de FIELDS
+    (más barato que groupdict())
+    """
+    regex = re.compile(pattern)
+    index = regex.groupindex
+    pick = itemgetter(*(index[name] - 1 if name in index else -1 for name in FIELDS))
+    return keyword, kind, regex, pick
+
+
+# La regex empieza en la palabra clave; orden de frecuencia esperada en un ataque
+RULES = (
+    _rule('Failed ', 'failed_login',
+          r'Failed (?P<method>\S+) '
+          r'for ' + _USER + r' from ' + _IP + _PORT),
+    _rule('Invalid user', 'invalid_user',
+          r'(?P<invalid_user>Invalid user) (?P<username>.*?) from ' + _IP + _PORT),
+    _rule('authentication failure', 'auth_failure',
+          r'authentication failure;.*? rhost=(?P<ip>\S+)(?:\s+user=(?P<username>\S+))?'),
+    _rule('maximum authentication attempts', 'max_attempts',
+          r'maximum authentication attempts exceeded for ' + _USER + r' from ' + _IP + _PORT),
+    _rule('Accepted ', 'successful_login',
+          r'Accepted (?P<method>\S+) for (?P<username>\S+) from ' + _IP + _PORT),
+)
+
+
+def parse_sshd_message(line, timestamp=None):
+    """
+    Devuelve un SSHEvent o None si la línea no es un mensaje de autenticación
+    """
+    for keyword, kind, regex, pick in RULES:
+        start = line.find(keyword)
+        if start < 0:
+            continue
+        # Match anclado en la palabra clave: la regex no recorre la línea
+        match = regex.match(line, start)
+        if match is not None:
+            return SSHEvent(kind, *pick(match.groups() + _MISSING), timestamp)
+    return None
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Streams - Reensamblado TCP para la inspección de payloads
+Tabla de flujos acotada (clave: 5-tupla dirigida) que reconstruye el
+flujo de bytes de cada conexión hasta una profundidad configurable y
+pasa cada trozo nuevo al motor de firmas de forma incremental, así un
+"UNION SELECT" partido en dos segmentos se detecta y las
+retransmisiones no se vuelven a analizar.
+
+Límites para comportarse bien bajo SYN flood:
+- Solo se crea un flujo al ver el primer segmento con datos
+- LRU + expiración por inactividad (barrido cada expire_interval
+  segundos de tiempo de paquete)
+- Tope de flujos y de memoria (segmentos fuera de orden + cola regex)
+"""
+
+from collections import OrderedDict
+
+from raw_capture import TCP_FIN, TCP_RST
+from signatures import REGEX_OVERLAP
+
+SEQ_MOD = 1 << 32
+SEQ_HALF = 1 << 31
+
+# Coste aproximado de un flujo vacío (objeto + clave + entrada del dict)
+FLOW_OVERHEAD = 400
+
+
+def seq_diff(a, b):
+    """a - b en aritmética de números de secuencia TCP (con signo)"""
+    diff = (a - b) % SEQ_MOD
+    return diff - SEQ_MOD if diff >= SEQ_HALF else diff
+
+
+class Flow:
+    """Estado de reensamblado de un sentido de una conexión"""
+
+    __slots__ = ('start_seq', 'head', 'next_seq', 'inspected', 'pending', 'pending_bytes',
+                 'ac_state', 'tail', 'reported', 'last_seen', 'done')
+
+    def __init__(self, seq, now):
+        self.start_seq = seq         # Primer byte analizado
+        self.head = b''              # Primeros bytes del flujo (para unir lo anterior)
+        self.next_seq = seq
+        self.inspected = 0
+        self.pending = None          # {seq: bytes} fuera de orden
+        self.pending_bytes = 0
+        self.ac_state = 0
+        self.tail = b''
+        self.reported = None         # índices de firma ya alertados
+        self.last_seen = now
+        self.done = False            # profundidad alcanzada
+
+    def memory(self):
+        return FLOW_OVERHEAD + self.pending_bytes + len(self.tail) + len(self.head)
+
+
+class FlowTable:
+    """
+    Tabla de flujos TCP con reensamblado y búsqueda incremental de firmas
+    """
+
+    def __init__(self, engine, depth=8192, max_flows=50000, idle_timeout=60,
+                 max_memory=32 * 1024 * 1024, max_pending_segments=16,
+                 expire_interval=1.0):
+        self.engine = engine
+        self.depth = depth
+        self.max_flows = max_flows
+        self.idle_timeout = idle_timeout
+        self.expire_interval = expire_interval
+        self.next_expire = 0.0
+        self.max_memory = max_memory
+        self.max_pending_segments = max_pending_segments
+
+        self.flows = OrderedDict()
+        self.memory = 0
+        self.stats = {
+            'created': 0,
+            'evicted': 0,
+            'expired': 0,
+            'retransmitted': 0,
+            'backfilled': 0,
+            'out_of_order_dropped': 0
+        }
+
+    def __len__(self):
+        return len(self.flows)
+
+    def feed(self, record):
+        """
+        Procesa un segmento TCP; devuelve los índices de firma nuevos
+        (no alertados antes en este flujo) que aparecen en el flujo
+        """
+        key = (record.src, record.sport, record.dst, record.dport)
+        now = record.ts
+        if now >= self.next_expire:
+            self.expire(now)
+        flow = self.flows.get(key)
+
+        if record.flags & (TCP_FIN | TCP_RST):
+            found = self._segment(key, flow, record, now) if record.payload else []
+            self._remove(key)
+            return found
+
+        if not record.payload:
+            return []
+
+        return self._segment(key, flow, record, now)
+
+    def _segment(self, key, flow, record, now):
+        if flow is None:
+            flow = Flow(record.seq, now)
+            self.flows[key] = flow
+            self.memory += FLOW_OVERHEAD
+            self.stats['created'] += 1
+            self._enforce_limits()
+        else:
+            flow.last_seen = now
+            self.flows.move_to_end(key)
+
+        if flow.done:
+            return []
+
+        before = flow.memory()
+        found = []
+        gap = seq_diff(flow.start_seq, record.seq)
+        if 0 < gap <= self.depth:
+            # El primer segmento visto llegó desordenado: esto es anterior
+            found = self._backfill(flow, record.payload, gap)
+
+        offset = seq_diff(record.seq, flow.next_seq)
+        if offset > 0:
+            # Hueco: guardar hasta que llegue lo que falta
+            self._hold(flow, record.seq, record.payload)
+        else:
+            data = record.payload[-offset:] if offset < 0 else record.payload
+            if data:
+                found += self._deliver(flow, data)
+                found += self._drain(flow)
+            elif gap <= 0:
+                self.stats['retransmitted'] += 1
+
+        if flow.done and flow.pending:
+            flow.pending = None
+            flow.pending_bytes = 0
+        self.memory += flow.memory() - before
+        self._enforce_limits()
+        return found
+
+    def _deliver(self, flow, data):
+        """Pasa bytes contiguos al motor de firmas"""
+        flow.next_seq = (flow.next_seq + len(data)) % SEQ_MOD
+        room = self.depth - flow.inspected
+        if len(data) >= room:
+            data = data[:room]
+            flow.done = True
+        flow.inspected += len(data)
+        if len(flow.head) < REGEX_OVERLAP:
+            flow.head += data[:REGEX_OVERLAP - len(flow.head)]
+
+        flow.ac_state, flow.tail, found = self.engine.match_incremental(
+            data, flow.ac_state, flow.tail)
+        if flow.done:
+            flow.tail = b''
+            flow.head = b''
+        return self._new(flow, found)
+
+    def _backfill(self, flow, payload, gap):
+        """
+        Analiza los gap primeros bytes de payload, anteriores al inicio del
+        flujo ya analizado. Si llegan hasta él se unen a su principio (head)
+        para las firmas partidas y el flujo pasa a empezar en ellos
+        """
+        room = self.depth - flow.inspected
+        if room <= 0:
+            return []
+        early = payload[:gap]
+        contiguous = len(payload) >= gap
+        if len(early) > room:
+            early = early[len(early) - room:]
+        flow.inspected += len(early)
+        self.stats['backfilled'] += 1
+
+        window = early
+        if contiguous:
+            window = early + flow.head
+            flow.start_seq = (flow.start_seq - len(early)) % SEQ_MOD
+            flow.head = window[:REGEX_OVERLAP]
+        _, _, found = self.engine.match_incremental(window)
+        return self._new(flow, found)
+
+    def _new(self, flow, found):
+        """Índices de firma aún no alertados en este flujo"""
+        new = []
+        for index in found:
+            if flow.reported is None:
+                flow.reported = set()
+            if index not in flow.reported:
+                flow.reported.add(index)
+                new.append(index)
+        return new
+
+    def _drain(self, flow):
+        """Entrega los segmentos guardados que ya son contiguos"""
+        found = []
+        while flow.pending and not flow.done:
+            for seq in flow.pending:
+                offset = seq_diff(seq, flow.next_seq)
+                if offset <= 0:
+                    break
+            else:
+                break
+            data = flow.pending.pop(seq)
+            flow.pending_bytes -= len(data)
+            data = data[-offset:] if offset < 0 else data
+            if data:
+                found += self._deliver(flow, data)
+        return found
+
+    def _hold(self, flow, seq, payload):
+        if flow.pending is None:
+            flow.pending = {}
+        if seq in flow.pending:
+            self.stats['retransmitted'] += 1
+            return
+        if len(flow.pending) >= self.max_pending_segments:
+            self.stats['out_of_order_dropped'] += 1
+            return
+        flow.pending[seq] = payload
+        flow.pending_bytes += len(payload)
+
+    def expire(self, now):
+        """Elimina flujos inactivos (los más antiguos están al frente)"""
+        self.next_expire = now + self.expire_interval
+        while self.flows:
+            key, flow = next(iter(self.flows.items()))
+            if now - flow.last_seen < self.idle_timeout:
+                break
+            self._remove(key)
+            self.stats['expired'] += 1
+
+    def _enforce_limits(self):
+        """Expulsa por LRU al superar el tope de flujos o de memoria"""
+        while self.flows and (len(self.flows) > self.max_flows or self.memory > self.max_memory):
+            key = next(iter(self.flows))
+            self._remove(key)
+            self.stats['evicted'] += 1
+
+    def _remove(self, key):
+        flow = self.flows.pop(key, None)
+        if flow is not None:
+            self.memory -= flow.memory()
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Trackers - Estructuras de estado para los detectores
+Estructuras con coste O(1) por paquete y memoria acotada para que el
+estado de los detectores no dependa del volumen de tráfico
+"""
+
+import sys
+from collections import OrderedDict
+
+
+class AlertSuppressor:
+    """
+    Índice de supresión de alertas duplicadas por clave y tiempo
+    Cada tipo de ataque tiene su propio TTL; una alerta con la misma
+    clave (tipo + IP origen) se suprime hasta que expira su entrada.
+    Las entradas de un mismo tipo comparten TTL, por lo que el orden de
+    inserción coincide con el de expiración y la purga es amortizada O(1)
+    """
+
+    def __init__(self, ttls=None, default_ttl=60, max_entries=10000):
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._by_type = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def should_emit(self, attack_type, key, now):
+        """
+        Devuelve True si la alerta debe emitirse (y la registra)
+        o False si hay una igual vigente
+        """
+        entries = self._by_type.get(attack_type)
+        if entries is None:
+            entries = self._by_type[attack_type] = OrderedDict()
+
+        self._expire(entries, now)
+
+        expires = entries.get(key)
+        if expires is not None and expires > now:
+            return False
+
+        if expires is not None:
+            del entries[key]
+            self._size -= 1
+        elif self._size >= self.max_entries:
+            self._evict_oldest(entries)
+
+        entries[key] = now + self.ttls.get(attack_type, self.default_ttl)
+        self._size += 1
+        return True
+
+    def export(self):
+        """{tipo: [(clave, vencimiento), ...]} para un snapshot"""
+        return {attack_type: list(entries.items())
+                for attack_type, entries in self._by_type.items() if entries}
+
+    def restore(self, state, now):
+        """Carga un snapshot descartando las supresiones ya vencidas"""
+        for attack_type, items in state.items():
+            entries = self._by_type.setdefault(attack_type, OrderedDict())
+            for key, expires in items:
+                if expires > now and key not in entries and self._size < self.max_entries:
+                    entries[key] = expires
+                    self._size += 1
+
+    def _expire(self, entries, now):
+        """Elimina del frente las entradas ya vencidas"""
+        while entries:
+            key, expires = next(iter(entries.items()))
+            if expires > now:
+                break
+            del entries[key]
+            self._size -= 1
+
+    def _evict_oldest(self, entries):
+        """Libera espacio cuando se alcanza max_entries"""
+        if not entries:
+            entries = max(self._by_type.values(), key=len)
+        entries.popitem(last=False)
+        self._size -= 1
+
+
+class HitWindow:
+    """Ventana abierta de HitAggregator: alerta de muestra y hits tras el primero"""
+
+    __slots__ = ('alert', 'count', 'first_seen', 'last_seen')
+
+    def __init__(self, alert, now):
+        self.alert = alert
+        self.count = 0
+        self.first_seen = now
+        self.last_seen = now
+
+
+class HitAggregator:
+    """
+    Agregación de eventos repetidos por ventanas de tiempo
+    El primer evento de una clave se emite en el acto (lo envía quien
+    llama a open()) y abre su ventana de `window` segundos con su alerta
+    como muestra; los siguientes solo suman al contador. Al vencer la
+    ventana, si hubo más eventos, se emite una copia de la muestra con
+    'count' (eventos tras el primero), 'first_seen' (el del primero) y
+    'last_seen'. Todas las ventanas duran lo mismo, así el
+    orden de inserción coincide con el de vencimiento y due() solo mira el
+    frente. Con max_entries lleno se cierra antes la ventana más antigua:
+    nunca se pierde ningún evento
+    """
+
+    def __init__(self, window=60, max_entries=10000):
+        self.window = window
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._closed = []
+        self.hits = 0
+        self.windows = 0
+        self.forced = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def count(self, key, now):
+        """Suma un evento a la ventana abierta de key; False si no hay ninguna"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        entry.count += 1
+        entry.last_seen = now
+        self.hits += 1
+        return True
+
+    def open(self, key, alert, now):
+        """
+        Abre la ventana de key con alert como muestra (primer evento, que
+        quien llama ya ha emitido)
+        """
+        if len(self._entries) >= self.max_entries:
+            _, oldest = self._entries.popitem(last=False)
+            self._close(oldest, self._closed)
+            self.forced += 1
+        self._entries[key] = HitWindow(alert, now)
+        self.hits += 1
+
+    def due(self, now):
+        """Alertas de las ventanas vencidas (y de las cerradas antes de tiempo)"""
+        closed = self._closed
+        self._closed = []
+        entries = self._entries
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if now - entry.first_seen < self.window:
+                break
+            del entries[key]
+            self._close(entry, closed)
+        return closed
+
+    def drain(self):
+        """Cierra todas las ventanas (al detener el detector)"""
+        closed = self._closed
+        self._closed = []
+        for entry in self._entries.values():
+            self._close(entry, closed)
+        self._entries.clear()
+        return closed
+
+    def _close(self, entry, closed):
+        """Añade a closed la alerta de seguimiento (si hubo más de un evento)"""
+        self.windows += 1
+        if not entry.count:
+            return
+        # Copia: la muestra es la primera alerta, que puede seguir en la cola del sink
+        alert = dict(entry.alert)
+        alert['count'] = entry.count
+        alert['first_seen'] = entry.first_seen
+        alert['last_seen'] = entry.last_seen
+        alert['ts'] = entry.last_seen
+        closed.append(alert)
+
+
+class TrackerEntry:
+    """Base de las entradas de un SourceTracker (compactas, con __slots__)"""
+
+    __slots__ = ('last_seen',)
+
+    def __init__(self, now):
+        self.last_seen = now
+
+    def memory(self):
+        """Bytes aproximados que ocupa la entrada"""
+        return sys.getsizeof(self)
+
+
+class PortScanEntry(TrackerEntry):
+    """
+    Puertos destino distintos vistos desde una IP en la ventana actual
+    ports es un set exacto o un sketch de tamaño fijo (HyperLogLog,
+    PortBitmap) con la misma interfaz add()/len()/clear()
+    """
+
+    __slots__ = ('ports', 'start')
+
+    def __init__(self, now, ports=None):
+        super().__init__(now)
+        self.ports = set() if ports is None else ports
+        self.start = now
+
+    def memory(self):
+        if isinstance(self.ports, set):
+            return sys.getsizeof(self) + sys.getsizeof(self.ports)
+        return sys.getsizeof(self) + self.ports.memory()
+
+
+class HostScanEntry(TrackerEntry):
+    """
+    Hosts destino y puertos distintos sondeados desde una IP (barrido
+    horizontal o en bloque); hosts y ports son contadores tipo set
+    """
+
+    __slots__ = ('hosts', 'ports', 'start')
+
+    def __init__(self, now, hosts=None, ports=None):
+        super().__init__(now)
+        self.hosts = set() if hosts is None else hosts
+        self.ports = set() if ports is None else ports
+        self.start = now
+
+    def memory(self):
+        size = sys.getsizeof(self)
+        for counter in (self.hosts, self.ports):
+            size += sys.getsizeof(counter) if isinstance(counter, set) else counter.memory()
+        return size
+
+
+class ServiceScanEntry(TrackerEntry):
+    """IPs origen distintas que sondean un mismo puerto destino (escaneo distribuido)"""
+
+    __slots__ = ('sources', 'start')
+
+    def __init__(self, now, sources=None):
+        super().__init__(now)
+        self.sources = set() if sources is None else sources
+        self.start = now
+
+    def memory(self):
+        if isinstance(self.sources, set):
+            return sys.getsizeof(self) + sys.getsizeof(self.sources)
+        return sys.getsizeof(self) + self.sources.memory()
+
+
+class CounterEntry(TrackerEntry):
+    """Contador de paquetes de una IP en la ventana actual"""
+
+    __slots__ = ('count', 'start')
+
+    def __init__(self, now):
+        super().__init__(now)
+        self.count = 0
+        self.start = now
+
+
+class SlidingWindowCounter(TrackerEntry):
+    """
+    Contador de eventos en una ventana deslizante de `window` segundos
+    Anillo de `slots` cubetas de window/slots segundos: add() y count()
+    son O(1) amortizado (como mucho se limpian `slots` cubetas) y una
+    ráfaga que cruza el borde de una ventana fija no se pierde. El error
+    es como mucho una cubeta de eventos antiguos.
+    """
+
+    __slots__ = ('width', 'buckets', 'last_slot', 'total')
+
+    def __init__(self, now, window=10, slots=10):
+        super().__init__(now)
+        self.width = window / slots
+        self.buckets = [0] * slots
+        self.last_slot = int(now // self.width)
+        self.total = 0
+
+    def _advance(self, now):
+        slot = int(now // self.width)
+        steps = slot - self.last_slot
+        if steps <= 0:
+            return slot
+        buckets = self.buckets
+        size = len(buckets)
+        if steps >= size:
+            for i in range(size):
+                buckets[i] = 0
+            self.total = 0
+        else:
+            for s in range(self.last_slot + 1, slot + 1):
+                i = s % size
+                self.total -= buckets[i]
+                buckets[i] = 0
+        self.last_slot = slot
+        return slot
+
+    def add(self, now, amount=1):
+        """
+        Suma amount en el instante now y devuelve el total de la ventana
+        Un evento atrasado va a su cubeta si aún está en el anillo; si es
+        más antiguo que la ventana se descarta
+        """
+        slot = self._advance(now)
+        if self.last_slot - slot >= len(self.buckets):
+            return self.total
+        self.buckets[slot % len(self.buckets)] += amount
+        self.total += amount
+        return self.total
+
+    def count(self, now):
+        """Total de eventos en la ventana que termina en now"""
+        self._advance(now)
+        return self.total
+
+    def memory(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.buckets)
+
+
+class SourceTracker:
+    """
+    Estado por IP origen con memoria acotada
+    - Tope duro de entradas: al superarlo se expulsa la menos reciente (LRU)
+    - Expiración por inactividad con barrido amortizado: en cada acceso se
+      revisan unas pocas entradas del frente (las menos recientes)
+    Así un SYN flood con origen falsificado no puede agotar la memoria
+    """
+
+    def __init__(self, entry_factory, max_entries=100000, idle_timeout=120, sweep_batch=8):
+        self.entry_factory = entry_factory
+        self.max_entries = max_entries
+        self.idle_timeout = idle_timeout
+        self.sweep_batch = sweep_batch
+        self._entries = OrderedDict()
+        self.evicted = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, now):
+        """Devuelve (creando si hace falta) la entrada de key y la marca como reciente"""
+        entries = self._entries
+        entry = entries.get(key)
+        if entry is None:
+            self._sweep(now)
+            if len(entries) >= self.max_entries:
+                entries.popitem(last=False)
+                self.evicted += 1
+            entry = entries[key] = self.entry_factory(now)
+        else:
+            entries.move_to_end(key)
+            entry.last_seen = now
+        return entry
+
+    def peek(self, key):
+        """Entrada de key sin crearla ni marcarla como reciente (o None)"""
+        return self._entries.get(key)
+
+    def export(self):
+        """[(clave, entrada), ...] de la menos a la más reciente, para un snapshot"""
+        return list(self._entries.items())
+
+    def restore(self, items, now):
+        """
+        Carga las entradas de un snapshot en orden LRU, descartando las
+        inactivas más de idle_timeout. Devuelve cuántas se cargaron
+        """
+        entries = self._entries
+        loaded = 0
+        for key, entry in items:
+            if now - entry.last_seen >= self.idle_timeout or key in entries:
+                continue
+            if len(entries) >= self.max_entries:
+                entries.popitem(last=False)
+                self.evicted += 1
+            entries[key] = entry
+            loaded += 1
+        return loaded
+
+    def _sweep(self, now):
+        """Elimina hasta sweep_batch entradas inactivas del frente"""
+        entries = self._entries
+        for _ in range(self.sweep_batch):
+            if not entries:
+                return
+            key, entry = next(iter(entries.items()))
+            if now - entry.last_seen < self.idle_timeout:
+                return
+            del entries[key]
+            self.expired += 1
+
+    def stats(self, sample=64):
+        """Tamaño, expulsiones y memoria aproximada (por muestreo)"""
+        count = len(self._entries)
+        approx = sys.getsizeof(self._entries)
+        if count:
+            sampled = 0
+            total = 0
+            for key, entry in self._entries.items():
+                total += sys.getsizeof(key) + entry.memory()
+                sampled += 1
+                if sampled >= sample:
+                    break
+            approx += total * count // sampled
+        return {
+            'entries': count,
+            'max_entries': self.max_entries,
+            'evicted': self.evicted,
+            'expired': self.expired,
+            'approx_bytes': approx
+        }
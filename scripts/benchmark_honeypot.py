@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Benchmark del honeypot
+Arranca el honeypot en un proceso hijo (puertos altos, MemorySink, sin
+root ni base de datos) y mide desde un cliente asyncio:
+- conexiones/s: conectar, enviar una línea, leer la respuesta y cerrar
+- memoria (VmRSS del servidor) con N sockets inactivos abiertos a la vez
+
+Con --legacy mide también el servidor anterior (un hilo por puerto y
+otro por cliente, listen(5)) como referencia.
+
+Uso:
+    python3 scripts/benchmark_honeypot.py --connections 20000 --idle 10000
+    python3 scripts/benchmark_honeypot.py --legacy
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import signal
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'detectors'))
+
+from alert_sink import MemorySink
+from honeypot import SimpleHoneypot
+
+PAYLOAD = b"SSH-2.0-libssh_0.9.6\r\nroot:123456\r\n"
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def run_asyncio_server(port, ready, max_sessions):
+    """Proceso hijo: honeypot asyncio actual"""
+    settings = {
+        'ports': {port: 'SSH'},
+        'host': '127.0.0.1',
+        'backlog': 4096,
+        'max_sessions': max_sessions,
+        'session_timeout': 120,
+        'stats_interval': 0
+    }
+    honeypot = SimpleHoneypot(settings, sink=MemorySink(max_alerts=1000))
+    sys.stdout = open(os.devnull, 'w')
+    threading.Timer(0.5, ready.set).start()
+    honeypot.start_all()
+
+
+def run_legacy_server(port, ready, max_sessions):
+    """Proceso hijo: servidor anterior (hilo por cliente, recv bloqueante)"""
+    sink = MemorySink(max_alerts=1000)
+
+    def handle_client(client_socket, client_address):
+        try:
+            client_socket.settimeout(120)
+            data = client_socket.recv(4096)
+            if data:
+                sink.submit({'type': 'SSH Scanning', 'src_ip': client_address[0],
+                             'severity': 'MEDIUM', 'dst_port': port, 'protocol': 'TCP'})
+                client_socket.send(b"SSH-2.0-OpenSSH_7.4\r\n")
+        except (socket.timeout, OSError):
+            pass
+        finally:
+            client_socket.close()
+
+    raise_fd_limit()
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(('127.0.0.1', port))
+    server.listen(5)
+    ready.set()
+    try:
+        while True:
+            client_socket, client_address = server.accept()
+            threading.Thread(target=handle_client, args=(client_socket, client_address),
+                             daemon=True).start()
+    except KeyboardInterrupt:
+        server.close()
+
+
+def rss_mb(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def one_session(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(PAYLOAD)
+    await reader.read(256)
+    writer.close()
+
+
+async def throughput(port, total, concurrency):
+    """Sesiones completas por segundo con concurrency clientes a la vez"""
+    done = 0
+    errors = 0
+
+    async def client():
+        nonlocal done, errors
+        while done + errors < total:
+            try:
+                await asyncio.wait_for(one_session(port), 10)
+                done += 1
+            except (OSError, asyncio.TimeoutError):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return done / elapsed, errors
+
+
+async def idle_sockets(port, count, pid):
+    """Abre count conexiones sin enviar nada y mide la memoria del servidor"""
+    before = rss_mb(pid)
+    writers = []
+    errors = 0
+    started = time.perf_counter()
+    for start in range(0, count, 500):
+        results = await asyncio.gather(
+            *(asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), 10)
+              for _ in range(min(500, count - start))),
+            return_exceptions=True)
+        for result in results:
+            if isinstance(result, tuple):
+                writers.append(result[1])
+            else:
+                errors += 1
+    seconds = time.perf_counter() - started
+    await asyncio.sleep(1)       # Dar tiempo a aceptar las últimas
+    after = rss_mb(pid)
+
+    # Una sesión completa con todas las inactivas abiertas
+    try:
+        await asyncio.wait_for(one_session(port), 10)
+        responsive = True
+    except (OSError, asyncio.TimeoutError):
+        responsive = False
+
+    for writer in writers:
+        writer.close()
+    return before, after, len(writers), errors, seconds, responsive
+
+
+def bench(name, target, args, port):
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=target, args=(port, ready, args.idle + 1000), daemon=True)
+    process.start()
+    ready.wait(10)
+    time.sleep(0.2)
+    try:
+        rate, errors = asyncio.run(throughput(port, args.connections, args.concurrency))
+        before, after, opened, failed, seconds, responsive = asyncio.run(
+            idle_sockets(port, args.idle, process.pid))
+    finally:
+        os.kill(process.pid, signal.SIGINT)
+        process.join(5)
+        if process.is_alive():
+            process.kill()
+
+    print(f"{name:<10} {rate:>9,.0f} {errors:>7} {opened:>8} {failed:>6} "
+          f"{before:>8.1f} {after:>8.1f} {(after - before) * 1024 / max(opened, 1):>9.1f} "
+          f"{'sí' if responsive else 'NO':>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del honeypot')
+    parser.add_argument('--connections', type=int, default=10000, help='Sesiones completas')
+    parser.add_argument('--concurrency', type=int, default=200, help='Clientes simultáneos')
+    parser.add_argument('--idle', type=int, default=10000, help='Sockets inactivos simultáneos')
+    parser.add_argument('--port', type=int, default=24222, help='Puerto de pruebas')
+    parser.add_argument('--legacy', action='store_true', help='Medir también el servidor anterior')
+    args = parser.parse_args()
+
+    limit = raise_fd_limit()
+    if args.idle + 100 > limit:
+        print(f"⚠️  RLIMIT_NOFILE={limit}: se reduce --idle a {limit - 100}")
+        args.idle = limit - 100
+
+    print("=" * 78)
+    print(f"Honeypot: {args.connections} sesiones ({args.concurrency} en paralelo), "
+          f"{args.idle} sockets inactivos")
+    print("=" * 78)
+    print(f"{'Servidor':<10} {'conex/s':>9} {'errores':>7} {'inactiv.':>8} {'fallo':>6} "
+          f"{'RSS MB':>8} {'RSS MB':>8} {'KB/sock':>9} {'resp.':>6}")
+    print(f"{'':<10} {'':>9} {'':>7} {'':>8} {'':>6} {'antes':>8} {'después':>8}")
+    bench('asyncio', run_asyncio_server, args, args.port)
+    if args.legacy:
+        bench('hilos', run_legacy_server, args, args.port + 1)
+
+
+if __name__ == '__main__':
+    main()
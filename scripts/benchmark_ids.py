@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Benchmark del Network IDS
+1. Escenarios: genera pcaps sintéticos (scan, flood, payload y mezcla),
+   los pasa por RealAttackDetector.replay() con los timestamps de la
+   traza y muestra paquetes/s, tiempo de CPU por detector y alertas
+2. Prefiltro BPF: compara paquetes/s con y sin el filtro BPF compilado
+   a partir de los detectores habilitados sobre la traza mezclada
+
+No requiere root ni base de datos (las alertas van a un MemorySink).
+La medición con filtro necesita tcpdump (scapy lo usa para aplicar BPF
+a ficheros offline), igual que la captura en vivo.
+
+Uso:
+    python3 scripts/benchmark_ids.py --packets 50000
+    python3 scripts/benchmark_ids.py --scenario scan --backend raw
+    python3 scripts/benchmark_ids.py --pcap captura.pcapng
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'detectors'))
+
+try:
+    from scapy.all import Ether, IP, TCP, ICMP, Raw, PcapWriter, sniff
+except ImportError:
+    print("ERROR: Scapy not installed. Run: sudo pip3 install scapy")
+    sys.exit(1)
+
+from network_ids import RealAttackDetector
+from alert_sink import MemorySink
+from metrics import format_ns
+
+VICTIM = '10.0.0.10'
+BASE_TIME = 1700000000
+
+
+def generate_scan_pcap(path, count, seed=1):
+    """Port scan vertical, barrido horizontal y escaneo distribuido"""
+    rng = random.Random(seed)
+    writer = PcapWriter(path, sync=False)
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.4:
+            pkt = (Ether() / IP(src='192.168.50.5', dst=VICTIM) /
+                   TCP(sport=40000, dport=rng.randint(1, 65535), flags='S'))
+        elif roll < 0.7:
+            pkt = (Ether() / IP(src='192.168.50.8', dst=f'10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}') /
+                   TCP(sport=40001, dport=445, flags='S'))
+        else:
+            # Botnet: 100 IPs sondeando telnet en toda la red
+            pkt = (Ether() / IP(src=f'198.51.100.{rng.randint(1, 100)}',
+                                dst=f'10.0.1.{rng.randint(1, 254)}') /
+                   TCP(sport=rng.randint(1024, 65535), dport=23, flags='S'))
+        pkt.time = BASE_TIME + i * 0.001
+        writer.write(pkt)
+    writer.close()
+
+
+def generate_flood_pcap(path, count, seed=1):
+    """SYN flood con origen falsificado y ping flood"""
+    rng = random.Random(seed)
+    writer = PcapWriter(path, sync=False)
+    for i in range(count):
+        if rng.random() < 0.7:
+            pkt = (Ether() / IP(src=f'172.16.{rng.randint(0, 255)}.{rng.randint(1, 254)}', dst=VICTIM) /
+                   TCP(sport=rng.randint(1024, 65535), dport=80, flags='S'))
+        else:
+            pkt = Ether() / IP(src='192.168.50.6', dst=VICTIM) / ICMP() / Raw(b'x' * 56)
+        pkt.time = BASE_TIME + i * 0.0001
+        writer.write(pkt)
+    writer.close()
+
+
+def generate_payload_pcap(path, count, seed=1):
+    """Peticiones HTTP legítimas y con SQL injection / XSS"""
+    rng = random.Random(seed)
+    payloads = [
+        b"GET /index.html HTTP/1.1\r\nHost: victim\r\nUser-Agent: Mozilla/5.0\r\n\r\n",
+        b"GET /?id=1' UNION SELECT NULL-- HTTP/1.1\r\n\r\n",
+        b"GET /?q=<script>alert(1)</script> HTTP/1.1\r\n\r\n",
+        b"POST /login HTTP/1.1\r\n\r\nuser=admin'--&pass=x",
+    ]
+    writer = PcapWriter(path, sync=False)
+    for i in range(count):
+        payload = payloads[0] if rng.random() < 0.8 else rng.choice(payloads[1:])
+        pkt = (Ether() / IP(src=f'192.168.60.{rng.randint(1, 254)}', dst=VICTIM) /
+               TCP(sport=rng.randint(1024, 65535), dport=80, flags='PA',
+                   seq=rng.getrandbits(32)) / Raw(payload))
+        pkt.time = BASE_TIME + i * 0.001
+        writer.write(pkt)
+    writer.close()
+
+
+def generate_pcap(path, count, seed=1):
+    """Escribe un pcap con una mezcla de tráfico realista"""
+    rng = random.Random(seed)
+    victim = VICTIM
+    tls_blob = bytes(rng.getrandbits(8) for _ in range(1200))
+    writer = PcapWriter(path, sync=False)
+
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.90:
+            # TLS masivo: no interesa a ningún detector
+            pkt = (Ether() / IP(src=f'10.0.1.{rng.randint(1, 50)}', dst=victim) /
+                   TCP(sport=rng.randint(1024, 65535), dport=443, flags='PA') / Raw(tls_blob))
+        elif roll < 0.95:
+            # Port scan (SYN a puertos aleatorios)
+            pkt = (Ether() / IP(src='192.168.50.5', dst=victim) /
+                   TCP(sport=40000, dport=rng.randint(1, 1024), flags='S'))
+        elif roll < 0.97:
+            # SYN flood con origen falsificado
+            pkt = (Ether() / IP(src=f'172.16.{rng.randint(0, 255)}.{rng.randint(1, 254)}', dst=victim) /
+                   TCP(sport=rng.randint(1024, 65535), dport=80, flags='S'))
+        elif roll < 0.98:
+            pkt = Ether() / IP(src='192.168.50.6', dst=victim) / ICMP() / Raw(b'x' * 56)
+        else:
+            payload = rng.choice([
+                b"GET /?id=1' UNION SELECT NULL-- HTTP/1.1\r\n\r\n",
+                b"GET /?q=<script>alert(1)</script> HTTP/1.1\r\n\r\n",
+                b"GET /index.html HTTP/1.1\r\nHost: victim\r\n\r\n",
+            ])
+            pkt = (Ether() / IP(src='192.168.50.7', dst=victim) /
+                   TCP(sport=rng.randint(1024, 65535), dport=80, flags='PA') / Raw(payload))
+        pkt.time = BASE_TIME + i * 0.0001
+        writer.write(pkt)
+
+    writer.close()
+
+
+SCENARIOS = {
+    'scan': generate_scan_pcap,
+    'flood': generate_flood_pcap,
+    'payload': generate_payload_pcap,
+    'mixed': generate_pcap,
+}
+
+
+def run_replay(pcap, backend):
+    """Replay a máxima velocidad; devuelve (segundos, paquetes, histogramas, sink)"""
+    detector = RealAttackDetector(interface=None, settings={'metrics': True}, sink=MemorySink())
+    detector.capture_backend = backend
+
+    start = time.perf_counter()
+    packets = detector.replay(pcap)
+    elapsed = time.perf_counter() - start
+    return elapsed, packets, detector.detector_latency, detector.sink
+
+
+def report_replay(name, elapsed, packets, latency, sink):
+    rate = packets / elapsed if elapsed else 0
+    print(f"\n[{name}] {packets} paquetes en {elapsed:.2f} s -> {rate:.0f} paquetes/s")
+    print(f"  {'Detector':<14}{'CPU (ms)':>10}{'ns/paquete':>12}{'p50':>10}{'p99':>10}")
+    for detector_name, histogram in latency.items():
+        per_packet = histogram.sum / packets if packets else 0
+        print(f"  {detector_name:<14}{histogram.sum / 1e6:>10.1f}{per_packet:>12.0f}"
+              f"{format_ns(histogram.quantile(0.5)):>10}{format_ns(histogram.quantile(0.99)):>10}")
+    alerts = ', '.join(f"{t}: {c}" for t, c in sorted(sink.by_type.items())) or 'ninguna'
+    print(f"  Alertas: {alerts}")
+
+
+def run(pcap, bpf_filter):
+    """Procesa el pcap y devuelve (segundos, paquetes entregados, alertas)"""
+    detector = RealAttackDetector(interface=None, sink=MemorySink())
+    delivered = 0
+
+    def handler(packet):
+        nonlocal delivered
+        delivered += 1
+        detector.packet_handler(packet)
+
+    start = time.perf_counter()
+    sniff(offline=pcap, filter=bpf_filter, prn=handler, store=0)
+    elapsed = time.perf_counter() - start
+    return elapsed, delivered, detector.sink.counters['queued']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del Network IDS')
+    parser.add_argument('--packets', type=int, default=20000, help='Paquetes por pcap sintético')
+    parser.add_argument('--pcap', help='Usar un pcap/pcapng existente en lugar de generarlos')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append',
+                        help='Escenario a generar (repetible; por defecto todos)')
+    parser.add_argument('--backend', choices=['scapy', 'raw'], default='scapy',
+                        help='Parseo de los paquetes en el replay')
+    parser.add_argument('--no-bpf', action='store_true', help='Omitir la comparación del prefiltro BPF')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='ids-bench-')
+    try:
+        if args.pcap:
+            pcaps = [(os.path.basename(args.pcap), args.pcap)]
+        else:
+            pcaps = []
+            for name in args.scenario or list(SCENARIOS):
+                path = os.path.join(tmpdir, f'{name}.pcap')
+                print(f"Generando {args.packets} paquetes ({name}) en {path}...")
+                SCENARIOS[name](path, args.packets)
+                pcaps.append((name, path))
+
+        print("=" * 70)
+        print(f"Replay ({args.backend}) con timestamps de la traza")
+        print("=" * 70)
+        for name, path in pcaps:
+            report_replay(name, *run_replay(path, args.backend))
+
+        if args.no_bpf:
+            return
+
+        pcap = args.pcap or os.path.join(tmpdir, 'mixed.pcap')
+        if not os.path.exists(pcap):
+            generate_pcap(pcap, args.packets)
+        bpf_filter = RealAttackDetector(interface=None, sink=MemorySink()).build_bpf_filter()
+
+        print("\n" + "=" * 70)
+        print(f"Filtro BPF: {bpf_filter}")
+        print("=" * 70)
+
+        results = [('Sin filtro', *run(pcap, None))]
+        if shutil.which('tcpdump'):
+            results.append(('Con filtro BPF', *run(pcap, bpf_filter)))
+        else:
+            print("⚠️  tcpdump no encontrado: se omite la medición con filtro")
+
+        base_total = results[0][2]
+        print(f"{'Modo':<16}{'Segundos':>10}{'Entregados':>12}{'Alertas':>10}{'Paquetes/s':>14}")
+        for name, elapsed, delivered, alerts in results:
+            rate = base_total / elapsed if elapsed else 0
+            print(f"{name:<16}{elapsed:>10.2f}{delivered:>12}{alerts:>10}{rate:>14.0f}")
+        print("\nPaquetes/s = paquetes totales de la traza / tiempo de procesamiento")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
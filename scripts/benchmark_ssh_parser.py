@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark del parser de sshd
+Compara el parser anterior (dos re.search sin compilar por línea) con
+sshd_parser.parse_sshd_message (prefiltro por subcadena + regex
+precompilada) sobre líneas sintéticas de auth.log de un servidor
+expuesto, separando el ruido de sshd, las líneas que ambos reconocen y
+las que solo reconoce el parser nuevo (IPv6, Invalid user, PAM...).
+
+No requiere root ni base de datos.
+
+Uso:
+    python3 scripts/benchmark_ssh_parser.py --lines 200000
+    python3 scripts/benchmark_ssh_parser.py --log /var/log/auth.log
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'detectors'))
+
+from sshd_parser import parse_sshd_message
+
+PREFIX = 'Oct 18 03:12:{s:02d} server sshd[{pid}]: '
+
+# (peso, plantilla del mensaje)
+TEMPLATES = [
+    (20, 'Connection closed by {ip} port {port} [preauth]'),
+    (15, 'Received disconnect from {ip} port {port}:11: Bye Bye [preauth]'),
+    (15, 'Disconnected from authenticating user root {ip} port {port} [preauth]'),
+    (10, 'pam_unix(sshd:session): session opened for user deploy(uid=1000) by (uid=0)'),
+    (5, 'Connection reset by {ip} port {port} [preauth]'),
+    (12, 'Failed password for {user} from {ip} port {port} ssh2'),
+    (6, 'Failed password for invalid user {user} from {ip} port {port} ssh2'),
+    (6, 'Invalid user {user} from {ip} port {port}'),
+    (6, 'pam_unix(sshd:auth): authentication failure; logname= uid=0 euid=0 tty=ssh '
+        'ruser= rhost={ip}  user={user}'),
+    (2, 'error: maximum authentication attempts exceeded for {user} from {ip} port {port} ssh2 [preauth]'),
+    (2, 'Accepted publickey for {user} from {ip} port {port} ssh2: ED25519 SHA256:abc'),
+    (1, 'Accepted password for {user} from {ip} port {port} ssh2'),
+]
+
+USERS = ['root', 'admin', 'ubuntu', 'oracle', 'test', 'git', 'john.doe', 'pi']
+
+
+def random_ip(rng):
+    if rng.random() < 0.2:
+        return f"2001:db8::{rng.randrange(1, 0xffff):x}"
+    return f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+
+
+def generate_lines(count, seed=1):
+    rng = random.Random(seed)
+    weights = [w for w, _ in TEMPLATES]
+    templates = [t for _, t in TEMPLATES]
+    lines = []
+    for template in rng.choices(templates, weights, k=count):
+        prefix = PREFIX.format(s=rng.randrange(60), pid=rng.randrange(1000, 65000))
+        lines.append(prefix + template.format(ip=random_ip(rng), port=rng.randrange(1024, 65535),
+                                              user=rng.choice(USERS)))
+    return lines
+
+
+def legacy_parse(log_line, timestamp=None):
+    """Parser anterior de SSHBruteForceDetector.parse_ssh_log (referencia)"""
+    match = re.search(r'Failed password for (?:invalid user )?(\w+) from ([\d.]+) port (\d+)', log_line)
+    if match:
+        return {'type': 'failed_login', 'username': match.group(1), 'ip': match.group(2),
+                'port': match.group(3), 'timestamp': timestamp or time.time()}
+    match = re.search(r'Accepted password for (\w+) from ([\d.]+) port (\d+)', log_line)
+    if match:
+        return {'type': 'successful_login', 'username': match.group(1), 'ip': match.group(2),
+                'port': match.group(3), 'timestamp': timestamp or time.time()}
+    return None
+
+
+def measure(parse, lines, rounds):
+    """Mejor de rounds pasadas, en ns por línea"""
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        for line in lines:
+            if 'sshd' in line:
+                parse(line, 1.0)
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / max(len(lines), 1)
+
+
+def split_lines(lines):
+    """
+    Agrupa las líneas: ruido (ningún parser las reconoce), comunes (ambos)
+    y nuevas (solo sshd_parser: IPv6, Invalid user, PAM, publickey...)
+    """
+    groups = {'ruido': [], 'comunes': [], 'nuevas': []}
+    kinds = Counter()
+    for line in lines:
+        event = parse_sshd_message(line, 1.0)
+        if event is None:
+            groups['ruido'].append(line)
+            continue
+        kinds[event.kind] += 1
+        groups['comunes' if legacy_parse(line, 1.0) else 'nuevas'].append(line)
+    return groups, kinds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmark del parser de sshd')
+    parser.add_argument('--lines', type=int, default=100000, help='Líneas sintéticas')
+    parser.add_argument('--log', help='Usar un auth.log existente en lugar de líneas sintéticas')
+    parser.add_argument('--rounds', type=int, default=5, help='Repeticiones (se toma la mejor)')
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, 'r', errors='replace') as f:
+            lines = f.read().splitlines()
+    else:
+        lines = generate_lines(args.lines)
+
+    groups, kinds = split_lines(lines)
+    groups['total'] = lines
+
+    print("=" * 60)
+    print(f"Parser de sshd: {len(lines)} líneas, mejor de {args.rounds}")
+    print("=" * 60)
+    print(f"{'Líneas':<10} {'N':>8} {'Anterior':>12} {'sshd_parser':>12} {'Aceleración':>12}")
+    for name, subset in groups.items():
+        if not subset:
+            continue
+        old = measure(legacy_parse, subset, args.rounds)
+        new = measure(parse_sshd_message, subset, args.rounds)
+        print(f"{name:<10} {len(subset):>8} {old:>9.0f} ns {new:>9.0f} ns {old / new:>11.2f}x")
+    print("-" * 60)
+    print("Eventos reconocidos por sshd_parser:")
+    for kind, count in sorted(kinds.items()):
+        print(f"    {kind:<18} {count}")
+
+
+if __name__ == '__main__':
+    main()
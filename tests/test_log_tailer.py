@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Pruebas del seguidor de logs (log_tailer.py): posición por línea y
+reanudación tras una rotación con nombres que no son log.1
+
+Uso:
+    python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'detectors'))
+
+from log_tailer import LogTailer
+
+
+def read_lines(tailer, count):
+    """Las primeras `count` líneas del tailer (cierra el generador)"""
+    source = tailer.lines()
+    try:
+        return list(islice(source, count))
+    finally:
+        source.close()
+
+
+class LogTailerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'auth.log')
+        with open(self.path, 'w') as f:
+            f.write('uno\ndós\ntres\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def tailer(self, position=None):
+        return LogTailer(self.path, start_at_end=False, poll_interval=0.05, position=position)
+
+    def test_offset_advances_per_line(self):
+        tailer = self.tailer()
+        source = tailer.lines()
+        self.assertEqual(next(source), 'uno')
+        self.assertEqual(tailer.position()['offset'], len(b'uno\n'))
+        self.assertEqual(next(source), 'dós')
+        self.assertEqual(tailer.position()['offset'], len('uno\ndós\n'.encode()))
+        source.close()
+
+    def test_resume_from_position(self):
+        tailer = self.tailer()
+        read_lines(tailer, 2)
+        self.assertEqual(read_lines(self.tailer(tailer.position()), 1), ['tres'])
+
+    def test_resume_after_dateext_rotation(self):
+        tailer = self.tailer()
+        read_lines(tailer, 2)
+        os.rename(self.path, f"{self.path}-20240101")
+        with open(self.path, 'w') as f:
+            f.write('cuatro\n')
+        self.assertEqual(read_lines(self.tailer(tailer.position()), 2), ['tres', 'cuatro'])
+
+
+if __name__ == '__main__':
+    unittest.main()
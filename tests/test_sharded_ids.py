@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Pruebas del modo multiproceso del Network IDS (sharded_ids.py)
+Lanzan trabajadores reales y les reparten registros sintéticos; las
+alertas quedan en un MemorySink (sin root ni base de datos).
+
+Uso:
+    python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'detectors'))
+
+from alert_sink import MemorySink
+from raw_capture import PacketRecord, TCP_SYN
+from sharded_ids import ShardedAttackDetector
+
+BASE_TIME = 1700000000.0
+
+
+def settings(**overrides):
+    values = {
+        'detectors': ['host_scan'],
+        'metrics': False,
+        'state_file': None,
+        'stream_depth': 0,
+        'distributed_scan_sources': 50,
+        'distributed_scan_min_hosts': 3,
+    }
+    values.update(overrides)
+    return values
+
+
+def run_detector(records, workers=2, **overrides):
+    """Pasa los registros por un ShardedAttackDetector ya detenido"""
+    detector = ShardedAttackDetector('lo', workers=workers, settings=settings(**overrides),
+                                     sink=MemorySink())
+    detector.start_workers()
+    try:
+        for record in records:
+            detector.dispatch(record)
+    finally:
+        detector.stop_workers()
+    return detector
+
+
+def run_sharded(records, workers=2, **overrides):
+    """Pasa los registros por ShardedAttackDetector y devuelve sus alertas"""
+    return list(run_detector(records, workers, **overrides).sink.alerts)
+
+
+def botnet(sources, dst_port=23, hosts=3):
+    """Cada IP origen sondea dst_port en `hosts` hosts distintos"""
+    records = []
+    for i in range(sources):
+        src = f'198.51.100.{i + 1}'
+        for host in range(hosts):
+            records.append(PacketRecord(BASE_TIME + i * 0.01 + host * 0.001, src,
+                                        f'10.0.1.{host + 1}', 6, TCP_SYN,
+                                        40000 + i, dst_port))
+    return records
+
+
+class ShardedDistributedScanTest(unittest.TestCase):
+
+    def test_botnet_split_across_workers_is_detected(self):
+        # 80 IPs: ningún trabajador ve las 50 del umbral por sí solo
+        records = botnet(80)
+        shards = [zlib.crc32(r.src.encode()) % 2 for r in records[::3]]
+        self.assertLess(max(shards.count(0), shards.count(1)), 50)
+
+        alerts = run_sharded(records)
+        distributed = [a for a in alerts if a['type'] == 'Distributed Port Scan']
+        self.assertEqual(len(distributed), 1)
+        self.assertEqual(distributed[0]['dst_port'], 23)
+        self.assertGreaterEqual(distributed[0]['sources'], 50)
+
+    def test_below_threshold_stays_quiet(self):
+        alerts = run_sharded(botnet(30))
+        self.assertFalse([a for a in alerts if a['type'] == 'Distributed Port Scan'])
+
+
+class ShardedMetricsTest(unittest.TestCase):
+
+    def test_detector_latency_is_summed_across_workers(self):
+        records = botnet(40)
+        detector = run_detector(records, metrics=True)
+        latency = detector.detector_latency
+        self.assertEqual(set(latency), {'host_scan'})
+        self.assertEqual(latency['host_scan'].count, len(records))
+        self.assertEqual(sum(latency['host_scan'].buckets), len(records))
+        self.assertEqual(detector.detector_errors, {'host_scan': 0})
+        self.assertIn('host_scan p50=', detector.metrics_line())
+        self.assertIn('sins_ids_detector_calls_total{detector="host_scan"} %d' % len(records),
+                      detector.build_metrics().render())
+
+
+if __name__ == '__main__':
+    unittest.main()
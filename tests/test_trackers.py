@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Pruebas de las estructuras de estado de los detectores (trackers.py)
+
+Uso:
+    python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'detectors'))
+
+from trackers import HitAggregator, SlidingWindowCounter
+
+
+def hit(key, now):
+    """Lo que hace log_attack: el primero se emite al abrir la ventana"""
+    return {'key': key, 'ts': now}
+
+
+class HitAggregatorTest(unittest.TestCase):
+
+    def record(self, hits, key, now):
+        """Devuelve la alerta emitida en el acto (o None si solo cuenta)"""
+        if hits.count(key, now):
+            return None
+        alert = hit(key, now)
+        hits.open(key, alert, now)
+        return alert
+
+    def test_first_hit_is_emitted_at_once(self):
+        hits = HitAggregator(window=60)
+        first = self.record(hits, 'a', 100.0)
+        self.assertEqual(first['ts'], 100.0)
+        self.assertIsNone(self.record(hits, 'a', 110.0))
+        self.assertIsNone(self.record(hits, 'a', 120.0))
+        self.assertEqual(hits.due(130.0), [])
+
+        follow_up, = hits.due(160.0)
+        self.assertEqual(follow_up['count'], 2)
+        self.assertEqual(follow_up['first_seen'], 100.0)
+        self.assertEqual(follow_up['ts'], 120.0)
+        # La primera alerta (quizá aún en la cola del sink) no cambia
+        self.assertNotIn('count', first)
+        self.assertEqual(first['ts'], 100.0)
+
+    def test_single_hit_has_no_follow_up(self):
+        hits = HitAggregator(window=60)
+        self.record(hits, 'a', 100.0)
+        self.assertEqual(hits.due(200.0), [])
+        self.assertEqual(hits.drain(), [])
+
+    def test_eviction_keeps_every_hit(self):
+        hits = HitAggregator(window=60, max_entries=1)
+        self.record(hits, 'a', 100.0)
+        self.record(hits, 'a', 101.0)
+        self.record(hits, 'b', 102.0)
+        follow_up, = hits.due(103.0)
+        self.assertEqual((follow_up['key'], follow_up['count']), ('a', 1))
+
+
+class SlidingWindowCounterTest(unittest.TestCase):
+
+    def test_event_older_than_window_is_dropped(self):
+        counter = SlidingWindowCounter(100.0, window=10, slots=10)
+        self.assertEqual(counter.add(100.0), 1)
+        self.assertEqual(counter.add(50.0), 1)
+        self.assertEqual(counter.count(100.0), 1)
+
+    def test_late_event_goes_to_its_bucket(self):
+        counter = SlidingWindowCounter(100.0, window=10, slots=10)
+        counter.add(105.0)
+        self.assertEqual(counter.add(101.5), 2)
+        # La cubeta de 101 sale de la ventana antes que la de 105
+        self.assertEqual(counter.count(111.5), 1)
+        self.assertEqual(counter.count(115.5), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()